@@ -1,3 +1,5 @@
+import os
+import click
 from flask import Flask, redirect, url_for
 from datetime import timedelta
 from config import Config
@@ -60,6 +62,69 @@ def create_app(config_class=Config):
             create_default_users()
         except Exception as e:
             pass  # Silently handle database initialization errors
+        
+        # Corpus tables and full-text index; a failure must not block the users above
+        try:
+            from utils.corpus_loader import ensure_corpus_schema
+            ensure_corpus_schema()
+        except Exception as e:
+            print(f"Warning: Could not prepare the message corpus tables: {e}")
+    
+    # Keep the dashboard statistics snapshot current in the background; started
+    # by the first request, so the CLI commands below never run the refresher
+    from utils.dashboard_snapshot import dashboard_snapshots
+    app.before_request(dashboard_snapshots.start)
+    
+    # CLI: bulk load the database/ JSON corpus into the messages table
+    @app.cli.command('load-messages')
+    @click.option('--assembly', 'assemblies', multiple=True, help='Assembly to load (default: all)')
+    @click.option('--reload', is_flag=True, help='Also reload partitions that are up to date')
+    def load_messages_command(assemblies, reload):
+        """Load new or changed database/<assembly>/<date>/messages into SQL"""
+        from utils.corpus_loader import load_corpus
+        summary = load_corpus(list(assemblies) or None, reload=reload)
+        click.echo(f"Loaded {summary['messages']} messages from {summary['partitions']} partitions "
+                   f"of {summary['assemblies']} assemblies")
+    
+    # CLI: rebuild message store partitions and their per-group rollups
+    @app.cli.command('rebuild-rollups')
+    @click.option('--assembly', 'assemblies', multiple=True, help='Assembly to rebuild (default: all)')
+    def rebuild_rollups_command(assemblies):
+        """Re-parse database/<assembly>/<date>/messages and recompute group rollups"""
+        from utils.message_store import message_store
+        from utils.partitions import partition_resolver
+        partitions = groups = 0
+        for assembly in list(assemblies) or message_store.list_assemblies():
+            for date in partition_resolver.dates(assembly):
+                if not os.path.isdir(message_store.messages_dir(assembly, date)):
+                    continue
+                partition = message_store.build_partition(assembly, date)
+                partitions += 1
+                groups += len(partition.rollups)
+        click.echo(f"Rebuilt {groups} group rollups in {partitions} partitions")
+    
+    # CLI: convert rosters that predate upload-time conversion into the canonical form
+    @app.cli.command('canonicalise-rosters')
+    @click.option('--assembly', 'assemblies', multiple=True, help='Assembly to convert (default: all)')
+    def canonicalise_rosters_command(assemblies):
+        """Rewrite database/<assembly>/groups/*.csv without a sidecar as canonical rosters"""
+        from utils.message_store import message_store
+        from utils.group_overlap import roster_files
+        from utils.rosters import canonicalise_roster_file, roster_metadata
+        converted = failed = 0
+        for assembly in list(assemblies) or message_store.list_assemblies():
+            groups_path = os.path.join(message_store.database_path, assembly, 'groups')
+            for filename in roster_files(assembly):
+                path = os.path.join(groups_path, filename)
+                if roster_metadata(path) is not None:
+                    continue
+                try:
+                    canonicalise_roster_file(path)
+                    converted += 1
+                except Exception as e:
+                    click.echo(f"Could not convert {path}: {e}")
+                    failed += 1
+        click.echo(f"Converted {converted} rosters ({failed} failed)")
     
     return app
 
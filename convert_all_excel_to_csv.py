@@ -2,76 +2,198 @@
 """
 Excel to CSV Converter for All Assembly Groups
 Converts all Excel files in all assembly group directories to CSV format.
+
+Workbooks are converted in parallel on a process pool. .xlsx files are
+streamed with openpyxl in read-only mode and only their phone and name
+columns are written (all columns if none is recognised). A manifest in each
+output directory records the mtime, size and SHA-1 of every converted
+workbook, so only new or changed workbooks are converted on the next run;
+a workbook that was merely touched is recognised by its unchanged hash.
 """
 
 import os
-import pandas as pd
+import csv
 import glob
-from pathlib import Path
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-def convert_excel_to_csv(input_dir, output_dir):
-    """
-    Convert all Excel files in the input directory to CSV format.
-    
-    Args:
-        input_dir (str): Directory containing Excel files
-        output_dir (str): Output directory for CSV files
+import pandas as pd
+from openpyxl import load_workbook
+
+PHONE_COLUMN_KEYWORDS = ['phone', 'number', 'mobile', 'contact', 'whatsapp']
+NAME_COLUMN_KEYWORDS = ['name']
+MANIFEST_NAME = '.conversion_manifest.json'
+
+def file_digest(path):
+    """SHA-1 of a file's content"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def selected_columns(header):
+    """Indices of the phone and name columns of a header row (every column if there are none)"""
+    keywords = PHONE_COLUMN_KEYWORDS + NAME_COLUMN_KEYWORDS
+    indices = [index for index, col in enumerate(header)
+               if col is not None and any(keyword in str(col).lower() for keyword in keywords)]
+    return indices or list(range(len(header)))
+
+def cell_text(value):
+    """CSV text of a cell; whole numbers (phones stored as numbers) lose their '.0'"""
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        if value != value:  # NaN
+            return ''
+        if value.is_integer():
+            return str(int(value))
+    return str(value)
+
+def iter_workbook_rows(excel_file):
+    """Yield the rows of the first sheet as tuples, the header row first"""
+    if excel_file.lower().endswith('.xls'):
+        # Legacy .xls files cannot be streamed by openpyxl
+        df = pd.read_excel(excel_file, dtype=object)
+        yield tuple(df.columns)
+        yield from df.itertuples(index=False, name=None)
+        return
+
+    workbook = load_workbook(excel_file, read_only=True, data_only=True)
+    try:
+        worksheet = workbook.active
+        # Do not trust the dimensions stored by the program that wrote the file
+        worksheet.reset_dimensions()
+        yield from worksheet.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+def convert_workbook(excel_file, csv_file):
+    """Worker: stream one workbook into csv_file and return its conversion stats"""
+    started = time.time()
+    rows = iter_workbook_rows(excel_file)
+    header = next(rows, None) or ()
+    indices = selected_columns(header)
+
+    row_count = 0
+    tmp_path = f'{csv_file}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow([cell_text(header[index]) for index in indices])
+            for row in rows:
+                values = [cell_text(row[index]) if index < len(row) else '' for index in indices]
+                if any(values):
+                    writer.writerow(values)
+                    row_count += 1
+        os.replace(tmp_path, csv_file)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    stat = os.stat(excel_file)
+    return {
+        'rows': row_count,
+        'columns': [cell_text(header[index]) for index in indices],
+        'bytes': stat.st_size,
+        'seconds': time.time() - started,
+        'manifest': {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'sha1': file_digest(excel_file)}
+    }
+
+def load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, IOError) as e:
+        print(f"  ⚠ Ignoring unreadable manifest {path}: {e}")
+        return {}
+
+def save_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def is_stale(excel_file, csv_file, entry):
+    """True if excel_file has to be (re)converted into csv_file
+
+    entry is the workbook's manifest entry; its mtime is refreshed in place
+    when a touched workbook turns out to be unchanged.
     """
-    
-    # Create output directory if it doesn't exist
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # Find all Excel files
-    excel_patterns = ['*.xlsx', '*.xls']
+    if not os.path.exists(csv_file):
+        return True
+    stat = os.stat(excel_file)
+    if entry is None:
+        # Converted before the manifest existed: trust a CSV newer than its workbook
+        return os.stat(csv_file).st_mtime_ns < stat.st_mtime_ns
+    if entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+        return False
+    if entry['size'] == stat.st_size and entry.get('sha1') == file_digest(excel_file):
+        entry['mtime_ns'] = stat.st_mtime_ns
+        return False
+    return True
+
+def plan_conversions(input_dir, output_dir, manifest, force=False):
+    """List (excel_file, csv_file) jobs of a directory; returns (jobs, skipped count)"""
     excel_files = []
-    
-    for pattern in excel_patterns:
+    for pattern in ['*.xlsx', '*.xls']:
         excel_files.extend(glob.glob(os.path.join(input_dir, pattern)))
-    
+
     if not excel_files:
-        return 0, 0
-    
+        return [], 0
+
     print(f"  Found {len(excel_files)} Excel files in {os.path.basename(input_dir)}")
-    
-    converted_count = 0
-    error_count = 0
-    
-    for excel_file in excel_files:
-        try:
-            # Get the base filename without extension
-            base_name = os.path.splitext(os.path.basename(excel_file))[0]
-            csv_file = os.path.join(output_dir, f"{base_name}.csv")
-            
-            # Skip if CSV already exists
-            if os.path.exists(csv_file):
-                print(f"    ⚠ Skipping {os.path.basename(excel_file)} (CSV already exists)")
-                continue
-            
-            # Read Excel file
-            df = pd.read_excel(excel_file)
-            
-            # Save as CSV
-            df.to_csv(csv_file, index=False, encoding='utf-8')
-            
-            print(f"    ✓ {os.path.basename(excel_file)} -> {os.path.basename(csv_file)} ({len(df)} rows)")
-            converted_count += 1
-            
-        except Exception as e:
-            print(f"    ✗ Error converting {os.path.basename(excel_file)}: {str(e)}")
-            error_count += 1
-    
-    return converted_count, error_count
+
+    jobs = []
+    skipped = 0
+    for excel_file in sorted(excel_files):
+        base_name = os.path.splitext(os.path.basename(excel_file))[0]
+        csv_file = os.path.join(output_dir, f"{base_name}.csv")
+        if not force and not is_stale(excel_file, csv_file, manifest.get(os.path.basename(excel_file))):
+            skipped += 1
+            continue
+        jobs.append((excel_file, csv_file))
+
+    if skipped:
+        print(f"    ⚠ Skipping {skipped} up-to-date files")
+    return jobs, skipped
+
+def run_conversions(jobs, workers):
+    """Convert (output dir, excel file, csv file) jobs, yielding (job, result, error) as they finish"""
+    if workers == 1:
+        for job in jobs:
+            try:
+                yield job, convert_workbook(job[1], job[2]), None
+            except Exception as e:
+                yield job, None, e
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(convert_workbook, job[1], job[2]): job for job in jobs}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
 
 def find_assembly_directories():
     """Find all assembly directories that contain groups folders."""
-    
+
     database_dir = "database"
     assembly_dirs = []
-    
+
     if not os.path.exists(database_dir):
         print(f"Error: Database directory '{database_dir}' does not exist!")
         return assembly_dirs
-    
+
     # Look for directories that contain a 'groups' subdirectory
     for item in os.listdir(database_dir):
         item_path = os.path.join(database_dir, item)
@@ -79,58 +201,95 @@ def find_assembly_directories():
             groups_path = os.path.join(item_path, 'groups')
             if os.path.exists(groups_path) and os.path.isdir(groups_path):
                 assembly_dirs.append(groups_path)
-    
+
     return assembly_dirs
 
 def main():
     """Main function to run the conversion for all assemblies."""
-    
+
+    parser = argparse.ArgumentParser(description='Convert the Excel rosters of every assembly to CSV')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Conversion processes')
+    parser.add_argument('--force', action='store_true', help='Convert every workbook, even if up to date')
+    args = parser.parse_args()
+
     print("Excel to CSV Converter - All Assemblies")
     print("=" * 60)
-    
+
     # Create main output directory
     main_output_dir = "csv_output"
     os.makedirs(main_output_dir, exist_ok=True)
     print(f"Output directory: {main_output_dir}")
     print()
-    
+
     # Find all assembly group directories
     assembly_dirs = find_assembly_directories()
-    
+
     if not assembly_dirs:
         print("No assembly directories with groups found!")
         return
-    
+
     print(f"Found {len(assembly_dirs)} assembly directories:")
     for dir_path in assembly_dirs:
         print(f"  - {dir_path}")
     print()
-    
-    total_converted = 0
-    total_errors = 0
-    
-    # Convert files in each assembly directory
+
+    started = time.time()
+    manifests = {}  # output dir -> manifest
+    jobs = []  # (output dir, excel file, csv file)
+    total_skipped = 0
+
+    # Work out which workbooks of each assembly need converting
     for assembly_dir in assembly_dirs:
         assembly_name = os.path.basename(os.path.dirname(assembly_dir))
-        print(f"Processing: {assembly_name}")
-        
+        print(f"Scanning: {assembly_name}")
+
         # Create assembly-specific output directory
         assembly_output_dir = os.path.join(main_output_dir, assembly_name)
-        
-        converted, errors = convert_excel_to_csv(assembly_dir, assembly_output_dir)
-        total_converted += converted
-        total_errors += errors
-        
-        print(f"  Summary: {converted} converted, {errors} errors")
-        print(f"  Output: {assembly_output_dir}")
+        os.makedirs(assembly_output_dir, exist_ok=True)
+        manifests[assembly_output_dir] = load_manifest(assembly_output_dir)
+
+        assembly_jobs, skipped = plan_conversions(assembly_dir, assembly_output_dir,
+                                                  manifests[assembly_output_dir], args.force)
+        jobs.extend((assembly_output_dir, excel_file, csv_file) for excel_file, csv_file in assembly_jobs)
+        total_skipped += skipped
+    print()
+
+    total_converted = 0
+    total_errors = 0
+    total_rows = 0
+    total_bytes = 0
+
+    # Convert the stale workbooks of all assemblies on one process pool
+    if jobs:
+        workers = max(1, min(args.workers, len(jobs)))
+        print(f"Converting {len(jobs)} files with {workers} workers")
+        for (output_dir, excel_file, csv_file), result, error in run_conversions(jobs, workers):
+            if error is not None:
+                print(f"    ✗ Error converting {os.path.basename(excel_file)}: {str(error)}")
+                total_errors += 1
+                continue
+
+            manifests[output_dir][os.path.basename(excel_file)] = result['manifest']
+            total_converted += 1
+            total_rows += result['rows']
+            total_bytes += result['bytes']
+            print(f"    ✓ {os.path.basename(excel_file)} -> {os.path.basename(csv_file)} "
+                  f"({result['rows']} rows, {', '.join(result['columns'])})")
         print()
-    
+
+    for output_dir, manifest in manifests.items():
+        save_manifest(output_dir, manifest)
+
+    elapsed = max(time.time() - started, 1e-6)
     print("=" * 60)
     print("Overall Summary:")
     print(f"  ✓ Total files converted: {total_converted}")
+    print(f"  ⚠ Up-to-date files skipped: {total_skipped}")
     print(f"  ✗ Total errors: {total_errors}")
     print(f"  📁 Processed {len(assembly_dirs)} assembly directories")
     print(f"  📂 All CSV files saved in: {main_output_dir}")
+    print(f"  ⏱ {elapsed:.2f}s: {total_converted / elapsed:.1f} files/s, {total_rows / elapsed:.0f} rows/s, "
+          f"{total_bytes / elapsed / (1024 * 1024):.2f} MB/s")
     print("\nConversion completed!")
 
 if __name__ == "__main__":
@@ -1,5 +1,5 @@
 # Models package initialization
-from .user import User, Group, Message, PostSchedule, PostScheduleGroup
+from .user import User, Group, Message, CorpusPartition, PostSchedule, PostScheduleGroup
 from .assembly import Assembly
 
-__all__ = ['User', 'Group', 'Message', 'Assembly', 'PostSchedule', 'PostScheduleGroup']
+__all__ = ['User', 'Group', 'Message', 'CorpusPartition', 'Assembly', 'PostSchedule', 'PostScheduleGroup']
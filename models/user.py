@@ -82,14 +82,18 @@ class Group(db.Model):
     __tablename__ = 'groups'
     
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
+    name = db.Column(db.String(255), nullable=False)
     description = db.Column(db.Text)
     group_id = db.Column(db.String(100), unique=True, nullable=False)  # WhatsApp group ID
     member_count = db.Column(db.Integer, default=0)
     is_active = db.Column(db.Boolean, default=True)
     
-    # Foreign keys
-    created_by_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    # Source of groups loaded from database/<assembly>/<date>/messages/
+    assembly_name = db.Column(db.String(200), index=True)
+    group_file = db.Column(db.String(255))  # JSON filename without extension
+    
+    # Foreign keys (corpus groups have no creating user)
+    created_by_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
@@ -104,6 +108,11 @@ class Group(db.Model):
 class Message(db.Model):
     """WhatsApp message model"""
     __tablename__ = 'messages'
+    __table_args__ = (
+        db.Index('ix_messages_assembly_date', 'assembly_name', 'report_date'),
+        db.Index('ix_messages_sender_phone', 'sender_phone'),
+        db.Index('ix_messages_sentiment_label', 'sentiment', 'label'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     message_id = db.Column(db.String(100), unique=True, nullable=False)  # WhatsApp message ID
@@ -113,11 +122,17 @@ class Message(db.Model):
     sender_phone = db.Column(db.String(20))
     
     # Sentiment analysis
-    sentiment = db.Column(db.String(20))  # positive, negative, neutral
+    sentiment = db.Column(db.String(20))  # Positive, Negative, Neutral
     sentiment_score = db.Column(db.Float)
+    label = db.Column(db.String(100))  # predicted_label
     
-    # Foreign keys
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    # Source partition: database/<assembly_name>/<report_date>/messages/<group_file>.json
+    assembly_name = db.Column(db.String(200))
+    report_date = db.Column(db.String(10))  # YYYY-MM-DD
+    group_file = db.Column(db.String(255))
+    
+    # Foreign keys (corpus messages have no owning user)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     group_id = db.Column(db.Integer, db.ForeignKey('groups.id'), nullable=False)
     
     # Timestamps
@@ -127,6 +142,23 @@ class Message(db.Model):
     def __repr__(self):
         return f'<Message {self.message_id[:20]}...>'
 
+class CorpusPartition(db.Model):
+    """A database/<assembly_name>/<report_date>/messages partition as loaded into the messages table"""
+    __tablename__ = 'corpus_partitions'
+    __table_args__ = (
+        db.UniqueConstraint('assembly_name', 'report_date', name='uq_corpus_partitions_assembly_date'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    assembly_name = db.Column(db.String(200), nullable=False)
+    report_date = db.Column(db.String(10), nullable=False)  # YYYY-MM-DD
+    source_digest = db.Column(db.String(40), nullable=False)  # SHA-1 of the source files it was loaded from
+    message_count = db.Column(db.Integer, default=0)
+    loaded_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<CorpusPartition {self.assembly_name}/{self.report_date}>'
+
 class PostSchedule(db.Model):
     """Scheduled post model for WhatsApp groups"""
     __tablename__ = 'post_schedules'
@@ -1,12 +1,36 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify, send_file, Response, stream_with_context, current_app
 from flask_login import login_required, current_user
-from functools import wraps
+from werkzeug.exceptions import RequestEntityTooLarge
+from functools import wraps, partial
+from itertools import chain
 from extensions import db
 from models.user import User, Group, Message
 from models.assembly import Assembly
+from utils.message_store import message_store
+from utils.file_cache import load_json, parsed_file_cache
+from utils.partitions import partition_resolver, normalise_date
+from utils.scan_engine import scan_partitions
+from utils.search_index import FTS_FIELDS, fts_available, search_fulltext, count_fulltext
+from utils.corpus_loader import stale_partitions
+from utils.trigram_index import trigram_index
+from utils.phone_index import phone_index
+from utils.rollups import sender_rollup, sum_partition_rollups
+from utils.membership import MembershipMatrix, partition_memberships
+from utils.group_overlap import group_overlap_cache
+from utils.roster_activity import RosterActivity, STATUSES
+from utils.result_cache import corpus_versions, result_cache
+from utils.analysis_sessions import analysis_sessions
+from utils.xlsx_export import XLSX_MIMETYPE, XlsxWorkbook, spool_xlsx
+from utils.stream_export import GZIP_MIMETYPE, export_format, stream_rows
+from utils.roster_stats import roster_stats
+from utils.rosters import ROSTER_META_SUFFIX, canonicalise_roster, read_roster
+from utils.dashboard_snapshot import dashboard_snapshots, estimate_phone_count_from_file
+from utils.chunked_uploads import chunked_uploads, CompletedUpload, UploadError
 from datetime import datetime
+from urllib.parse import quote
 import os
 import json
+import base64
 
 api_bp = Blueprint('api', __name__)
 
@@ -325,15 +349,18 @@ def upload_groups():
                 'message': 'Missing required field: assembly_name'
             }), 400
         
-        # Check if files were uploaded
-        if 'files[]' not in request.files:
+        # Check if files were uploaded, directly or in chunks
+        if 'files[]' not in request.files and 'upload_ids[]' not in request.form:
             return jsonify({
                 'success': False,
                 'message': 'No files were uploaded'
             }), 400
         
-        files = request.files.getlist('files[]')
-        if not files or all(f.filename == '' for f in files):
+        try:
+            files = uploaded_files()
+        except UploadError as e:
+            return upload_error_response(e)
+        if not files:
             return jsonify({
                 'success': False,
                 'message': 'No files were selected'
@@ -370,27 +397,61 @@ def upload_groups():
         base_dir = os.path.join('database', assembly_name, 'groups')
         os.makedirs(base_dir, exist_ok=True)
         
-        # Save files
+        # Convert every roster into a canonical UTF-8 CSV with a normalised
+        # phone column and a metadata sidecar, so readers never have to
+        # detect its encoding or columns again
         saved_files = []
+        failed_files = []
         for file in valid_files:
             if file and file.filename:
                 # Generate unique filename
-                filename = file.filename
+                name = os.path.splitext(file.filename)[0]
+                filename = f"{name}.csv"
                 counter = 1
                 while os.path.exists(os.path.join(base_dir, filename)):
-                    name, ext = os.path.splitext(file.filename)
-                    filename = f"{name}_{counter}{ext}"
+                    filename = f"{name}_{counter}.csv"
                     counter += 1
                 
-                # Save file
                 file_path = os.path.join(base_dir, filename)
-                file.save(file_path)
+                try:
+                    canonicalise_roster(file.read(), file.filename, file_path)
+                except Exception as e:
+                    print(f"Debug: Could not convert roster {file.filename}: {e}")
+                    for path in (file_path, file_path + ROSTER_META_SUFFIX):
+                        if os.path.exists(path):
+                            os.remove(path)
+                    failed_files.append({'filename': file.filename, 'error': str(e)})
+                    if isinstance(file, CompletedUpload):
+                        # Kept so the upload can be retried; pruned after the TTL otherwise
+                        file.close()
+                    continue
+                if isinstance(file, CompletedUpload):
+                    # The roster has been converted; the chunked upload is no longer needed
+                    file.release()
                 saved_files.append(filename)
         
+        if not saved_files:
+            return jsonify({
+                'success': False,
+                'message': 'None of the files could be read as a roster: ' +
+                           '; '.join(f"{f['filename']} ({f['error']})" for f in failed_files),
+                'files_failed': failed_files
+            }), 400
+        
+        # Cached analyses of this assembly are out of date now
+        corpus_versions.bump(assembly_name)
+        dashboard_snapshots.trigger()
+        
+        message = f'Successfully uploaded {len(saved_files)} files to {assembly_name}/groups/'
+        if failed_files:
+            message += f' ({len(failed_files)} could not be read: ' + \
+                       ', '.join(f['filename'] for f in failed_files) + ')'
+        
         return jsonify({
             'success': True,
-            'message': f'Successfully uploaded {len(saved_files)} files to {assembly_name}/groups/',
+            'message': message,
             'files_saved': saved_files,
+            'files_failed': failed_files,
             'assembly_id': assembly.id,
             'target_path': f'{assembly_name}/groups/'
         })
@@ -402,6 +463,108 @@ def upload_groups():
             'message': f'Upload failed: {str(e)}'
         }), 500
 
+# ============================================================================
+# CHUNKED UPLOAD API
+# ============================================================================
+
+def uploaded_files():
+    """Files of an upload request: multipart files[] plus the finished chunked uploads in upload_ids[]
+
+    Raises UploadError if an upload id is unknown or not fully received.
+    """
+    files = [file for file in request.files.getlist('files[]') if file and file.filename]
+    for upload_id in request.form.getlist('upload_ids[]'):
+        files.append(chunked_uploads.completed(upload_id.strip(), current_user.id))
+    return files
+
+def upload_error_response(error):
+    """JSON answer for an UploadError, with the offset to resume from when known"""
+    response = {'success': False, 'message': str(error)}
+    if error.offset is not None:
+        response['offset'] = error.offset
+    return jsonify(response), error.status
+
+@api_bp.route('/uploads', methods=['POST'])
+@login_required
+@admin_required
+def create_chunked_upload():
+    """Open a chunked upload for a file too large for one request"""
+    try:
+        data = request.get_json(silent=True) or {}
+        upload = chunked_uploads.create(current_user.id, data.get('filename'), data.get('size'), data.get('sha256'))
+        return jsonify({'success': True, **upload}), 201
+    except UploadError as e:
+        return upload_error_response(e)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Could not start upload: {str(e)}'
+        }), 500
+
+@api_bp.route('/uploads/<upload_id>', methods=['GET'])
+@login_required
+@admin_required
+def chunked_upload_status(upload_id):
+    """Bytes received so far, i.e. the offset to resume an interrupted upload from"""
+    try:
+        upload = chunked_uploads.load(upload_id, current_user.id)
+        return jsonify({'success': True, **chunked_uploads.status(upload)})
+    except UploadError as e:
+        return upload_error_response(e)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
+
+@api_bp.route('/uploads/<upload_id>', methods=['PUT'])
+@login_required
+@admin_required
+def upload_chunk(upload_id):
+    """Write the request body at ?offset=N of an upload, checked against its X-Chunk-SHA256 / X-Chunk-CRC32"""
+    try:
+        offset = request.args.get('offset', type=int)
+        if offset is None:
+            return jsonify({
+                'success': False,
+                'message': 'Missing or invalid offset'
+            }), 400
+        upload = chunked_uploads.write_chunk(
+            upload_id, current_user.id, offset, request.stream,
+            sha256=request.headers.get('X-Chunk-SHA256'),
+            crc32=request.headers.get('X-Chunk-CRC32')
+        )
+        return jsonify({'success': True, **upload})
+    except UploadError as e:
+        return upload_error_response(e)
+    except RequestEntityTooLarge:
+        return jsonify({
+            'success': False,
+            'message': f"Chunk larger than the {current_app.config['MAX_CONTENT_LENGTH']} byte request limit"
+        }), 413
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Chunk upload failed: {str(e)}'
+        }), 500
+
+@api_bp.route('/uploads/<upload_id>', methods=['DELETE'])
+@login_required
+@admin_required
+def cancel_chunked_upload(upload_id):
+    """Abandon an upload and delete what was received of it"""
+    try:
+        chunked_uploads.load(upload_id, current_user.id)
+        chunked_uploads.discard(upload_id)
+        return jsonify({'success': True, 'message': 'Upload cancelled'})
+    except UploadError as e:
+        return upload_error_response(e)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
+
 # ============================================================================
 # REPORT UPLOAD API
 # ============================================================================
@@ -437,15 +600,18 @@ def upload_reports():
                 'message': f'Invalid folder type. Must be one of: {", ".join(valid_folder_types)}'
             }), 400
         
-        # Check if files were uploaded
-        if 'files[]' not in request.files:
+        # Check if files were uploaded, directly or in chunks
+        if 'files[]' not in request.files and 'upload_ids[]' not in request.form:
             return jsonify({
                 'success': False,
                 'message': 'No files were uploaded'
             }), 400
         
-        files = request.files.getlist('files[]')
-        if not files or all(f.filename == '' for f in files):
+        try:
+            files = uploaded_files()
+        except UploadError as e:
+            return upload_error_response(e)
+        if not files:
             return jsonify({
                 'success': False,
                 'message': 'No files were selected'
@@ -499,6 +665,22 @@ def upload_reports():
         folder_date = target_date
         print(f"DEBUG: folder_date = '{folder_date}' (should be same as target_date)")
         
+        # Message reports are parsed (concurrently) and validated once, up
+        # front, so a bad file rejects the batch before anything is written
+        decoded = {}
+        if folder_type == 'messages':
+            from utils.message_store import decode_group_payloads
+            payloads = {index: file.read() for index, file in enumerate(json_files)}
+            decoded = decode_group_payloads(payloads)
+            invalid = [f'{json_files[index].filename}: {error}' for index, (_, error) in sorted(decoded.items()) if error]
+            if invalid:
+                return jsonify({
+                    'success': False,
+                    'message': f'Invalid message files: {"; ".join(invalid)}'
+                }), 400
+            for file in json_files:
+                file.stream.seek(0)
+        
         # Create base directory path using the selected date
         base_dir = os.path.join('database', assembly_name, folder_date, folder_type)
         print(f"DEBUG: base_dir = '{base_dir}'")
@@ -506,7 +688,8 @@ def upload_reports():
         
         # Save files
         saved_files = []
-        for file in json_files:
+        ingest_batch = {}
+        for index, file in enumerate(json_files):
             if file and file.filename:
                 # Generate unique filename
                 filename = file.filename
@@ -516,10 +699,30 @@ def upload_reports():
                     filename = f"{name}_{counter}{ext}"
                     counter += 1
                 
-                # Save file
+                # Save file (a chunked upload is moved into place, not copied)
                 file_path = os.path.join(base_dir, filename)
                 file.save(file_path)
                 saved_files.append(filename)
+                if index in decoded:
+                    ingest_batch[filename] = decoded[index][0]
+        
+        # Append the already parsed rows to the message store partition
+        rows_ingested = 0
+        if ingest_batch:
+            partition = message_store.ingest(assembly_name, folder_date, ingest_batch)
+            ingested = set(ingest_batch)
+            rows_ingested = sum(end - start for filename, start, end in partition.groups if filename in ingested)
+            
+            # Keep the SQL copy of the corpus in step with the store
+            try:
+                from utils.corpus_loader import load_partitions
+                load_partitions([(assembly_name, folder_date)])
+            except Exception as e:
+                print(f"Warning: Could not load {assembly_name}/{folder_date} into SQL: {e}")
+        
+        # Cached analyses of this assembly are out of date now
+        corpus_versions.bump(assembly_name)
+        dashboard_snapshots.trigger()
         
         print(f"DEBUG: Final response - selected_date: '{target_date}', folder_date: '{folder_date}'")
         print(f"DEBUG: Files saved in: {base_dir}")
@@ -529,6 +732,8 @@ def upload_reports():
             'success': True,
             'message': f'Successfully uploaded {len(saved_files)} files to {assembly_name}/{folder_date}/{folder_type}/',
             'files_saved': saved_files,
+            'files_ingested': len(ingest_batch),
+            'rows_ingested': rows_ingested,
             'assembly_id': assembly.id,
             'target_path': f'{assembly_name}/{folder_date}/{folder_type}/',
             'selected_date': target_date,
@@ -1058,6 +1263,16 @@ def health_check():
             'timestamp': datetime.utcnow().isoformat()
         }), 500
 
+@api_bp.route('/admin/cache-stats', methods=['GET'])
+@login_required
+@admin_required
+def get_cache_stats():
+    """Report hit/miss/eviction counters of the parsed-file cache"""
+    return jsonify({
+        'success': True,
+        'parsed_file_cache': parsed_file_cache.stats()
+    })
+
 @api_bp.route('/test')
 def test_endpoint():
     """Test endpoint to verify API is accessible"""
@@ -1354,116 +1569,12 @@ def download_completion_file(post_id):
 def get_dashboard_stats():
     """Get dashboard statistics - total groups and phone numbers across assemblies"""
     try:
-        import os
-        import pandas as pd
-        import warnings
-        from pathlib import Path
-        
-        # Suppress pandas and openpyxl warnings
-        warnings.filterwarnings('ignore', category=UserWarning, module='openpyxl')
-        warnings.filterwarnings('ignore', category=UserWarning, module='pandas')
-        
-        database_path = 'database'
-        stats = {
-            'total_assemblies': 0,
-            'total_groups': 0,
-            'total_phones': 0,
-            'assemblies': []
-        }
-        
-        # Check if database directory exists
-        if not os.path.exists(database_path):
-            return jsonify({
-                'success': True,
-                'stats': stats
-            })
-        
-        # Get all assembly directories
-        assembly_dirs = [d for d in os.listdir(database_path) 
-                        if os.path.isdir(os.path.join(database_path, d))]
-        
-        stats['total_assemblies'] = len(assembly_dirs)
-        
-        for assembly_name in assembly_dirs:
-            assembly_path = os.path.join(database_path, assembly_name)
-            groups_path = os.path.join(assembly_path, 'groups')
-            
-            assembly_stats = {
-                'name': assembly_name,
-                'groups_count': 0,
-                'phones_count': 0,
-                'groups': []
-            }
-            
-            # Check if groups directory exists
-            if os.path.exists(groups_path):
-                # Get all CSV files in groups directory
-                csv_files = [f for f in os.listdir(groups_path) 
-                             if f.lower().endswith('.csv')]
-                
-                assembly_stats['groups_count'] = len(csv_files)
-                stats['total_groups'] += len(csv_files)
-                
-                # Process each CSV file to count phone numbers
-                for csv_file in csv_files:
-                    file_path = os.path.join(groups_path, csv_file)
-                    file_stats = {
-                        'name': csv_file,
-                        'phones_count': 0
-                    }
-                    
-                    try:
-                        # Read CSV file to count phone numbers with better error handling
-                        # For CSV files, try different encodings
-                        try:
-                            df = pd.read_csv(file_path, encoding='utf-8')
-                        except UnicodeDecodeError:
-                            try:
-                                df = pd.read_csv(file_path, encoding='latin-1')
-                            except:
-                                df = pd.read_csv(file_path, encoding='cp1252')
-                        
-                        # Look for phone number columns (common names)
-                        phone_columns = []
-                        for col in df.columns:
-                            col_lower = str(col).lower()
-                            if any(keyword in col_lower for keyword in ['phone', 'number', 'mobile', 'contact', 'whatsapp']):
-                                phone_columns.append(col)
-                        
-                        if phone_columns:
-                            # Count unique phone numbers in the first phone column found
-                            phone_col = phone_columns[0]
-                            # Remove empty rows and rows with all NaN values
-                            df_clean = df.dropna(subset=[phone_col])
-                            phone_count = df_clean[phone_col].nunique()
-                            print(f"Debug: Found {phone_count} unique phone numbers in column '{phone_col}' for {csv_file}")
-                        else:
-                            # If no phone columns found, count rows (excluding header)
-                            df_clean = df.dropna(how='all')
-                            phone_count = len(df_clean)
-                            
-                            # If we have very few rows, it might be a header-only file
-                            if phone_count <= 1:
-                                phone_count = 0
-                            print(f"Debug: No phone columns found, counted {phone_count} rows for {csv_file}")
-                        
-                        file_stats['phones_count'] = phone_count
-                        assembly_stats['phones_count'] += phone_count
-                        stats['total_phones'] += phone_count
-                        
-                    except Exception as e:
-                        # If file can't be read, assume 0 phones and log error
-                        file_stats['phones_count'] = 0
-                        print(f"Warning: Could not read {file_path}: {str(e)}")
-                        # Continue processing other files
-                    
-                    assembly_stats['groups'].append(file_stats)
-            
-            stats['assemblies'].append(assembly_stats)
-        
+        # Served from the snapshot kept current by the background refresher
+        snapshot = dashboard_snapshots.latest()
         return jsonify({
             'success': True,
-            'stats': stats
+            'stats': snapshot['stats'],
+            'generated_at': snapshot['generated_at']
         })
         
     except Exception as e:
@@ -1477,84 +1588,12 @@ def get_dashboard_stats():
 def get_accurate_dashboard_stats():
     """Get accurate dashboard statistics using the same logic as assembly-groups"""
     try:
-        import os
-        import pandas as pd
-        import warnings
-        from pathlib import Path
-        
-        # Suppress pandas and openpyxl warnings
-        warnings.filterwarnings('ignore', category=UserWarning, module='openpyxl')
-        warnings.filterwarnings('ignore', category=UserWarning, module='pandas')
-        
-        database_path = 'database'
-        stats = {
-            'total_assemblies': 0,
-            'total_groups': 0,
-            'total_phones': 0,
-            'assemblies': []
-        }
-        
-        # Check if database directory exists
-        if not os.path.exists(database_path):
-            return jsonify({
-                'success': True,
-                'stats': stats
-            })
-        
-        # Get all assembly directories
-        assembly_dirs = [d for d in os.listdir(database_path) 
-                        if os.path.isdir(os.path.join(database_path, d))]
-        
-        stats['total_assemblies'] = len(assembly_dirs)
-        
-        for assembly_name in assembly_dirs:
-            assembly_path = os.path.join(database_path, assembly_name)
-            groups_path = os.path.join(assembly_path, 'groups')
-            
-            assembly_stats = {
-                'name': assembly_name,
-                'groups_count': 0,
-                'phones_count': 0,
-                'groups': []
-            }
-            
-            # Check if groups directory exists
-            if os.path.exists(groups_path):
-                # Get all CSV files in groups directory
-                csv_files = [f for f in os.listdir(groups_path) 
-                             if f.lower().endswith('.csv')]
-                
-                assembly_stats['groups_count'] = len(csv_files)
-                stats['total_groups'] += len(csv_files)
-                
-                # Process each CSV file to count phone numbers
-                for csv_file in csv_files:
-                    file_path = os.path.join(groups_path, csv_file)
-                    file_stats = {
-                        'name': csv_file,
-                        'phones_count': 0
-                    }
-                    
-                    try:
-                        # Use the same logic as assembly-groups endpoint
-                        estimated_phones = estimate_phone_count_from_file(file_path)
-                        file_stats['phones_count'] = estimated_phones
-                        assembly_stats['phones_count'] += estimated_phones
-                        stats['total_phones'] += estimated_phones
-                        
-                    except Exception as e:
-                        # If file can't be read, assume 0 phones and log error
-                        file_stats['phones_count'] = 0
-                        print(f"Warning: Could not read {file_path}: {str(e)}")
-                        # Continue processing other files
-                    
-                    assembly_stats['groups'].append(file_stats)
-            
-            stats['assemblies'].append(assembly_stats)
-        
+        # Served from the snapshot kept current by the background refresher
+        snapshot = dashboard_snapshots.latest()
         return jsonify({
             'success': True,
-            'stats': stats
+            'stats': snapshot['accurate_stats'],
+            'generated_at': snapshot['generated_at']
         })
         
     except Exception as e:
@@ -1574,22 +1613,11 @@ def get_assembly_dates(assembly_name):
         if not os.path.exists(assembly_path):
             return jsonify({'success': False, 'message': 'Assembly not found'}), 404
         
-        date_dirs = []
         try:
-            assembly_contents = os.listdir(assembly_path)
-            for item in assembly_contents:
-                item_path = os.path.join(assembly_path, item)
-                if os.path.isdir(item_path):
-                    try:
-                        date_obj = datetime.strptime(item, '%Y-%m-%d')
-                        date_dirs.append(item)
-                    except ValueError:
-                        continue
+            date_dirs = list(partition_resolver.dates(assembly_name))
         except Exception as e:
             return jsonify({'success': False, 'message': f'Error reading assembly: {str(e)}'}), 500
         
-        date_dirs.sort()
-        
         return jsonify({
             'success': True,
             'assembly_name': assembly_name,
@@ -1626,46 +1654,50 @@ def get_assembly_messages(assembly_name):
         except ValueError:
             return jsonify({'success': False, 'message': 'Invalid date format'}), 400
         
+        date_dirs = partition_resolver.dates_in_range(assembly_name, start_date, end_date)
+        
+        if request.args.get('format') == 'ndjson':
+            # One JSON message per line as files are decoded, then a summary record
+            def generate():
+                groups = {}
+                total_messages = 0
+                try:
+                    for date_dir in date_dirs:
+                        for message in iter_messages_directory(os.path.join(assembly_path, date_dir),
+                                                               sentiment, cached=False):
+                            group_name = message_group_name(message)
+                            if group_name not in groups:
+                                groups[group_name] = {'name': group_name, 'count': 0}
+                            groups[group_name]['count'] += 1
+                            total_messages += 1
+                            yield json.dumps(message, ensure_ascii=False) + '\n'
+                except Exception as e:
+                    print(f"Debug: Error streaming messages for {assembly_name}: {e}")
+                    yield json.dumps({'error': f'Error: {str(e)}'}) + '\n'
+                    return
+                
+                yield json.dumps({'summary': {
+                    'assembly_name': assembly_name,
+                    'start_date': start_date,
+                    'end_date': end_date,
+                    'sentiment': sentiment,
+                    'total_messages': total_messages,
+                    'total_groups': len(groups),
+                    'groups': groups
+                }}, ensure_ascii=False) + '\n'
+            
+            return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        
         messages = []
         
-        # Scan date directories
-        try:
-            assembly_contents = os.listdir(assembly_path)
-            for item in assembly_contents:
-                item_path = os.path.join(assembly_path, item)
-                if os.path.isdir(item_path):
-                    try:
-                        date_obj = datetime.strptime(item, '%Y-%m-%d')
-                        
-                        # Check if date is within range
-                        if not end_date_obj:
-                            # If no end date, check if date matches start date exactly
-                            if date_obj == start_date_obj:
-                                messages.extend(scan_messages_directory(item_path, sentiment))
-                        else:
-                            # If end date provided, check if date is within range (inclusive)
-                            if start_date_obj <= date_obj <= end_date_obj:
-                                messages.extend(scan_messages_directory(item_path, sentiment))
-                                
-                    except ValueError:
-                        continue
-        except Exception as e:
-            return jsonify({'success': False, 'message': f'Error reading assembly: {str(e)}'}), 500
+        # Scan date directories within the requested range
+        for date_dir in date_dirs:
+            messages.extend(scan_messages_directory(os.path.join(assembly_path, date_dir), sentiment))
         
         # Group messages by group name for better analytics
         groups = {}
         for message in messages:
-            # Extract group name from file path
-            file_path = message.get('file_path', '')
-            if file_path:
-                # Extract filename from path and remove .json extension
-                filename = os.path.basename(file_path)
-                if filename.endswith('.json'):
-                    group_name = filename[:-5]  # Remove .json extension
-                else:
-                    group_name = filename
-            else:
-                group_name = message.get('group_name', 'Unknown Group')
+            group_name = message_group_name(message)
             
             if group_name not in groups:
                 groups[group_name] = {
@@ -1689,53 +1721,59 @@ def get_assembly_messages(assembly_name):
     except Exception as e:
         return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 500
 
-def scan_messages_directory(date_path, sentiment):
-    """Scan messages directory and return message data"""
-    messages = []
+def iter_messages_directory(date_path, sentiment, cached=True):
+    """Yield the messages of a date directory one by one, tagged with their file_path
+
+    With cached=False files are decoded directly instead of through the
+    parsed-file cache, so only one file is held in memory at a time.
+    """
     messages_dir = os.path.join(date_path, 'messages')
     
     if not os.path.exists(messages_dir):
-        return messages
+        return
     
     try:
-        for filename in os.listdir(messages_dir):
-            if filename.endswith('.json'):
-                file_path = os.path.join(messages_dir, filename)
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        
-                        # Filter by sentiment if specified
-                        if sentiment != 'all':
-                            if isinstance(data, list):
-                                # If data is a list of messages
-                                for msg in data:
-                                    if msg.get('predicted_sentiment', '').lower() == sentiment.lower():
-                                        msg['file_path'] = os.path.relpath(file_path, 'database')
-                                        messages.append(msg)
-                            else:
-                                # If data is a single message
-                                if data.get('predicted_sentiment', '').lower() == sentiment.lower():
-                                    data['file_path'] = os.path.relpath(file_path, 'database')
-                                    messages.append(data)
-                        else:
-                            # Include all messages
-                            if isinstance(data, list):
-                                for msg in data:
-                                    msg['file_path'] = os.path.relpath(file_path, 'database')
-                                    messages.append(msg)
-                            else:
-                                data['file_path'] = os.path.relpath(file_path, 'database')
-                                messages.append(data)
-                                
-                except (json.JSONDecodeError, IOError) as e:
-                    print(f"Error reading {file_path}: {e}")
-                    continue
-                    
+        filenames = os.listdir(messages_dir)
     except Exception as e:
         print(f"Error scanning messages directory {messages_dir}: {e}")
+        return
     
-    return messages
+    for filename in filenames:
+        if not filename.endswith('.json'):
+            continue
+        file_path = os.path.join(messages_dir, filename)
+        try:
+            # Cached objects are shared, so tag copies with file_path
+            if cached:
+                data = load_json(file_path)
+            else:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"Error reading {file_path}: {e}")
+            continue
+        relative_path = os.path.relpath(file_path, 'database')
+        
+        for msg in (data if isinstance(data, list) else [data]):
+            # Filter by sentiment if specified
+            if sentiment != 'all' and msg.get('predicted_sentiment', '').lower() != sentiment.lower():
+                continue
+            yield dict(msg, file_path=relative_path)
+
+def scan_messages_directory(date_path, sentiment):
+    """Scan messages directory and return message data"""
+    return list(iter_messages_directory(date_path, sentiment))
+
+def message_group_name(message):
+    """Group name of a message from get_assembly_messages (its JSON filename)"""
+    file_path = message.get('file_path', '')
+    if file_path:
+        # Extract filename from path and remove .json extension
+        filename = os.path.basename(file_path)
+        if filename.endswith('.json'):
+            return filename[:-5]
+        return filename
+    return message.get('group_name', 'Unknown Group')
 
 @api_bp.route('/analyze-json-files', methods=['POST'])
 @login_required
@@ -1825,100 +1863,34 @@ def analyze_json_files():
                 print(f"Debug: Assembly directory does not exist: {assembly_path}")
                 continue
             
-            # Get all date directories in assembly
-            date_dirs = []
-            try:
-                assembly_contents = os.listdir(assembly_path)
-                print(f"Debug: Assembly contents: {assembly_contents}")
-                
-                for item in assembly_contents:
-                    item_path = os.path.join(assembly_path, item)
-                    if os.path.isdir(item_path):
-                        try:
-                            # Try to parse as date
-                            date_obj = datetime.strptime(item, '%Y-%m-%d')
-                            
-                            # Check if date is within range - FIXED LOGIC
-                            if not end_date_obj:
-                                # If no end date, check if date matches start date exactly
-                                if date_obj == start_date_obj:
-                                    date_dirs.append((item, date_obj))
-                                    print(f"Debug: Added date directory (exact match): {item}")
-                            else:
-                                # If end date provided, check if date is within range (inclusive)
-                                if start_date_obj <= date_obj <= end_date_obj:
-                                    date_dirs.append((item, date_obj))
-                                    print(f"Debug: Added date directory (range): {item}")
-                        except ValueError:
-                            # Skip non-date directories
-                            print(f"Debug: Skipping non-date directory: {item}")
-                            continue
-            except Exception as e:
-                print(f"Debug: Error reading assembly directory {assembly_path}: {e}")
-                continue
-            
-            # Sort dates
-            date_dirs.sort(key=lambda x: x[1])
-            print(f"Debug: Sorted date directories: {[d[0] for d in date_dirs]}")
+            # Date partitions of this assembly within the requested range
+            date_dirs = partition_resolver.dates_in_range(assembly_name, start_date, end_date)
+            print(f"Debug: Matching date directories: {date_dirs}")
             
             assembly_total = 0
             assembly_sentiment_counts = {'Positive': 0, 'Negative': 0, 'Neutral': 0}
             
-            for date_str, date_obj in date_dirs:
-                messages_path = os.path.join(assembly_path, date_str, 'messages')
-                print(f"Debug: Checking messages path: {messages_path}")
-                print(f"Debug: Messages path exists: {os.path.exists(messages_path)}")
+            # Count files and sentiments of every date partition in parallel
+            partitions = [(assembly_name, date_str) for date_str in date_dirs]
+            for partition_summary in scan_partitions(partitions, scan_sentiment_counts):
+                json_files = partition_summary['json_files']
+                json_count = len(json_files)
+                print(f"Debug: Found {json_count} JSON files in {assembly_name}/{partition_summary['date']}")
                 
-                if os.path.exists(messages_path):
-                    try:
-                        # Count JSON files in messages directory
-                        messages_contents = os.listdir(messages_path)
-                        print(f"Debug: Messages directory contents: {messages_contents}")
-                        
-                        json_files = [f for f in messages_contents 
-                                    if f.lower().endswith('.json')]
-                        
-                        json_count = len(json_files)
-                        print(f"Debug: Found {json_count} JSON files in {messages_path}")
-                        
-                        assembly_total += json_count
-                        results['total_json_files'] += json_count
-                        
-                        # Analyze sentiment in JSON files
-                        for json_file in json_files:
-                            try:
-                                file_path = os.path.join(messages_path, json_file)
-                                with open(file_path, 'r', encoding='utf-8') as f:
-                                    data = json.load(f)
-                                    
-                                    # Process sentiment data
-                                    if isinstance(data, list):
-                                        for msg in data:
-                                            sentiment_value = msg.get('predicted_sentiment', 'Neutral')
-                                            if sentiment_value in ['Positive', 'Negative', 'Neutral']:
-                                                assembly_sentiment_counts[sentiment_value] += 1
-                                                results['sentiment_breakdown'][sentiment_value] += 1
-                                    else:
-                                        sentiment_value = data.get('predicted_sentiment', 'Neutral')
-                                        if sentiment_value in ['Positive', 'Negative', 'Neutral']:
-                                            assembly_sentiment_counts[sentiment_value] += 1
-                                            results['sentiment_breakdown'][sentiment_value] += 1
-                            except Exception as e:
-                                print(f"Debug: Error reading sentiment from {json_file}: {e}")
-                                continue
-                        
-                        # Add to detailed results
-                        results['detailed_results'].append({
-                            'assembly_name': assembly_name,
-                            'date': date_str,
-                            'json_count': json_count,
-                            'json_files': json_files
-                        })
-                    except Exception as e:
-                        print(f"Debug: Error reading messages directory {messages_path}: {e}")
-                        continue
-                else:
-                    print(f"Debug: Messages directory does not exist: {messages_path}")
+                assembly_total += json_count
+                results['total_json_files'] += json_count
+                
+                for sentiment_value, count in partition_summary['sentiment_counts'].items():
+                    assembly_sentiment_counts[sentiment_value] += count
+                    results['sentiment_breakdown'][sentiment_value] += count
+                
+                # Add to detailed results
+                results['detailed_results'].append({
+                    'assembly_name': assembly_name,
+                    'date': partition_summary['date'],
+                    'json_count': json_count,
+                    'json_files': json_files
+                })
             
             # Add to assembly breakdown (even if no files found, show the assembly)
             if not end_date_obj:
@@ -1964,6 +1936,7 @@ def group_sender_analysis():
         start_date = data.get('startDate')
         end_date = data.get('endDate')
         sentiment_filter = data.get('sentiment', 'all')
+        include_sender_details = data.get('includeSenderDetails', False)
         
         if not assemblies:
             return jsonify({
@@ -1977,93 +1950,34 @@ def group_sender_analysis():
                 'message': 'Start date is required'
             }), 400
         
-        results = {
-            'total_groups': 0,
-            'total_unique_senders': 0,
-            'total_messages': 0,
-            'group_analysis': []
+        params = {
+            'assemblies': assemblies,
+            'startDate': normalise_date(start_date) or start_date,
+            'endDate': normalise_date(end_date) or end_date,
+            'sentiment': sentiment_filter.lower(),
+            'includeSenderDetails': bool(include_sender_details)
         }
-        
-        for assembly_name in assemblies:
-            assembly_path = os.path.join('database', assembly_name)
-            if not os.path.exists(assembly_path):
-                continue
-            
-            # Get all date directories
-            date_dirs = []
-            for item in os.listdir(assembly_path):
-                item_path = os.path.join(assembly_path, item)
-                if os.path.isdir(item_path) and os.path.basename(item_path).count('-') == 2:
-                    date_dirs.append(item)
-            
-            # Filter dates based on start and end date
-            if end_date:
-                # Date range: include dates between start and end (inclusive)
-                filtered_dates = []
-                for date_dir in date_dirs:
-                    try:
-                        date_obj = datetime.strptime(date_dir, '%Y-%m-%d')
-                        start_obj = datetime.strptime(start_date, '%Y-%m-%d')
-                        end_obj = datetime.strptime(end_date, '%Y-%m-%d')
-                        
-                        if start_obj <= date_obj <= end_obj:
-                            filtered_dates.append(date_dir)
-                    except ValueError:
-                        continue
-            else:
-                # Single date: exact match only
-                filtered_dates = [start_date] if start_date in date_dirs else []
-            
-            for date_dir in filtered_dates:
-                messages_path = os.path.join(assembly_path, date_dir, 'messages')
-                if not os.path.exists(messages_path):
-                    continue
-                
-                # Get all JSON files (groups) in this date directory
-                json_files = [f for f in os.listdir(messages_path) if f.endswith('.json')]
-                
-                for json_file in json_files:
-                    group_name = json_file.replace('.json', '')
-                    file_path = os.path.join(messages_path, json_file)
-                    
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                            
-                        if isinstance(data, list):
-                            # Analyze group messages
-                            group_stats = analyze_group_messages(data, sentiment_filter)
-                            
-                            if group_stats['total_messages'] > 0:
-                                results['total_groups'] += 1
-                                results['total_messages'] += group_stats['total_messages']
-                                results['total_unique_senders'] += group_stats['unique_senders']
-                                
-                                # Add group analysis
-                                group_analysis = {
-                                    'assembly': assembly_name,
-                                    'date': date_dir,
-                                    'group_name': group_name,
-                                    'total_messages': group_stats['total_messages'],
-                                    'unique_senders': group_stats['unique_senders'],
-                                    'top_sender': group_stats['top_sender'],
-                                    'sentiment_breakdown': group_stats['sentiment_breakdown'],
-                                    'label_breakdown': group_stats['label_breakdown'],
-                                    'sender_details': group_stats['sender_details']
-                                }
-                                
-                                results['group_analysis'].append(group_analysis)
-                    
-                    except Exception as e:
-                        print(f"Debug: Error analyzing group {group_name}: {e}")
-                        continue
-        
-        # Sort groups by total messages (highest to lowest)
-        results['group_analysis'].sort(key=lambda x: x['total_messages'], reverse=True)
+        cache_key = result_cache.key('group-sender-analysis', params, assemblies)
+        analysis = result_cache.get(cache_key)
+        cached = analysis is not None
+        
+        if not cached:
+            # The session only records what was analysed and the state of the
+            # reports it saw; exports recompute from it while that is unchanged
+            partitions = partition_resolver.resolve(assemblies, start_date, end_date)
+            corpus_version = message_store.corpus_signature(partitions)
+            analysis = {
+                'results': group_sender_results(params),
+                'analysis_id': create_analysis_session('group-sender-analysis', params,
+                                                       {'corpus_version': corpus_version})
+            }
+            result_cache.put(cache_key, analysis)
         
         return jsonify({
             'success': True,
-            'results': results
+            'results': analysis['results'],
+            'analysis_id': analysis['analysis_id'],
+            'cached': cached
         })
         
     except Exception as e:
@@ -2072,6 +1986,51 @@ def group_sender_analysis():
             'message': f'Error during group sender analysis: {str(e)}'
         }), 500
 
+def group_sender_results(params):
+    """Results of a group sender analysis for its normalised parameters"""
+    results = {
+        'total_groups': 0,
+        'total_unique_senders': 0,
+        'total_messages': 0,
+        'group_analysis': []
+    }
+    
+    # Sum the per-group rollups of the matching partitions; per-sender
+    # message lists still need a scan of the messages themselves
+    partitions = partition_resolver.resolve(params['assemblies'], params['startDate'], params['endDate'])
+    scan_fn = scan_group_senders if params['includeSenderDetails'] else scan_group_rollups
+    scan = partial(scan_fn, sentiment_filter=params['sentiment'])
+    for group_analyses in scan_partitions(partitions, scan):
+        for group_analysis in group_analyses:
+            results['total_groups'] += 1
+            results['total_messages'] += group_analysis['total_messages']
+            results['total_unique_senders'] += group_analysis['unique_senders']
+            results['group_analysis'].append(group_analysis)
+    
+    # Sort groups by total messages (highest to lowest)
+    results['group_analysis'].sort(key=lambda x: x['total_messages'], reverse=True)
+    return results
+
+def load_group_sender_session(analysis_id):
+    """Parameters of a group sender analysis as (params, error response)
+
+    Fails if the analysis expired or the reports it covered changed since it ran.
+    """
+    session = analysis_sessions.load(analysis_id, 'group-sender-analysis')
+    if session is None:
+        return None, (jsonify({
+            'success': False,
+            'message': 'Analysis not found or expired, please run the analysis again'
+        }), 404)
+    params = session['params']
+    partitions = partition_resolver.resolve(params['assemblies'], params['startDate'], params['endDate'])
+    if message_store.corpus_signature(partitions) != session['data'].get('corpus_version'):
+        return None, (jsonify({
+            'success': False,
+            'message': 'The reports changed since this analysis ran, please run the analysis again'
+        }), 409)
+    return params, None
+
 @api_bp.route('/common-members-analysis', methods=['POST'])
 @login_required
 def common_members_analysis():
@@ -2095,129 +2054,55 @@ def common_members_analysis():
                 'message': 'Start date is required'
             }), 400
         
-        # Dictionary to track members across groups
-        member_groups = {}  # phone -> {name, groups: [], total_messages: 0, sentiment_counts: {}}
-        
-        for assembly_name in assemblies:
-            assembly_path = os.path.join('database', assembly_name)
-            if not os.path.exists(assembly_path):
-                continue
-            
-            # Get all date directories
-            date_dirs = []
-            for item in os.listdir(assembly_path):
-                item_path = os.path.join(assembly_path, item)
-                if os.path.isdir(item_path) and os.path.basename(item_path).count('-') == 2:
-                    date_dirs.append(item)
-            
-            # Filter dates based on start and end date
-            if end_date:
-                # Date range: include dates between start and end (inclusive)
-                filtered_dates = []
-                for date_dir in date_dirs:
-                    try:
-                        date_obj = datetime.strptime(date_dir, '%Y-%m-%d')
-                        start_obj = datetime.strptime(start_date, '%Y-%m-%d')
-                        end_obj = datetime.strptime(end_date, '%Y-%m-%d')
-                        
-                        if start_obj <= date_obj <= end_obj:
-                            filtered_dates.append(date_dir)
-                    except ValueError:
-                        continue
-            else:
-                # Single date: exact match only
-                filtered_dates = [start_date] if start_date in date_dirs else []
-            
-            for date_dir in filtered_dates:
-                messages_path = os.path.join(assembly_path, date_dir, 'messages')
-                if not os.path.exists(messages_path):
-                    continue
-                
-                # Get all JSON files (groups) in this date directory
-                json_files = [f for f in os.listdir(messages_path) if f.endswith('.json')]
-                
-                for json_file in json_files:
-                    group_name = json_file.replace('.json', '')
-                    file_path = os.path.join(messages_path, json_file)
-                    
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                            
-                        if isinstance(data, list):
-                            # Process messages for common members analysis
-                            for msg in data:
-                                sender = msg.get('sender', {})
-                                phone_number = sender.get('phoneNumber', '')
-                                sender_name = msg.get('sender', {}).get('name', 'Unknown')
-                                
-                                if not phone_number:
-                                    continue
-                                
-                                # Apply sentiment filter
-                                if sentiment_filter != 'all':
-                                    msg_sentiment = msg.get('predicted_sentiment', 'Neutral')
-                                    if msg_sentiment.lower() != sentiment_filter.lower():
-                                        continue
-                                
-                                # Initialize member if not exists
-                                if phone_number not in member_groups:
-                                    member_groups[phone_number] = {
-                                        'name': sender_name,
-                                        'phone': phone_number,
-                                        'groups': [],
-                                        'total_messages': 0,
-                                        'sentiment_counts': {'Positive': 0, 'Negative': 0, 'Neutral': 0}
-                                    }
-                                
-                                # Add group if not already added
-                                group_info = f"{assembly_name}/{date_dir}/{group_name}"
-                                if group_info not in member_groups[phone_number]['groups']:
-                                    member_groups[phone_number]['groups'].append(group_info)
-                                
-                                # Count messages
-                                member_groups[phone_number]['total_messages'] += 1
-                                
-                                # Count sentiments
-                                sentiment = msg.get('predicted_sentiment', 'Neutral')
-                                if sentiment in member_groups[phone_number]['sentiment_counts']:
-                                    member_groups[phone_number]['sentiment_counts'][sentiment] += 1
-                    
-                    except Exception as e:
-                        print(f"Debug: Error analyzing group {group_name}: {e}")
-                        continue
-        
-        # Filter members who are in multiple groups (2 or more)
-        common_members = []
-        for phone, member_data in member_groups.items():
-            if len(member_data['groups']) >= 2:  # At least 2 groups
-                common_members.append({
-                    'name': member_data['name'],
-                    'phone': member_data['phone'],
-                    'groups_count': len(member_data['groups']),
-                    'group_names': member_data['groups'],
-                    'total_messages': member_data['total_messages'],
-                    'sentiment_breakdown': member_data['sentiment_counts']
-                })
-        
-        # Sort by groups count (highest to lowest), then by total messages
-        common_members.sort(key=lambda x: (x['groups_count'], x['total_messages']), reverse=True)
-        
-        # Calculate summary statistics
-        total_common_members = len(common_members)
-        max_groups_per_member = max([m['groups_count'] for m in common_members]) if common_members else 0
-        total_crossings = sum([m['groups_count'] for m in common_members])
+        try:
+            min_groups = max(int(data.get('minGroups', 2)), 1)
+        except (TypeError, ValueError):
+            return jsonify({
+                'success': False,
+                'message': 'minGroups must be a whole number'
+            }), 400
         
-        results = {
-            'total_common_members': total_common_members,
-            'max_groups_per_member': max_groups_per_member,
-            'total_crossings': total_crossings,
-            'common_members': common_members
+        params = {
+            'assemblies': assemblies,
+            'startDate': normalise_date(start_date) or start_date,
+            'endDate': normalise_date(end_date) or end_date,
+            'sentiment': sentiment_filter.lower(),
+            'minGroups': min_groups
         }
+        cache_key = result_cache.key('common-members-analysis', params, assemblies)
+        analysis = result_cache.get(cache_key)
+        cached = analysis is not None
+        
+        if not cached:
+            # Build the phone x group incidence of the matching partitions and
+            # rank members in at least min_groups groups (by groups, then messages)
+            partitions = partition_resolver.resolve(assemblies, start_date, end_date)
+            scan = partial(partition_memberships, sentiment_filter=sentiment_filter)
+            membership = MembershipMatrix(scan_partitions(partitions, scan))
+            common_members = membership.common_members(min_groups)
+            
+            # Calculate summary statistics
+            total_common_members = len(common_members)
+            max_groups_per_member = max([m['groups_count'] for m in common_members]) if common_members else 0
+            total_crossings = sum([m['groups_count'] for m in common_members])
+            
+            results = {
+                'total_common_members': total_common_members,
+                'max_groups_per_member': max_groups_per_member,
+                'total_crossings': total_crossings,
+                'common_members': common_members
+            }
+            analysis = {
+                'analysis_id': create_analysis_session('common-members-analysis', params, {'results': results}),
+                'results': results
+            }
+            result_cache.put(cache_key, analysis)
         
         return jsonify({
             'success': True,
-            'results': results
+            'results': analysis['results'],
+            'analysis_id': analysis['analysis_id'],
+            'cached': cached
         })
         
     except Exception as e:
@@ -2226,198 +2111,129 @@ def common_members_analysis():
             'message': f'Error during common members analysis: {str(e)}'
         }), 500
 
-@api_bp.route('/export-common-members-excel', methods=['POST'])
+@api_bp.route('/result-cache-stats', methods=['GET'])
 @login_required
-def export_common_members_excel():
+@admin_required
+def result_cache_stats():
+    """Hit, miss, expiry and eviction counters of the analysis result cache"""
+    return jsonify({
+        'success': True,
+        'stats': result_cache.stats()
+    })
+
+@api_bp.route('/analysis-sessions/<analysis_id>', methods=['GET'])
+@login_required
+def get_analysis_session(analysis_id):
+    """Results and parameters of a stored analysis snapshot"""
+    session = analysis_sessions.load(analysis_id)
+    if session is None:
+        return jsonify({
+            'success': False,
+            'message': 'Analysis not found or expired, please run the analysis again'
+        }), 404
+    
+    results = session['data'].get('results')
+    if session['kind'] == 'group-sender-analysis':
+        # Recomputed from the rollups, which is as cheap as reading a snapshot
+        params, error = load_group_sender_session(analysis_id)
+        if error:
+            return error
+        cache_key = result_cache.key('group-sender-analysis', params, params['assemblies'])
+        analysis = result_cache.get(cache_key)
+        results = analysis['results'] if analysis is not None else group_sender_results(params)
+    
+    return jsonify({
+        'success': True,
+        'analysis_id': session['id'],
+        'kind': session['kind'],
+        'params': session['params'],
+        'created_at': datetime.fromtimestamp(session['created_at']).isoformat(),
+        'results': results
+    })
+
+@api_bp.route('/export-common-members-excel', methods=['POST'])
+@login_required
+def export_common_members_excel():
     """Export common members analysis as Excel file with specific format"""
     try:
-        import pandas as pd
-        from io import BytesIO
-        
         data = request.get_json()
+        export_fmt = export_format(data.get('format'))
+        if export_fmt is None:
+            return unsupported_export_format()
+        
         assemblies = data.get('assemblies', [])
         start_date = data.get('startDate')
         end_date = data.get('endDate')
         sentiment_filter = data.get('sentiment', 'all')
-        
-        if not assemblies:
-            return jsonify({
-                'success': False,
-                'message': 'Please select at least one assembly'
-            }), 400
-        
-        if not start_date:
-            return jsonify({
-                'success': False,
-                'message': 'Start date is required'
-            }), 400
-        
-        # Dictionary to track members across groups
-        member_groups = {}  # phone -> {name, groups: [], total_messages: 0, sentiment_counts: {}}
-        
-        for assembly_name in assemblies:
-            assembly_path = os.path.join('database', assembly_name)
-            if not os.path.exists(assembly_path):
-                continue
-            
-            # Get all date directories
-            date_dirs = []
-            for item in os.listdir(assembly_path):
-                item_path = os.path.join(assembly_path, item)
-                if os.path.isdir(item_path) and os.path.basename(item_path).count('-') == 2:
-                    date_dirs.append(item)
-            
-            # Filter dates based on start and end date
-            if end_date:
-                # Date range: include dates between start and end (inclusive)
-                filtered_dates = []
-                for date_dir in date_dirs:
-                    try:
-                        date_obj = datetime.strptime(date_dir, '%Y-%m-%d')
-                        start_obj = datetime.strptime(start_date, '%Y-%m-%d')
-                        end_obj = datetime.strptime(end_date, '%Y-%m-%d')
-                        
-                        if start_obj <= date_obj <= end_obj:
-                            filtered_dates.append(date_dir)
-                    except ValueError:
-                        continue
-            else:
-                # Single date: exact match only
-                filtered_dates = [start_date] if start_date in date_dirs else []
+        analysis_id = data.get('analysisId')
+        
+        if analysis_id:
+            # Export exactly what the analysis showed, from its snapshot
+            session = analysis_sessions.load(analysis_id, 'common-members-analysis')
+            if session is None:
+                return jsonify({
+                    'success': False,
+                    'message': 'Analysis not found or expired, please run the analysis again'
+                }), 404
+            common_members = session['data']['results']['common_members']
+        else:
+            if not assemblies:
+                return jsonify({
+                    'success': False,
+                    'message': 'Please select at least one assembly'
+                }), 400
+            
+            if not start_date:
+                return jsonify({
+                    'success': False,
+                    'message': 'Start date is required'
+                }), 400
             
-            for date_dir in filtered_dates:
-                messages_path = os.path.join(assembly_path, date_dir, 'messages')
-                if not os.path.exists(messages_path):
-                    continue
-                
-                # Get all JSON files (groups) in this date directory
-                json_files = [f for f in os.listdir(messages_path) if f.endswith('.json')]
+            try:
+                min_groups = max(int(data.get('minGroups', 2)), 1)
+            except (TypeError, ValueError):
+                return jsonify({
+                    'success': False,
+                    'message': 'minGroups must be a whole number'
+                }), 400
+            
+            # Build the phone x group incidence of the matching partitions and
+            # rank members in at least min_groups groups (by groups, then messages)
+            partitions = partition_resolver.resolve(assemblies, start_date, end_date)
+            scan = partial(partition_memberships, sentiment_filter=sentiment_filter)
+            membership = MembershipMatrix(scan_partitions(partitions, scan))
+            common_members = membership.common_members(min_groups)
+        
+        # Stream the ranked members into the workbook row by row
+        headers = ['Rank', 'Member Name', 'Phone Number', 'Groups Count', 'Group Names']
+        
+        def rows():
+            for rank, member in enumerate(common_members, 1):
+                # Format group names for better readability
+                formatted_group_names = []
+                for group_info in member['group_names']:
+                    parts = group_info.split('/')
+                    if len(parts) >= 3:
+                        # Format as "Assembly - Group Name"
+                        formatted_group_names.append(f"{parts[0]} - {parts[2]}")
+                    else:
+                        formatted_group_names.append(group_info)
                 
-                for json_file in json_files:
-                    group_name = json_file.replace('.json', '')
-                    file_path = os.path.join(messages_path, json_file)
-                    
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                            
-                        if isinstance(data, list):
-                            # Process messages for common members analysis
-                            for msg in data:
-                                sender = msg.get('sender', {})
-                                phone_number = sender.get('phoneNumber', '')
-                                sender_name = msg.get('sender', {}).get('name', 'Unknown')
-                                
-                                if not phone_number:
-                                    continue
-                                
-                                # Apply sentiment filter
-                                if sentiment_filter != 'all':
-                                    msg_sentiment = msg.get('predicted_sentiment', 'Neutral')
-                                    if msg_sentiment.lower() != sentiment_filter.lower():
-                                        continue
-                                
-                                # Initialize member if not exists
-                                if phone_number not in member_groups:
-                                    member_groups[phone_number] = {
-                                        'name': sender_name,
-                                        'phone': phone_number,
-                                        'groups': [],
-                                        'total_messages': 0,
-                                        'sentiment_counts': {'Positive': 0, 'Negative': 0, 'Neutral': 0}
-                                    }
-                                
-                                # Add group if not already added
-                                group_info = f"{assembly_name}/{date_dir}/{group_name}"
-                                if group_info not in member_groups[phone_number]['groups']:
-                                    member_groups[phone_number]['groups'].append(group_info)
-                                
-                                # Count messages
-                                member_groups[phone_number]['total_messages'] += 1
-                                
-                                # Count sentiments
-                                sentiment = msg.get('predicted_sentiment', 'Neutral')
-                                if sentiment in member_groups[phone_number]['sentiment_counts']:
-                                    member_groups[phone_number]['sentiment_counts'][sentiment] += 1
-                    
-                    except Exception as e:
-                        print(f"Debug: Error analyzing group {group_name}: {e}")
-                        continue
-        
-        # Filter members who are in multiple groups (2 or more)
-        common_members = []
-        for phone, member_data in member_groups.items():
-            if len(member_data['groups']) >= 2:  # At least 2 groups
-                common_members.append({
-                    'name': member_data['name'],
-                    'phone': member_data['phone'],
-                    'groups_count': len(member_data['groups']),
-                    'group_names': member_data['groups'],
-                    'total_messages': member_data['total_messages'],
-                    'sentiment_breakdown': member_data['sentiment_counts']
-                })
-        
-        # Sort by groups count (highest to lowest), then by total messages
-        common_members.sort(key=lambda x: (x['groups_count'], x['total_messages']), reverse=True)
-        
-        # Create DataFrame with the exact format requested
-        excel_data = []
-        for rank, member in enumerate(common_members, 1):
-            # Format group names for better readability
-            formatted_group_names = []
-            for group_info in member['group_names']:
-                parts = group_info.split('/')
-                if len(parts) >= 3:
-                    # Format as "Assembly - Group Name"
-                    formatted_group_names.append(f"{parts[0]} - {parts[2]}")
-                else:
-                    formatted_group_names.append(group_info)
-            
-            excel_data.append({
-                'Rank': rank,
-                'Member Name': member['name'],
-                'Phone Number': member['phone'],
-                'Groups Count': member['groups_count'],
-                'Group Names': '; '.join(formatted_group_names)
-            })
-        
-        # Create DataFrame
-        df = pd.DataFrame(excel_data)
-        
-        # Create Excel file in memory
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='Common Members', index=False)
-            
-            # Get the workbook and worksheet
-            workbook = writer.book
-            worksheet = writer.sheets['Common Members']
-            
-            # Auto-adjust column widths
-            for column in worksheet.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)  # Cap at 50 characters
-                worksheet.column_dimensions[column_letter].width = adjusted_width
-        
-        # Prepare file for download
-        output.seek(0)
+                yield [rank, member['name'], member['phone'], member['groups_count'],
+                       '; '.join(formatted_group_names)]
         
         # Generate filename
         current_date = datetime.now().strftime('%Y-%m-%d')
-        filename = f'common_members_analysis_{current_date}.xlsx'
+        filename = f'common_members_analysis_{current_date}'
+        
+        if export_fmt != 'xlsx':
+            return streamed_export(export_fmt, headers, rows(), filename)
         
         return send_file(
-            BytesIO(output.getvalue()),
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            spool_xlsx([('Common Members', headers, rows())]),
+            mimetype=XLSX_MIMETYPE,
             as_attachment=True,
-            download_name=filename
+            download_name=f'{filename}.xlsx'
         )
         
     except Exception as e:
@@ -2426,196 +2242,168 @@ def export_common_members_excel():
             'message': f'Error exporting common members Excel: {str(e)}'
         }), 500
 
-@api_bp.route('/export-positive-users-excel', methods=['POST'])
+@api_bp.route('/group-overlap', methods=['POST'])
 @login_required
-def export_positive_users_excel():
-    """Export most positive active users from group sender analysis as Excel file"""
+def group_overlap():
+    """Top group pairs by shared members (rosters + message senders) with Jaccard scores"""
     try:
-        import pandas as pd
-        from io import BytesIO
+        data = request.get_json() or {}
+        assemblies = data.get('assemblies') or message_store.list_assemblies()
+        source = data.get('source', 'all')  # 'all', 'rosters' or 'messages'
+        sort_by = data.get('sortBy', 'shared')  # 'shared' or 'jaccard'
         
-        data = request.get_json()
-        assemblies = data.get('assemblies', [])
-        start_date = data.get('startDate')
-        end_date = data.get('endDate')
-        sentiment_filter = data.get('sentiment', 'all')
-        
-        if not assemblies:
+        if source not in ('all', 'rosters', 'messages'):
             return jsonify({
                 'success': False,
-                'message': 'Please select at least one assembly'
+                'message': "source must be 'all', 'rosters' or 'messages'"
             }), 400
         
-        if not start_date:
+        try:
+            top_n = min(max(int(data.get('topN', 50)), 1), 1000)
+            min_shared = max(int(data.get('minShared', 1)), 1)
+        except (TypeError, ValueError):
             return jsonify({
                 'success': False,
-                'message': 'Start date is required'
+                'message': 'topN and minShared must be whole numbers'
             }), 400
         
-        # Dictionary to track all users across all groups
-        all_users = {}  # phone -> {name, phone, total_messages, positive_messages, negative_messages, neutral_messages, groups: []}
+        # Built once per corpus version, then served from the cache
+        overlap, version, cached = group_overlap_cache.get(assemblies, source)
         
-        for assembly_name in assemblies:
-            assembly_path = os.path.join('database', assembly_name)
-            if not os.path.exists(assembly_path):
-                continue
-            
-            # Get all date directories
-            date_dirs = []
-            for item in os.listdir(assembly_path):
-                item_path = os.path.join(assembly_path, item)
-                if os.path.isdir(item_path) and os.path.basename(item_path).count('-') == 2:
-                    date_dirs.append(item)
-            
-            # Filter dates based on start and end date
-            if end_date:
-                # Date range: include dates between start and end (inclusive)
-                filtered_dates = []
-                for date_dir in date_dirs:
-                    try:
-                        date_obj = datetime.strptime(date_dir, '%Y-%m-%d')
-                        start_obj = datetime.strptime(start_date, '%Y-%m-%d')
-                        end_obj = datetime.strptime(end_date, '%Y-%m-%d')
-                        
-                        if start_obj <= date_obj <= end_obj:
-                            filtered_dates.append(date_dir)
-                    except ValueError:
-                        continue
-            else:
-                # Single date: exact match only
-                filtered_dates = [start_date] if start_date in date_dirs else []
-            
-            for date_dir in filtered_dates:
-                messages_path = os.path.join(assembly_path, date_dir, 'messages')
-                if not os.path.exists(messages_path):
-                    continue
-                
-                # Get all JSON files (groups) in this date directory
-                json_files = [f for f in os.listdir(messages_path) if f.endswith('.json')]
-                
-                for json_file in json_files:
-                    group_name = json_file.replace('.json', '')
-                    file_path = os.path.join(messages_path, json_file)
-                    
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                            
-                        if isinstance(data, list):
-                            # Process messages for user analysis
-                            for msg in data:
-                                sender = msg.get('sender', {})
-                                phone_number = sender.get('phoneNumber', '')
-                                sender_name = msg.get('sender', {}).get('name', 'Unknown')
-                                
-                                if not phone_number:
-                                    continue
-                                
-                                # Apply sentiment filter
-                                if sentiment_filter != 'all':
-                                    msg_sentiment = msg.get('predicted_sentiment', 'Neutral')
-                                    if msg_sentiment.lower() != sentiment_filter.lower():
-                                        continue
-                                
-                                # Initialize user if not exists
-                                if phone_number not in all_users:
-                                    all_users[phone_number] = {
-                                        'name': sender_name,
-                                        'phone': phone_number,
-                                        'total_messages': 0,
-                                        'positive_messages': 0,
-                                        'negative_messages': 0,
-                                        'neutral_messages': 0,
-                                        'groups': set()
-                                    }
-                                
-                                # Count messages
-                                all_users[phone_number]['total_messages'] += 1
-                                all_users[phone_number]['groups'].add(f"{assembly_name}/{date_dir}/{group_name}")
-                                
-                                # Count sentiments
-                                sentiment = msg.get('predicted_sentiment', 'Neutral')
-                                if sentiment == 'Positive':
-                                    all_users[phone_number]['positive_messages'] += 1
-                                elif sentiment == 'Negative':
-                                    all_users[phone_number]['negative_messages'] += 1
-                                elif sentiment == 'Neutral':
-                                    all_users[phone_number]['neutral_messages'] += 1
-                    
-                    except Exception as e:
-                        print(f"Debug: Error analyzing group {group_name}: {e}")
-                        continue
+        results = {
+            'corpus_version': version,
+            'cached': cached,
+            'total_groups': len(overlap.groups),
+            'total_members': overlap.members,
+            'overlapping_pairs': int(len(overlap.pairs)),
+            'pairs': overlap.top_pairs(top_n, sort_by=sort_by, min_shared=min_shared)
+        }
         
-        # Convert to list and filter users with positive messages
-        positive_users = []
-        for phone, user_data in all_users.items():
-            if user_data['positive_messages'] > 0:  # Only include users with positive messages
-                positive_users.append({
-                    'name': user_data['name'],
-                    'phone': user_data['phone'],
-                    'total_messages': user_data['total_messages'],
-                    'positive_messages': user_data['positive_messages'],
-                    'negative_messages': user_data['negative_messages'],
-                    'neutral_messages': user_data['neutral_messages'],
-                    'groups_count': len(user_data['groups']),
-                    'positive_percentage': round((user_data['positive_messages'] / user_data['total_messages']) * 100, 2)
-                })
+        return jsonify({
+            'success': True,
+            'results': results
+        })
         
-        # Sort by positive messages (highest to lowest), then by positive percentage
-        positive_users.sort(key=lambda x: (x['positive_messages'], x['positive_percentage']), reverse=True)
-        
-        # Create DataFrame with the exact format requested
-        excel_data = []
-        for rank, user in enumerate(positive_users, 1):
-            excel_data.append({
-                'Rank': rank,
-                'Member Name': user['name'],
-                'Phone Number': user['phone'],
-                'Total Messages': user['total_messages'],
-                'Positive Messages': user['positive_messages'],
-                'Negative Messages': user['negative_messages'],
-                'Neutral Messages': user['neutral_messages'],
-                'Groups Count': user['groups_count'],
-                'Positive Percentage': f"{user['positive_percentage']}%"
-            })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error computing group overlap: {str(e)}'
+        }), 500
+
+@api_bp.route('/roster-activity', methods=['POST'])
+@login_required
+def roster_activity():
+    """Per-group roster members who posted, silent members and posters not on the roster"""
+    try:
+        data = request.get_json() or {}
+        assembly_name = (data.get('assembly_name') or '').strip()
+        start_date = data.get('startDate')
+        end_date = data.get('endDate')
+        group = data.get('group')  # group_key of one group to list members of
+        status = data.get('status')  # 'posted', 'silent' or 'not_on_roster'
         
-        # Create DataFrame
-        df = pd.DataFrame(excel_data)
+        if not assembly_name:
+            return jsonify({'success': False, 'message': 'Assembly name is required'}), 400
         
-        # Create Excel file in memory
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='Most Positive Users', index=False)
-            
-            # Get the workbook and worksheet
-            workbook = writer.book
-            worksheet = writer.sheets['Most Positive Users']
-            
-            # Auto-adjust column widths
-            for column in worksheet.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)  # Cap at 50 characters
-                worksheet.column_dimensions[column_letter].width = adjusted_width
+        if not os.path.isdir(os.path.join('database', assembly_name)):
+            return jsonify({'success': False, 'message': 'Assembly not found'}), 404
+        
+        if status and status not in STATUSES.values():
+            return jsonify({
+                'success': False,
+                'message': "status must be 'posted', 'silent' or 'not_on_roster'"
+            }), 400
         
-        # Prepare file for download
-        output.seek(0)
+        # Activity of the whole assembly unless a date range is given
+        if start_date:
+            if not normalise_date(start_date) or (end_date and not normalise_date(end_date)):
+                return jsonify({'success': False, 'message': 'Dates must be YYYY-MM-DD'}), 400
+            partitions = partition_resolver.resolve([assembly_name], start_date, end_date)
+        else:
+            partitions = [(assembly_name, date) for date in partition_resolver.dates(assembly_name)]
+        
+        params = {
+            'startDate': normalise_date(start_date),
+            'endDate': normalise_date(end_date) if start_date else None
+        }
+        cache_key = result_cache.key('roster-activity', params, [assembly_name])
+        activity = result_cache.get(cache_key)
+        cached = activity is not None
+        if not cached:
+            activity = RosterActivity.build(assembly_name, partitions)
+            result_cache.put(cache_key, activity)
+        
+        groups = activity.group_summaries()
+        results = {
+            'assembly': assembly_name,
+            'start_date': params['startDate'],
+            'end_date': params['endDate'] or params['startDate'],
+            'dates_scanned': len(partitions),
+            'total_groups': len(groups),
+            'totals': {
+                name: sum(summary[name] for summary in groups)
+                for name in ['roster_members', 'posted_members', 'silent_members', 'posters_not_on_roster']
+            },
+            'groups': groups
+        }
+        if group is not None:
+            if group not in activity.group_names:
+                return jsonify({'success': False, 'message': 'Group not found'}), 404
+            results['group'] = group
+            results['members'] = activity.members(group, status)
+        
+        return jsonify({
+            'success': True,
+            'cached': cached,
+            'results': results
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error computing roster activity: {str(e)}'
+        }), 500
+
+@api_bp.route('/export-positive-users-excel', methods=['POST'])
+@login_required
+def export_positive_users_excel():
+    """Export most positive active users from group sender analysis as Excel file"""
+    try:
+        data = request.get_json()
+        export_fmt = export_format(data.get('format'))
+        if export_fmt is None:
+            return unsupported_export_format()
+        
+        # Per-member sentiment counts, from the analysis snapshot if given
+        users, error = sentiment_users_for_export(data)
+        if error:
+            return error
+        
+        # Users with positive messages, by positive messages then positive percentage
+        positive_users = rank_sentiment_users(users, 'positive')
+        
+        # Stream the ranked users into the workbook row by row
+        headers = ['Rank', 'Member Name', 'Phone Number', 'Total Messages', 'Positive Messages',
+                   'Negative Messages', 'Neutral Messages', 'Groups Count', 'Positive Percentage']
+        rows = (
+            [rank, user['name'], user['phone'], user['total_messages'], user['positive_messages'],
+             user['negative_messages'], user['neutral_messages'], user['groups_count'],
+             f"{user['positive_percentage']}%"]
+            for rank, user in enumerate(positive_users, 1)
+        )
         
         # Generate filename
         current_date = datetime.now().strftime('%Y-%m-%d')
-        filename = f'most_positive_users_{current_date}.xlsx'
+        filename = f'most_positive_users_{current_date}'
+        
+        if export_fmt != 'xlsx':
+            return streamed_export(export_fmt, headers, rows, filename)
         
         return send_file(
-            BytesIO(output.getvalue()),
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            spool_xlsx([('Most Positive Users', headers, rows)]),
+            mimetype=XLSX_MIMETYPE,
             as_attachment=True,
-            download_name=filename
+            download_name=f'{filename}.xlsx'
         )
         
     except Exception as e:
@@ -2629,191 +2417,41 @@ def export_positive_users_excel():
 def export_negative_users_excel():
     """Export most negative active users from group sender analysis as Excel file"""
     try:
-        import pandas as pd
-        from io import BytesIO
-        
         data = request.get_json()
-        assemblies = data.get('assemblies', [])
-        start_date = data.get('startDate')
-        end_date = data.get('endDate')
-        sentiment_filter = data.get('sentiment', 'all')
-        
-        if not assemblies:
-            return jsonify({
-                'success': False,
-                'message': 'Please select at least one assembly'
-            }), 400
-        
-        if not start_date:
-            return jsonify({
-                'success': False,
-                'message': 'Start date is required'
-            }), 400
-        
-        # Dictionary to track all users across all groups
-        all_users = {}  # phone -> {name, phone, total_messages, positive_messages, negative_messages, neutral_messages, groups: []}
-        
-        for assembly_name in assemblies:
-            assembly_path = os.path.join('database', assembly_name)
-            if not os.path.exists(assembly_path):
-                continue
-            
-            # Get all date directories
-            date_dirs = []
-            for item in os.listdir(assembly_path):
-                item_path = os.path.join(assembly_path, item)
-                if os.path.isdir(item_path) and os.path.basename(item_path).count('-') == 2:
-                    date_dirs.append(item)
-            
-            # Filter dates based on start and end date
-            if end_date:
-                # Date range: include dates between start and end (inclusive)
-                filtered_dates = []
-                for date_dir in date_dirs:
-                    try:
-                        date_obj = datetime.strptime(date_dir, '%Y-%m-%d')
-                        start_obj = datetime.strptime(start_date, '%Y-%m-%d')
-                        end_obj = datetime.strptime(end_date, '%Y-%m-%d')
-                        
-                        if start_obj <= date_obj <= end_obj:
-                            filtered_dates.append(date_dir)
-                    except ValueError:
-                        continue
-            else:
-                # Single date: exact match only
-                filtered_dates = [start_date] if start_date in date_dirs else []
-            
-            for date_dir in filtered_dates:
-                messages_path = os.path.join(assembly_path, date_dir, 'messages')
-                if not os.path.exists(messages_path):
-                    continue
-                
-                # Get all JSON files (groups) in this date directory
-                json_files = [f for f in os.listdir(messages_path) if f.endswith('.json')]
-                
-                for json_file in json_files:
-                    group_name = json_file.replace('.json', '')
-                    file_path = os.path.join(messages_path, json_file)
-                    
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                            
-                        if isinstance(data, list):
-                            # Process messages for user analysis
-                            for msg in data:
-                                sender = msg.get('sender', {})
-                                phone_number = sender.get('phoneNumber', '')
-                                sender_name = msg.get('sender', {}).get('name', 'Unknown')
-                                
-                                if not phone_number:
-                                    continue
-                                
-                                # Apply sentiment filter
-                                if sentiment_filter != 'all':
-                                    msg_sentiment = msg.get('predicted_sentiment', 'Neutral')
-                                    if msg_sentiment.lower() != sentiment_filter.lower():
-                                        continue
-                                
-                                # Initialize user if not exists
-                                if phone_number not in all_users:
-                                    all_users[phone_number] = {
-                                        'name': sender_name,
-                                        'phone': phone_number,
-                                        'total_messages': 0,
-                                        'positive_messages': 0,
-                                        'negative_messages': 0,
-                                        'neutral_messages': 0,
-                                        'groups': set()
-                                    }
-                                
-                                # Count messages
-                                all_users[phone_number]['total_messages'] += 1
-                                all_users[phone_number]['groups'].add(f"{assembly_name}/{date_dir}/{group_name}")
-                                
-                                # Count sentiments
-                                sentiment = msg.get('predicted_sentiment', 'Neutral')
-                                if sentiment == 'Positive':
-                                    all_users[phone_number]['positive_messages'] += 1
-                                elif sentiment == 'Negative':
-                                    all_users[phone_number]['negative_messages'] += 1
-                                elif sentiment == 'Neutral':
-                                    all_users[phone_number]['neutral_messages'] += 1
-                    
-                    except Exception as e:
-                        print(f"Debug: Error analyzing group {group_name}: {e}")
-                        continue
-        
-        # Convert to list and filter users with negative messages
-        negative_users = []
-        for phone, user_data in all_users.items():
-            if user_data['negative_messages'] > 0:  # Only include users with negative messages
-                negative_users.append({
-                    'name': user_data['name'],
-                    'phone': user_data['phone'],
-                    'total_messages': user_data['total_messages'],
-                    'positive_messages': user_data['positive_messages'],
-                    'negative_messages': user_data['negative_messages'],
-                    'neutral_messages': user_data['neutral_messages'],
-                    'groups_count': len(user_data['groups']),
-                    'negative_percentage': round((user_data['negative_messages'] / user_data['total_messages']) * 100, 2)
-                })
-        
-        # Sort by negative messages (highest to lowest), then by negative percentage
-        negative_users.sort(key=lambda x: (x['negative_messages'], x['negative_percentage']), reverse=True)
-        
-        # Create DataFrame with the exact format requested
-        excel_data = []
-        for rank, user in enumerate(negative_users, 1):
-            excel_data.append({
-                'Rank': rank,
-                'Member Name': user['name'],
-                'Phone Number': user['phone'],
-                'Total Messages': user['total_messages'],
-                'Positive Messages': user['positive_messages'],
-                'Negative Messages': user['negative_messages'],
-                'Neutral Messages': user['neutral_messages'],
-                'Groups Count': user['groups_count'],
-                'Negative Percentage': f"{user['negative_percentage']}%"
-            })
-        
-        # Create DataFrame
-        df = pd.DataFrame(excel_data)
-        
-        # Create Excel file in memory
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='Most Negative Users', index=False)
-            
-            # Get the workbook and worksheet
-            workbook = writer.book
-            worksheet = writer.sheets['Most Negative Users']
-            
-            # Auto-adjust column widths
-            for column in worksheet.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)  # Cap at 50 characters
-                worksheet.column_dimensions[column_letter].width = adjusted_width
-        
-        # Prepare file for download
-        output.seek(0)
+        export_fmt = export_format(data.get('format'))
+        if export_fmt is None:
+            return unsupported_export_format()
+        
+        # Per-member sentiment counts, from the analysis snapshot if given
+        users, error = sentiment_users_for_export(data)
+        if error:
+            return error
+        
+        # Users with negative messages, by negative messages then negative percentage
+        negative_users = rank_sentiment_users(users, 'negative')
+        
+        # Stream the ranked users into the workbook row by row
+        headers = ['Rank', 'Member Name', 'Phone Number', 'Total Messages', 'Positive Messages',
+                   'Negative Messages', 'Neutral Messages', 'Groups Count', 'Negative Percentage']
+        rows = (
+            [rank, user['name'], user['phone'], user['total_messages'], user['positive_messages'],
+             user['negative_messages'], user['neutral_messages'], user['groups_count'],
+             f"{user['negative_percentage']}%"]
+            for rank, user in enumerate(negative_users, 1)
+        )
         
         # Generate filename
         current_date = datetime.now().strftime('%Y-%m-%d')
-        filename = f'most_negative_users_{current_date}.xlsx'
+        filename = f'most_negative_users_{current_date}'
+        
+        if export_fmt != 'xlsx':
+            return streamed_export(export_fmt, headers, rows, filename)
         
         return send_file(
-            BytesIO(output.getvalue()),
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            spool_xlsx([('Most Negative Users', headers, rows)]),
+            mimetype=XLSX_MIMETYPE,
             as_attachment=True,
-            download_name=filename
+            download_name=f'{filename}.xlsx'
         )
         
     except Exception as e:
@@ -2823,23 +2461,22 @@ def export_negative_users_excel():
         }), 500
 
 def analyze_group_messages(messages_data, sentiment_filter):
-    """Helper function to analyze messages within a group"""
+    """Helper function to analyze message store rows within a group"""
     sender_stats = {}
     sentiment_counts = {'Positive': 0, 'Negative': 0, 'Neutral': 0}
     label_counts = {}
     
     for msg in messages_data:
         # Get sender info
-        sender = msg.get('sender', {})
-        phone_number = sender.get('phoneNumber', '')
-        sender_name = sender.get('name', 'Unknown')
+        phone_number = msg['sender_phone']
+        sender_name = msg['sender_name']
         
         if not phone_number:
             continue
         
         # Apply sentiment filter
         if sentiment_filter != 'all':
-            msg_sentiment = msg.get('predicted_sentiment', 'Neutral')
+            msg_sentiment = msg['sentiment']
             if msg_sentiment.lower() != sentiment_filter.lower():
                 continue
         
@@ -2856,21 +2493,21 @@ def analyze_group_messages(messages_data, sentiment_filter):
         
         # Add message details
         message_info = {
-            'content': msg.get('messageContent', ''),
-            'type': msg.get('messageType', 'text'),
-            'timestamp': msg.get('timestamp', ''),
-            'sentiment': msg.get('predicted_sentiment', 'Neutral'),
-            'label': msg.get('predicted_label', 'unknown')
+            'content': msg['content'],
+            'type': msg['type'],
+            'timestamp': msg['timestamp'],
+            'sentiment': msg['sentiment'],
+            'label': msg['label']
         }
         sender_stats[phone_number]['messages'].append(message_info)
         
         # Count sentiments
-        sentiment = msg.get('predicted_sentiment', 'Neutral')
+        sentiment = msg['sentiment']
         if sentiment in sentiment_counts:
             sentiment_counts[sentiment] += 1
         
         # Count labels
-        label = msg.get('predicted_label', 'unknown')
+        label = msg['label']
         label_counts[label] = label_counts.get(label, 0) + 1
     
     # Find top sender
@@ -2892,6 +2529,426 @@ def analyze_group_messages(messages_data, sentiment_filter):
         'top_sender': top_sender
     }
 
+def scan_sentiment_counts(partition):
+    """Scan helper: JSON files and sentiment counts of one partition"""
+    sentiment_counts = sum_partition_rollups([partition])['sentiment_breakdown']
+    return {
+        'date': partition.date,
+        'json_files': partition.files,
+        'sentiment_counts': sentiment_counts
+    }
+
+def scan_group_rollups(partition, sentiment_filter):
+    """Scan helper: group sender analysis of one partition from its group rollups"""
+    group_analyses = []
+    for group_name, rollup in partition.group_rollups():
+        if rollup['total_messages'] > 0:
+            sender_stats = sender_rollup(rollup, sentiment_filter)
+            group_analyses.append({
+                'assembly': partition.assembly,
+                'date': partition.date,
+                'group_name': group_name,
+                'total_messages': rollup['total_messages'],
+                'unique_senders': sender_stats['unique_senders'],
+                'top_sender': sender_stats['top_sender'],
+                'sentiment_breakdown': sender_stats['sentiment_breakdown'],
+                'label_breakdown': sender_stats['label_breakdown']
+            })
+    return group_analyses
+
+def scan_group_senders(partition, sentiment_filter):
+    """Scan helper: group sender analysis of every group in one partition"""
+    group_analyses = []
+    for group_name, rows in partition.group_rows():
+        try:
+            # Analyze group messages
+            group_stats = analyze_group_messages(rows, sentiment_filter)
+            
+            if group_stats['total_messages'] > 0:
+                group_analyses.append({
+                    'assembly': partition.assembly,
+                    'date': partition.date,
+                    'group_name': group_name,
+                    'total_messages': group_stats['total_messages'],
+                    'unique_senders': group_stats['unique_senders'],
+                    'top_sender': group_stats['top_sender'],
+                    'sentiment_breakdown': group_stats['sentiment_breakdown'],
+                    'label_breakdown': group_stats['label_breakdown'],
+                    'sender_details': group_stats['sender_details']
+                })
+        
+        except Exception as e:
+            print(f"Debug: Error analyzing group {group_name}: {e}")
+            continue
+    return group_analyses
+
+def create_analysis_session(kind, params, data):
+    """Snapshot an analysis for later views/exports; None if it could not be stored"""
+    try:
+        return analysis_sessions.create(kind, params, data)
+    except (IOError, OSError) as e:
+        print(f"Warning: Could not store {kind} snapshot: {e}")
+        return None
+
+def sentiment_users_for_export(data):
+    """Per-member sentiment counts for the user exports as (users, error response)
+
+    With an analysisId the counts come from the snapshot of that group sender
+    analysis: computed on its first export and stored with it, so later
+    exports from any worker read them back instead of rescanning. Otherwise
+    they are computed for the parameters of the request.
+    """
+    analysis_id = data.get('analysisId')
+    if analysis_id:
+        session = analysis_sessions.load(analysis_id, 'group-sender-analysis')
+        if session is None:
+            return None, (jsonify({
+                'success': False,
+                'message': 'Analysis not found or expired, please run the analysis again'
+            }), 404)
+        users = session['data'].get('member_sentiments')
+        if users is None:
+            params = session['params']
+            users = sentiment_users(params['assemblies'], params['startDate'], params['endDate'],
+                                    params['sentiment'])
+            session['data']['member_sentiments'] = users
+            try:
+                analysis_sessions.save(session)
+            except (IOError, OSError) as e:
+                print(f"Warning: Could not store member sentiments of analysis {analysis_id}: {e}")
+        return users, None
+    
+    assemblies = data.get('assemblies', [])
+    start_date = data.get('startDate')
+    end_date = data.get('endDate')
+    sentiment_filter = data.get('sentiment', 'all')
+    
+    if not assemblies:
+        return None, (jsonify({
+            'success': False,
+            'message': 'Please select at least one assembly'
+        }), 400)
+    
+    if not start_date:
+        return None, (jsonify({
+            'success': False,
+            'message': 'Start date is required'
+        }), 400)
+    
+    return sentiment_users(assemblies, start_date, end_date, sentiment_filter), None
+
+def sentiment_users(assemblies, start_date, end_date, sentiment_filter):
+    """Per-member sentiment counts over the matching partitions, cached per corpus version"""
+    params = {
+        'assemblies': assemblies,
+        'startDate': normalise_date(start_date) or start_date,
+        'endDate': normalise_date(end_date) or end_date,
+        'sentiment': sentiment_filter.lower()
+    }
+    cache_key = result_cache.key('sentiment-users', params, assemblies)
+    users = result_cache.get(cache_key)
+    if users is None:
+        partitions = partition_resolver.resolve(assemblies, start_date, end_date)
+        scan = partial(partition_memberships, sentiment_filter=sentiment_filter)
+        users = MembershipMatrix(scan_partitions(partitions, scan)).member_sentiments()
+        result_cache.put(cache_key, users)
+    return users
+
+def rank_sentiment_users(users, sentiment):
+    """Users with at least one message of a sentiment ('positive' or 'negative'), most first"""
+    count_key = f'{sentiment}_messages'
+    percentage_key = f'{sentiment}_percentage'
+    ranked = [
+        dict(user, **{percentage_key: round((user[count_key] / user['total_messages']) * 100, 2)})
+        for user in users
+        if user[count_key] > 0
+    ]
+    ranked.sort(key=lambda x: (x[count_key], x[percentage_key]), reverse=True)
+    return ranked
+
+def streamed_export(export_fmt, headers, rows, filename):
+    """Download of rows as a gzipped CSV / NDJSON stream (export_fmt 'csv.gz' or 'ndjson.gz')"""
+    filename = f'{filename}.{export_fmt}'
+    return Response(
+        stream_with_context(stream_rows(export_fmt, headers, rows)),
+        mimetype=GZIP_MIMETYPE,
+        headers={'Content-Disposition': f"attachment; filename*=UTF-8''{quote(filename)}"}
+    )
+
+def unsupported_export_format():
+    return jsonify({
+        'success': False,
+        'message': 'format must be one of: xlsx, csv.gz, ndjson.gz'
+    }), 400
+
+def collect_member_messages(partition, offsets):
+    """Summarise the messages of one member at the given rows of a partition"""
+    member = {
+        'name': None,
+        'total_messages': 0,
+        'groups_involved': set(),
+        'sentiment_counts': {'Positive': 0, 'Negative': 0, 'Neutral': 0},
+        'messages_by_sentiment': {'Positive': [], 'Negative': [], 'Neutral': []}
+    }
+    for group_name, msg in partition.rows_at(offsets):
+        if member['name'] is None:
+            member['name'] = msg['sender_name']
+        member['total_messages'] += 1
+        member['groups_involved'].add(f"{partition.assembly}/{partition.date}/{group_name}")
+        
+        sentiment = msg['sentiment']
+        if sentiment in member['sentiment_counts']:
+            member['sentiment_counts'][sentiment] += 1
+            member['messages_by_sentiment'][sentiment].append({
+                'content': msg['content'],
+                'type': msg['type'],
+                'timestamp': msg['timestamp'],
+                'sentiment': sentiment,
+                'label': msg['label'],
+                'group_name': group_name,
+                'assembly': partition.assembly,
+                'date': partition.date
+            })
+    return member
+
+def iter_search_matches(partition, search_term, search_field, selected_label, selected_sentiment):
+    """Yield (row offset, group_name, row) for the partition rows matching the search criteria"""
+    assembly_name = partition.assembly
+    # Only rows holding every trigram of the term can match; they are
+    # verified with the exact substring test below
+    candidates = trigram_index.candidate_rows(partition, search_term, search_field)
+    offsets = range(len(partition)) if candidates is None else candidates
+    for offset, (group_name, msg) in zip(offsets, partition.rows_at(offsets)):
+        message_content = msg['content'].lower()
+        sender_name = msg['sender_name']
+        sender_phone = msg['sender_phone']
+        
+        # Check if message matches search criteria based on search field
+        if search_field == 'senderName':
+            message_matches = search_term in sender_name.lower()
+        elif search_field == 'senderPhone':
+            message_matches = search_term in sender_phone
+        elif search_field == 'groupName':
+            message_matches = search_term in group_name.lower()
+        elif search_field == 'assembly':
+            message_matches = search_term in assembly_name.lower()
+        elif search_field == 'all':
+            # Search in all fields
+            message_matches = (
+                search_term in message_content or
+                search_term in sender_name.lower() or
+                search_term in sender_phone or
+                search_term in group_name.lower() or
+                search_term in assembly_name.lower()
+            )
+        else:
+            # Default to message content
+            message_matches = search_term in message_content
+        
+        label_matches = selected_label == 'all' or msg['label'] == selected_label
+        sentiment_matches = selected_sentiment == 'all' or msg['sentiment'].lower() == selected_sentiment
+        
+        if message_matches and label_matches and sentiment_matches:
+            yield offset, group_name, msg
+
+def search_result(partition, group_name, msg):
+    """Search API representation of one matching row"""
+    return {
+        'message_content': msg['content'],
+        'sender_name': msg['sender_name'],
+        'sender_phone': msg['sender_phone'],
+        'sentiment': msg['sentiment'],
+        'label': msg['label'],
+        'timestamp': msg['timestamp'],
+        'group_name': group_name,
+        'assembly': partition.assembly,
+        'date': partition.date
+    }
+
+def scan_search_matches(partition, **criteria):
+    """Scan helper: messages of one partition matching the search criteria"""
+    return [search_result(partition, group_name, msg)
+            for offset, group_name, msg in iter_search_matches(partition, **criteria)]
+
+def scan_search_counts(partition, **criteria):
+    """Scan helper: match, sender and group counts of one partition without building results"""
+    counts = {'messages': 0, 'members': set(), 'groups': set()}
+    for offset, group_name, msg in iter_search_matches(partition, **criteria):
+        counts['messages'] += 1
+        counts['members'].add(msg['sender_phone'])
+        counts['groups'].add(f"{partition.assembly}/{partition.date}/{group_name}")
+    return counts
+
+def sorted_search_matches(partition, criteria):
+    """(timestamp, row offset, group_name, row) of the matches of one partition, newest first"""
+    return sorted(
+        ((msg['timestamp'], offset, group_name, msg)
+         for offset, group_name, msg in iter_search_matches(partition, **criteria)),
+        key=lambda match: (match[0], match[1]),
+        reverse=True
+    )
+
+def search_page(partitions, page_size, cursor=None, **criteria):
+    """One page of substring matches in (date, assembly, timestamp, row) descending order
+
+    Partitions are visited newest date first and scanning stops as soon as
+    the page (plus one row to detect more) is filled, so early pages never
+    scan the whole range. cursor is the sort key of the last row already
+    returned. Returns (rows, next cursor or None).
+    """
+    page = []
+    for assembly, date in sorted(partitions, key=lambda p: (p[1], p[0]), reverse=True):
+        if cursor is not None and [date, assembly] > cursor[:2]:
+            continue
+        if not os.path.isdir(message_store.messages_dir(assembly, date)):
+            continue
+        partition = message_store.get_partition(assembly, date)
+        matches = sorted_search_matches(partition, criteria)
+        for timestamp, offset, group_name, msg in matches:
+            key = [date, assembly, timestamp, offset]
+            if cursor is not None and key >= cursor:
+                continue
+            if len(page) == page_size:
+                return [row for _, row in page], page[-1][0]
+            page.append((key, search_result(partition, group_name, msg)))
+    return [row for _, row in page], None
+
+def encode_search_cursor(search_mode, key):
+    """Opaque cursor string for the sort key of the last row of a page"""
+    payload = json.dumps({'mode': search_mode, 'key': key}, ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+# Element types of the sort key behind a cursor, per search mode
+SEARCH_CURSOR_KEYS = {
+    'contains': (str, str, str, int),  # date, assembly, timestamp, row offset
+    'fulltext': (str, int),  # timestamp, message id
+}
+
+def decode_search_cursor(search_mode, cursor):
+    """Sort key of a cursor created by encode_search_cursor; raises ValueError if invalid"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(payload, dict) or payload.get('mode') != search_mode:
+        raise ValueError('Invalid cursor')
+    key = payload.get('key')
+    types = SEARCH_CURSOR_KEYS.get(search_mode)
+    if types is None or not isinstance(key, list) or len(key) != len(types):
+        raise ValueError('Invalid cursor')
+    if any(isinstance(value, bool) or not isinstance(value, kind) for value, kind in zip(key, types)):
+        raise ValueError('Invalid cursor')
+    return key
+
+def search_params(data):
+    """Search parameters of a search-messages request, with defaults filled in"""
+    return {
+        'searchTerm': data.get('searchTerm', '').strip(),
+        'searchField': data.get('searchField', 'messageContent'),  # Default to message content
+        'searchMode': data.get('searchMode', 'contains'),  # 'contains' or 'fulltext'
+        'assemblies': data.get('assemblies', []),
+        'startDate': data.get('startDate', ''),
+        'endDate': data.get('endDate', ''),
+        'label': data.get('label', 'all'),
+        'sentiment': data.get('sentiment', 'all')
+    }
+
+def validate_search_params(params):
+    """Error message for invalid search parameters, or None"""
+    if not params['searchTerm']:
+        return 'Search term is required'
+    if not params['assemblies']:
+        return 'At least one assembly must be selected'
+    if not params['startDate']:
+        return 'Start date is required'
+    if params['searchMode'] == 'fulltext':
+        if not fts_available():
+            return 'Full-text search requires the SQLite database'
+        if params['searchField'] != 'all' and params['searchField'] not in FTS_FIELDS:
+            return f"Unknown search field: {params['searchField']}"
+        # The index only covers what `flask load-messages` and uploads loaded
+        stale = stale_partitions(partition_resolver.resolve(params['assemblies'], params['startDate'],
+                                                            params['endDate']))
+        if stale:
+            return (f'The full-text index is not up to date for {len(stale)} of the selected report dates; '
+                    'run "flask load-messages" or use the contains search mode')
+    return None
+
+def search_criteria(params):
+    """Keyword arguments of the substring scan helpers for search parameters"""
+    return {
+        'search_term': params['searchTerm'].lower(),
+        'search_field': params['searchField'],
+        'selected_label': params['label'],
+        'selected_sentiment': params['sentiment']
+    }
+
+def search_fulltext_args(params):
+    """Positional arguments of search_fulltext/count_fulltext for search parameters"""
+    return (
+        params['searchTerm'],
+        params['searchField'],
+        params['assemblies'],
+        normalise_date(params['startDate']) or params['startDate'],
+        normalise_date(params['endDate']) if params['endDate'] else None
+    )
+
+def all_search_matches(params):
+    """Every message matching the search parameters, newest first
+
+    Raises ValueError for a malformed full-text query.
+    """
+    if params['searchMode'] == 'fulltext':
+        # Indexed FTS5 query over the loaded corpus, already newest first
+        matches_list = [search_fulltext(*search_fulltext_args(params),
+                                        label=params['label'], sentiment=params['sentiment'])]
+        for row in matches_list[0]:
+            row.pop('cursor')
+    else:
+        # Scan the matching partitions in parallel and merge them in order
+        partitions = partition_resolver.resolve(params['assemblies'], params['startDate'], params['endDate'])
+        matches_list = scan_partitions(partitions, partial(scan_search_matches, **search_criteria(params)))
+    
+    search_results = [search_result for matches in matches_list for search_result in matches]
+    
+    # Sort results by timestamp (newest first)
+    search_results.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
+    return search_results
+
+# Columns of search_result(), the fixed layout of streamed search exports
+SEARCH_RESULT_COLUMNS = ['message_content', 'sender_name', 'sender_phone', 'sentiment', 'label',
+                         'timestamp', 'group_name', 'assembly', 'date']
+SEARCH_EXPORT_BATCH = 5000  # full-text rows fetched per query while streaming
+
+def iter_all_search_matches(params):
+    """Yield every message matching the search parameters, in the order of the search pages
+
+    Unlike all_search_matches only one partition's matches (or one batch of
+    full-text rows) are held at a time, so exports stream straight from the
+    query engine. Raises ValueError for a malformed full-text query when the
+    first row is requested.
+    """
+    if params['searchMode'] == 'fulltext':
+        after = None
+        while True:
+            rows = search_fulltext(*search_fulltext_args(params), label=params['label'],
+                                   sentiment=params['sentiment'], limit=SEARCH_EXPORT_BATCH, after=after)
+            for row in rows:
+                after = row.pop('cursor')
+                yield row
+            if len(rows) < SEARCH_EXPORT_BATCH:
+                return
+    
+    partitions = partition_resolver.resolve(params['assemblies'], params['startDate'], params['endDate'])
+    criteria = search_criteria(params)
+    for assembly, date in sorted(partitions, key=lambda p: (p[1], p[0]), reverse=True):
+        if not os.path.isdir(message_store.messages_dir(assembly, date)):
+            continue
+        partition = message_store.get_partition(assembly, date)
+        matches = sorted_search_matches(partition, criteria)
+        for timestamp, offset, group_name, msg in matches:
+            yield search_result(partition, group_name, msg)
+
 # ============================================================================
 # GROUP DETAILS API
 # ============================================================================
@@ -2922,8 +2979,7 @@ def get_group_details():
             }), 404
 
         # Read and process the JSON file
-        with open(file_path, 'r', encoding='utf-8') as f:
-            messages_data = json.load(f)
+        messages_data = load_json(file_path)
 
         if not isinstance(messages_data, list):
             return jsonify({
@@ -3058,90 +3114,18 @@ def get_member_details(phone):
             'sentiment_counts': {'Positive': 0, 'Negative': 0, 'Neutral': 0}
         }
         
-        for assembly_name in assemblies:
-            assembly_path = os.path.join('database', assembly_name)
-            if not os.path.exists(assembly_path):
-                continue
-            
-            # Get all date directories
-            date_dirs = []
-            for item in os.listdir(assembly_path):
-                item_path = os.path.join(assembly_path, item)
-                if os.path.isdir(item_path) and os.path.basename(item_path).count('-') == 2:
-                    date_dirs.append(item)
-            
-            # Filter dates based on start and end date
-            if end_date:
-                # Date range: include dates between start and end (inclusive)
-                filtered_dates = []
-                for date_dir in date_dirs:
-                    try:
-                        date_obj = datetime.strptime(date_dir, '%Y-%m-%d')
-                        start_obj = datetime.strptime(start_date, '%Y-%m-%d')
-                        end_obj = datetime.strptime(end_date, '%Y-%m-%d')
-                        
-                        if start_obj <= date_obj <= end_obj:
-                            filtered_dates.append(date_dir)
-                    except ValueError:
-                        continue
-            else:
-                # Single date: exact match only
-                filtered_dates = [start_date] if start_date in date_dirs else []
-            
-            for date_dir in filtered_dates:
-                messages_path = os.path.join(assembly_path, date_dir, 'messages')
-                if not os.path.exists(messages_path):
-                    continue
-                
-                # Get all JSON files (groups) in this date directory
-                json_files = [f for f in os.listdir(messages_path) if f.endswith('.json')]
-                
-                for json_file in json_files:
-                    group_name = json_file.replace('.json', '')
-                    file_path = os.path.join(messages_path, json_file)
-                    
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                            
-                        if isinstance(data, list):
-                            # Process messages for this specific member
-                            for msg in data:
-                                sender = msg.get('sender', {})
-                                msg_phone = sender.get('phoneNumber', '')
-                                
-                                if msg_phone == phone:
-                                    # Update member info
-                                    if member_info['name'] == 'Unknown':
-                                        member_info['name'] = msg.get('sender', {}).get('name', 'Unknown')
-                                    
-                                    member_info['total_messages'] += 1
-                                    member_info['groups_involved'].add(f"{assembly_name}/{date_dir}/{group_name}")
-                                    
-                                    # Get sentiment
-                                    sentiment = msg.get('predicted_sentiment', 'Neutral')
-                                    if sentiment in member_info['sentiment_counts']:
-                                        member_info['sentiment_counts'][sentiment] += 1
-                                    
-                                    # Create message object
-                                    message_obj = {
-                                        'content': msg.get('messageContent', ''),
-                                        'type': msg.get('messageType', 'text'),
-                                        'timestamp': msg.get('timestamp', ''),
-                                        'sentiment': sentiment,
-                                        'label': msg.get('predicted_label', 'unknown'),
-                                        'group_name': group_name,
-                                        'assembly': assembly_name,
-                                        'date': date_dir
-                                    }
-                                    
-                                    # Add to appropriate sentiment category
-                                    if sentiment in messages_by_sentiment:
-                                        messages_by_sentiment[sentiment].append(message_obj)
-                    
-                    except Exception as e:
-                        print(f"Debug: Error processing group {group_name}: {e}")
-                        continue
+        # Read only the rows the phone index lists for this member
+        partitions = partition_resolver.resolve(assemblies, start_date, end_date)
+        for assembly, date, offsets in phone_index.lookup(partitions, phone):
+            partial_member = collect_member_messages(message_store.get_partition(assembly, date), offsets)
+            if member_info['name'] == 'Unknown' and partial_member['name']:
+                member_info['name'] = partial_member['name']
+            member_info['total_messages'] += partial_member['total_messages']
+            member_info['groups_involved'].update(partial_member['groups_involved'])
+            for sentiment, count in partial_member['sentiment_counts'].items():
+                member_info['sentiment_counts'][sentiment] += count
+            for sentiment, messages in partial_member['messages_by_sentiment'].items():
+                messages_by_sentiment[sentiment].extend(messages)
         
         # Convert groups_involved set to list
         member_info['groups_involved'] = list(member_info['groups_involved'])
@@ -3179,157 +3163,119 @@ def search_messages():
     """Search messages across all groups and assemblies"""
     try:
         data = request.get_json()
-        search_term = data.get('searchTerm', '').strip().lower()
-        search_field = data.get('searchField', 'messageContent')  # Default to message content
-        assemblies = data.get('assemblies', [])
-        start_date = data.get('startDate', '')
-        end_date = data.get('endDate', '')
-        selected_label = data.get('label', 'all')
-        selected_sentiment = data.get('sentiment', 'all')
-        
-        if not search_term:
+        params = search_params(data)
+        error = validate_search_params(params)
+        if error:
             return jsonify({
                 'success': False,
-                'message': 'Search term is required'
+                'message': error
             }), 400
         
-        if not assemblies:
-            return jsonify({
-                'success': False,
-                'message': 'At least one assembly must be selected'
-            }), 400
+        search_term = params['searchTerm'].lower()
+        search_mode = params['searchMode']
+        selected_label = params['label']
+        selected_sentiment = params['sentiment']
         
-        if not start_date:
+        page_size = data.get('pageSize')
+        cursor = data.get('cursor')
+        count_only = data.get('countOnly', False)
+        include_totals = data.get('includeTotals', False)
+        
+        if page_size is not None:
+            try:
+                page_size = min(max(int(page_size), 1), 1000)
+            except (TypeError, ValueError):
+                return jsonify({
+                    'success': False,
+                    'message': 'pageSize must be a whole number'
+                }), 400
+        
+        criteria = search_criteria(params)
+        fulltext_args = search_fulltext_args(params)
+        partitions = partition_resolver.resolve(params['assemblies'], params['startDate'], params['endDate'])
+        
+        # A new search (not a further page) gets a query id, so the export
+        # can re-run it server-side instead of receiving the rows back
+        query_id = None
+        if not count_only and not cursor:
+            query_id = create_analysis_session('search-messages', params, {})
+        
+        def search_totals():
+            """Totals over every match, counted without building result rows"""
+            if search_mode == 'fulltext':
+                return count_fulltext(*fulltext_args, label=selected_label, sentiment=selected_sentiment)
+            totals = {'messages': 0, 'members': set(), 'groups': set()}
+            for counts in scan_partitions(partitions, partial(scan_search_counts, **criteria)):
+                totals['messages'] += counts['messages']
+                totals['members'].update(counts['members'])
+                totals['groups'].update(counts['groups'])
+            return {
+                'total_messages': totals['messages'],
+                'total_members': len(totals['members']),
+                'total_groups': len(totals['groups'])
+            }
+        
+        try:
+            if count_only:
+                results = search_totals()
+                results.update({'search_term': search_term, 'search_mode': search_mode})
+                return jsonify({
+                    'success': True,
+                    'results': results
+                })
+            
+            if page_size is not None:
+                # Cursor pagination: one page in a stable order plus the cursor of the next page
+                after = decode_search_cursor(search_mode, cursor) if cursor else None
+                if search_mode == 'fulltext':
+                    rows = search_fulltext(*fulltext_args, label=selected_label, sentiment=selected_sentiment,
+                                           limit=page_size + 1, after=after)
+                    next_key = rows[page_size - 1]['cursor'] if len(rows) > page_size else None
+                    page = rows[:page_size]
+                    for row in page:
+                        row.pop('cursor')
+                else:
+                    page, next_key = search_page(partitions, page_size, after, **criteria)
+                
+                results = {
+                    'search_results': page,
+                    'query_id': query_id,
+                    'page_size': page_size,
+                    'next_cursor': encode_search_cursor(search_mode, next_key) if next_key else None,
+                    'has_more': next_key is not None,
+                    'search_term': search_term,
+                    'search_mode': search_mode
+                }
+                if include_totals:
+                    results.update(search_totals())
+                return jsonify({
+                    'success': True,
+                    'results': results
+                })
+            
+            search_results = all_search_matches(params)
+        except ValueError as e:
             return jsonify({
                 'success': False,
-                'message': 'Start date is required'
+                'message': str(e)
             }), 400
         
-        search_results = []
-        total_messages = 0
+        total_messages = len(search_results)
         total_members = set()
         total_groups = set()
         
-        # Search through each assembly
-        for assembly_name in assemblies:
-            assembly_path = os.path.join('database', assembly_name)
-            if not os.path.exists(assembly_path):
-                continue
-            
-            # Get date directories
-            try:
-                date_dirs = [d for d in os.listdir(assembly_path) 
-                           if os.path.isdir(os.path.join(assembly_path, d)) and 
-                           d.replace('-', '').isdigit()]
-            except:
-                continue
-            
-            # Filter dates based on start and end date
-            if end_date:
-                # Date range: include dates between start and end (inclusive)
-                filtered_dates = []
-                for date_dir in date_dirs:
-                    try:
-                        date_obj = datetime.strptime(date_dir, '%Y-%m-%d')
-                        start_obj = datetime.strptime(start_date, '%Y-%m-%d')
-                        end_obj = datetime.strptime(end_date, '%Y-%m-%d')
-                        
-                        if start_obj <= date_obj <= end_obj:
-                            filtered_dates.append(date_dir)
-                    except ValueError:
-                        continue
-            else:
-                # Single date: exact match only
-                filtered_dates = [start_date] if start_date in date_dirs else []
-            
-            # Search through each date directory
-            for date_dir in filtered_dates:
-                messages_path = os.path.join(assembly_path, date_dir, 'messages')
-                if not os.path.exists(messages_path):
-                    continue
-                
-                # Get all JSON files (groups) in this date directory
-                json_files = [f for f in os.listdir(messages_path) if f.endswith('.json')]
-                
-                for json_file in json_files:
-                    group_name = json_file.replace('.json', '')
-                    file_path = os.path.join(messages_path, json_file)
-                    
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                            
-                        if isinstance(data, list):
-                            # Search through messages in this group
-                            for msg in data:
-                                message_content = msg.get('messageContent', '').lower()
-                                sender = msg.get('sender', {})
-                                sender_name = sender.get('name', 'Unknown')
-                                sender_phone = sender.get('phoneNumber', '')
-                                sentiment = msg.get('predicted_sentiment', 'Neutral')
-                                label = msg.get('predicted_label', 'unknown')
-                                timestamp = msg.get('timestamp', '')
-                                
-                                # Check if message matches search criteria based on search field
-                                message_matches = False
-                                if search_field == 'messageContent':
-                                    message_matches = search_term in message_content
-                                elif search_field == 'senderName':
-                                    message_matches = search_term in sender_name.lower()
-                                elif search_field == 'senderPhone':
-                                    message_matches = search_term in sender_phone
-                                elif search_field == 'groupName':
-                                    message_matches = search_term in group_name.lower()
-                                elif search_field == 'assembly':
-                                    message_matches = search_term in assembly_name.lower()
-                                elif search_field == 'all':
-                                    # Search in all fields
-                                    message_matches = (
-                                        search_term in message_content or
-                                        search_term in sender_name.lower() or
-                                        search_term in sender_phone or
-                                        search_term in group_name.lower() or
-                                        search_term in assembly_name.lower()
-                                    )
-                                else:
-                                    # Default to message content
-                                    message_matches = search_term in message_content
-                                
-                                label_matches = selected_label == 'all' or label == selected_label
-                                sentiment_matches = selected_sentiment == 'all' or sentiment.lower() == selected_sentiment
-                                
-                                if message_matches and label_matches and sentiment_matches:
-                                    # Add to search results
-                                    search_result = {
-                                        'message_content': msg.get('messageContent', ''),
-                                        'sender_name': sender_name,
-                                        'sender_phone': sender_phone,
-                                        'sentiment': sentiment,
-                                        'label': label,
-                                        'timestamp': timestamp,
-                                        'group_name': group_name,
-                                        'assembly': assembly_name,
-                                        'date': date_dir
-                                    }
-                                    
-                                    search_results.append(search_result)
-                                    total_members.add(sender_phone)
-                                    total_groups.add(f"{assembly_name}/{date_dir}/{group_name}")
-                                    total_messages += 1
-                    
-                    except Exception as e:
-                        print(f"Debug: Error searching in group {group_name}: {e}")
-                        continue
-        
-        # Sort results by timestamp (newest first)
-        search_results.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
+        for search_result in search_results:
+            total_members.add(search_result['sender_phone'])
+            total_groups.add(f"{search_result['assembly']}/{search_result['date']}/{search_result['group_name']}")
         
         results = {
             'search_results': search_results,
+            'query_id': query_id,
             'total_messages': total_messages,
             'total_members': len(total_members),
             'total_groups': len(total_groups),
-            'search_term': search_term
+            'search_term': search_term,
+            'search_mode': search_mode
         }
         
         return jsonify({
@@ -3428,6 +3374,8 @@ def get_assembly_groups():
                     print(f"Debug: Error processing group file {csv_file}: {e}")
                     continue
         
+        roster_stats.save()
+        
         # Sort groups by phone count (highest to lowest)
         groups.sort(key=lambda x: x.get('phone_count', 0), reverse=True)
         
@@ -3457,6 +3405,9 @@ def download_group_excel():
         group_name = request.args.get('group', '').strip()
         assembly_name = request.args.get('assembly', '').strip()
         filename = request.args.get('filename', '').strip()
+        export_fmt = export_format(request.args.get('format'))
+        if export_fmt is None:
+            return unsupported_export_format()
         
         print(f"Debug: Download request - Group: {group_name}, Assembly: {assembly_name}, Filename: {filename}")
         
@@ -3507,39 +3458,29 @@ def download_group_excel():
         
         # Read the CSV file and convert to Excel
         try:
-            import pandas as pd
-            
-            # Read CSV file with different encodings
-            try:
-                df = pd.read_csv(csv_file_path, encoding='utf-8')
-            except UnicodeDecodeError:
-                try:
-                    df = pd.read_csv(csv_file_path, encoding='latin-1')
-                except:
-                    df = pd.read_csv(csv_file_path, encoding='cp1252')
-            
-            # Create Excel file in memory
-            from io import BytesIO
-            excel_buffer = BytesIO()
-            
-            # Write to Excel with phone numbers sheet
-            with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name='Phone Numbers', index=False)
-            
-            excel_buffer.seek(0)
+            # Canonical rosters are plain UTF-8; their normalised phone
+            # column is internal and not part of the download
+            df, meta = read_roster(csv_file_path)
+            if meta['normalised_column'] is not None:
+                df = df.drop(columns=[meta['normalised_column']], errors='ignore')
             
             # Generate filename
             safe_group_name = "".join(c for c in group_name if c.isalnum() or c in (' ', '-', '_')).rstrip()
+            rows = df.itertuples(index=False, name=None)
+            
+            if export_fmt != 'xlsx':
+                return streamed_export(export_fmt, list(df.columns), rows, f"{safe_group_name}_phone_numbers")
+            
             excel_filename = f"{safe_group_name}_phone_numbers.xlsx"
             
             print(f"Debug: Generated Excel file: {excel_filename}")
             
-            # Return Excel file
+            # Stream the rows into a phone numbers sheet
             return send_file(
-                excel_buffer,
+                spool_xlsx([('Phone Numbers', list(df.columns), rows)]),
                 as_attachment=True,
                 download_name=excel_filename,
-                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+                mimetype=XLSX_MIMETYPE
             )
             
         except Exception as e:
@@ -3562,6 +3503,9 @@ def download_all_phone_numbers():
     """Download Excel file with all phone numbers from all groups in an assembly"""
     try:
         assembly_name = request.args.get('assembly', '').strip()
+        export_fmt = export_format(request.args.get('format'))
+        if export_fmt is None:
+            return unsupported_export_format()
         
         print(f"Debug: Download all phone numbers request - Assembly: {assembly_name}")
         
@@ -3601,16 +3545,8 @@ def download_all_phone_numbers():
         print(f"Debug: Found {len(csv_files)} CSV files")
         
         try:
-            import pandas as pd
-            from io import BytesIO
-            
-            # Create Excel file in memory
-            excel_buffer = BytesIO()
-            
-            with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-                all_phone_numbers = []
-                group_summary = []
-                
+            def roster_phone_numbers():
+                """Yield (group name, unique phone numbers) one roster file at a time"""
                 for csv_file in csv_files:
                     try:
                         csv_file_path = os.path.join(groups_path, csv_file)
@@ -3618,92 +3554,74 @@ def download_all_phone_numbers():
                         # Extract group name from filename
                         group_name = csv_file.replace('_all_', '_').split('_')[0]
                         
-                        # Read CSV file with different encodings
-                        try:
-                            df = pd.read_csv(csv_file_path, encoding='utf-8')
-                        except UnicodeDecodeError:
-                            try:
-                                df = pd.read_csv(csv_file_path, encoding='latin-1')
-                            except:
-                                df = pd.read_csv(csv_file_path, encoding='cp1252')
-                        
-                        # Look for phone number columns
-                        phone_columns = []
-                        for col in df.columns:
-                            col_lower = str(col).lower()
-                            if any(keyword in col_lower for keyword in ['phone', 'number', 'mobile', 'contact', 'whatsapp']):
-                                phone_columns.append(col)
-                        
-                        if phone_columns:
-                            # Get phone numbers from the first phone column
-                            phone_col = phone_columns[0]
-                            phone_numbers = df[phone_col].dropna().unique()
-                            
-                            # Add to all phone numbers list
-                            for phone in phone_numbers:
-                                all_phone_numbers.append({
-                                    'Group Name': group_name,
-                                    'Phone Number': phone,
-                                    'Assembly': assembly_name
-                                })
-                            
-                            # Add to group summary
-                            group_summary.append({
-                                'Group Name': group_name,
-                                'Phone Count': len(phone_numbers),
-                                'Assembly': assembly_name
-                            })
-                            
-                            print(f"Debug: Processed {group_name} - {len(phone_numbers)} phone numbers")
+                        # The phone column is known from the sidecar of a
+                        # canonical roster, and detected otherwise
+                        df, meta = read_roster(csv_file_path)
+                        if meta['phone_column'] is None:
+                            continue
                         
+                        # Get phone numbers from the first phone column
+                        phone_numbers = df[meta['phone_column']].dropna().unique()
                     except Exception as e:
                         print(f"Debug: Error processing {csv_file}: {e}")
                         continue
-                
-                # Create summary sheet
-                if group_summary:
-                    summary_df = pd.DataFrame(group_summary)
-                    summary_df.to_excel(writer, sheet_name='Group Summary', index=False)
-                
-                # Create all phone numbers sheet
-                if all_phone_numbers:
-                    all_phones_df = pd.DataFrame(all_phone_numbers)
-                    all_phones_df.to_excel(writer, sheet_name='All Phone Numbers', index=False)
-                
-                # Create unique phone numbers sheet (deduplicated)
-                if all_phone_numbers:
-                    unique_phones = []
-                    seen_phones = set()
-                    
-                    for phone_data in all_phone_numbers:
-                        phone = phone_data['Phone Number']
-                        if phone not in seen_phones:
-                            seen_phones.add(phone)
-                            unique_phones.append({
-                                'Phone Number': phone,
-                                'Assembly': assembly_name
-                            })
                     
-                    if unique_phones:
-                        unique_df = pd.DataFrame(unique_phones)
-                        unique_df.to_excel(writer, sheet_name='Unique Phone Numbers', index=False)
+                    yield group_name, phone_numbers
+            
+            safe_assembly_name = "".join(c for c in assembly_name if c.isalnum() or c in (' ', '-', '_')).rstrip()
             
-            excel_buffer.seek(0)
+            def all_phone_rows():
+                for group_name, phone_numbers in roster_phone_numbers():
+                    for phone in phone_numbers:
+                        yield [group_name, phone, assembly_name]
+            
+            if export_fmt != 'xlsx':
+                # Only the all phone numbers sheet, streamed as the rosters are read
+                return streamed_export(export_fmt, ['Group Name', 'Phone Number', 'Assembly'], all_phone_rows(),
+                                       f"{safe_assembly_name}_all_phone_numbers")
+            
+            # One pass over the rosters fills the phone sheets as each file is
+            # read; the summary sheet comes first in the workbook but is
+            # filled last, from the counts gathered on the way
+            workbook = XlsxWorkbook()
+            summary_sheet = workbook.add_sheet('Group Summary', ['Group Name', 'Phone Count', 'Assembly'])
+            all_sheet = workbook.add_sheet('All Phone Numbers', ['Group Name', 'Phone Number', 'Assembly'])
+            unique_sheet = workbook.add_sheet('Unique Phone Numbers', ['Phone Number', 'Assembly'])
+            
+            group_summary = []
+            seen_phones = set()  # unique phone numbers sheet, in first-seen order
+            for group_name, phone_numbers in roster_phone_numbers():
+                group_summary.append([group_name, len(phone_numbers), assembly_name])
+                print(f"Debug: Processed {group_name} - {len(phone_numbers)} phone numbers")
+                for phone in phone_numbers:
+                    all_sheet.append([group_name, phone, assembly_name])
+                    if phone not in seen_phones:
+                        seen_phones.add(phone)
+                        unique_sheet.append([phone, assembly_name])
+            
+            if not group_summary:
+                return jsonify({
+                    'success': False,
+                    'message': f'No phone numbers found in assembly "{assembly_name}"'
+                }), 404
+            
+            for row in group_summary:
+                summary_sheet.append(row)
+            spool = workbook.spool()
             
             # Generate filename
-            safe_assembly_name = "".join(c for c in assembly_name if c.isalnum() or c in (' ', '-', '_')).rstrip()
             excel_filename = f"{safe_assembly_name}_all_phone_numbers.xlsx"
             
             print(f"Debug: Generated Excel file: {excel_filename}")
-            print(f"Debug: Total phone numbers: {len(all_phone_numbers)}")
-            print(f"Debug: Unique phone numbers: {len(unique_phones) if 'unique_phones' in locals() else 0}")
+            print(f"Debug: Total phone numbers: {sum(row[1] for row in group_summary)}")
+            print(f"Debug: Unique phone numbers: {len(seen_phones)}")
             
             # Return Excel file
             return send_file(
-                excel_buffer,
+                spool,
                 as_attachment=True,
                 download_name=excel_filename,
-                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+                mimetype=XLSX_MIMETYPE
             )
             
         except Exception as e:
@@ -3720,63 +3638,6 @@ def download_all_phone_numbers():
             'message': f'Error downloading all phone numbers: {str(e)}'
         }), 500
 
-def estimate_phone_count_from_file(file_path):
-    """Estimate phone number count from CSV file based on file size and structure"""
-    try:
-        # Try to read the CSV file to get actual phone number count
-        try:
-            import pandas as pd
-            
-            # Read CSV file with different encodings
-            try:
-                df = pd.read_csv(file_path, encoding='utf-8')
-            except UnicodeDecodeError:
-                try:
-                    df = pd.read_csv(file_path, encoding='latin-1')
-                except:
-                    df = pd.read_csv(file_path, encoding='cp1252')
-            
-            # Look for phone number columns (common names)
-            phone_columns = []
-            for col in df.columns:
-                col_lower = str(col).lower()
-                if any(keyword in col_lower for keyword in ['phone', 'number', 'mobile', 'contact', 'whatsapp']):
-                    phone_columns.append(col)
-            
-            if phone_columns:
-                # Count unique phone numbers in the first phone column found
-                phone_col = phone_columns[0]
-                phone_count = df[phone_col].dropna().nunique()
-                print(f"Debug: Found {phone_count} unique phone numbers in column '{phone_col}'")
-                return max(1, phone_count)
-            else:
-                # If no phone columns found, estimate from file size
-                file_size = os.path.getsize(file_path)
-                estimated_phones = max(1, file_size // 200)  # More conservative estimate
-                estimated_phones = min(estimated_phones, 5000)
-                print(f"Debug: No phone columns found, estimated {estimated_phones} from file size")
-                return estimated_phones
-                
-        except ImportError:
-            # pandas not available, fall back to file size estimation
-            print("Debug: pandas not available, using file size estimation")
-            file_size = os.path.getsize(file_path)
-            estimated_phones = max(1, file_size // 200)
-            estimated_phones = min(estimated_phones, 5000)
-            return estimated_phones
-            
-        except Exception as e:
-            # Error reading CSV file, fall back to file size estimation
-            print(f"Debug: Error reading CSV file {file_path}: {e}")
-            file_size = os.path.getsize(file_path)
-            estimated_phones = max(1, file_size // 200)
-            estimated_phones = min(estimated_phones, 5000)
-            return estimated_phones
-        
-    except Exception as e:
-        print(f"Debug: Error in estimate_phone_count_from_file for {file_path}: {e}")
-        return 100  # Default fallback
-
 # ============================================================================
 # LABEL MANAGEMENT API
 # ============================================================================
@@ -4075,68 +3936,111 @@ def send_welcome_email_api():
 @api_bp.route('/export-search-results', methods=['POST'])
 @login_required
 def export_search_results():
-    """Export search results to Excel file"""
+    """Export search results to Excel file
+
+    The search is re-run server-side from a queryId returned by
+    search-messages, or from search parameters; rows posted in 'results' by
+    older clients are still accepted.
+    """
     try:
-        import pandas as pd
-        import io
-        from datetime import datetime
-        
         data = request.get_json()
-        results = data.get('results', [])
-        format_type = data.get('format', 'excel')
+        query_id = data.get('queryId')
+        export_fmt = export_format(data.get('format'))
+        if export_fmt is None:
+            return unsupported_export_format()
         
-        if not results:
+        try:
+            if query_id:
+                session = analysis_sessions.load(query_id, 'search-messages')
+                if session is None:
+                    return jsonify({
+                        'success': False,
+                        'message': 'Search not found or expired, please search again'
+                    }), 404
+                # Checked again: the full-text index may have gone stale since
+                error = validate_search_params(session['params'])
+                if error:
+                    return jsonify({
+                        'success': False,
+                        'message': error
+                    }), 400
+                results = iter_all_search_matches(session['params'])
+                columns = SEARCH_RESULT_COLUMNS
+            elif 'results' in data:
+                results = data.get('results', [])
+                # Columns in order of first appearance, as a DataFrame of the rows would have
+                columns = list(dict.fromkeys(key for result in results for key in result))
+            else:
+                params = search_params(data)
+                error = validate_search_params(params)
+                if error:
+                    return jsonify({
+                        'success': False,
+                        'message': error
+                    }), 400
+                results = iter_all_search_matches(params)
+                columns = SEARCH_RESULT_COLUMNS
+            
+            # Matches are produced while the export is written; the first one
+            # is taken here so a malformed query or an empty result is a 400
+            results = iter(results)
+            first_result = next(results, None)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        
+        if first_result is None:
             return jsonify({
                 'success': False,
                 'message': 'No results to export'
             }), 400
+        results = chain([first_result], results)
         
-        # Convert results to DataFrame
-        df = pd.DataFrame(results)
+        # Generate filename
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        filename = f'search_results_{timestamp}'
         
-        # Create Excel file in memory
-        output = io.BytesIO()
+        if export_fmt != 'xlsx':
+            result_rows = ([result.get(column) for column in columns] for result in results)
+            return streamed_export(export_fmt, columns, result_rows, filename)
         
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            # Write main results sheet
-            df.to_excel(writer, sheet_name='Search Results', index=False)
-            
-            # Add summary sheet
-            summary_data = {
-                'Metric': ['Total Messages', 'Total Groups', 'Total Assemblies', 'Export Date'],
-                'Value': [
-                    len(results),
-                    len(df['group_name'].unique()) if 'group_name' in df.columns else 0,
-                    len(df['assembly'].unique()) if 'assembly' in df.columns else 0,
-                    datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                ]
-            }
-            summary_df = pd.DataFrame(summary_data)
-            summary_df.to_excel(writer, sheet_name='Summary', index=False)
-            
-            # Add unique senders sheet if data exists
-            if 'sender_name' in df.columns and 'sender_phone' in df.columns:
-                unique_senders = df[['sender_name', 'sender_phone', 'assembly', 'group_name']].drop_duplicates()
-                unique_senders.to_excel(writer, sheet_name='Unique Senders', index=False)
-        
-        output.seek(0)
+        # One pass over the matches fills the results sheet and gathers the
+        # summary and the unique senders, which are written after it
+        workbook = XlsxWorkbook()
+        results_sheet = workbook.add_sheet('Search Results', columns)
+        summary_sheet = workbook.add_sheet('Summary', ['Metric', 'Value'])
+        sender_columns = ['sender_name', 'sender_phone', 'assembly', 'group_name']
+        has_senders = 'sender_name' in columns and 'sender_phone' in columns
+        senders_sheet = workbook.add_sheet('Unique Senders', sender_columns) if has_senders else None
         
-        # Generate filename
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'search_results_{timestamp}.xlsx'
+        total_messages = 0
+        groups = set()
+        assemblies = set()
+        unique_senders = {}
+        for result in results:
+            results_sheet.append([result.get(column) for column in columns])
+            total_messages += 1
+            groups.add(result.get('group_name'))
+            assemblies.add(result.get('assembly'))
+            if has_senders:
+                unique_senders[tuple(result.get(column) for column in sender_columns)] = None
+        
+        summary_sheet.append(['Total Messages', total_messages])
+        summary_sheet.append(['Total Groups', len(groups) if 'group_name' in columns else 0])
+        summary_sheet.append(['Total Assemblies', len(assemblies) if 'assembly' in columns else 0])
+        summary_sheet.append(['Export Date', datetime.now().strftime('%Y-%m-%d %H:%M:%S')])
+        for sender in unique_senders:
+            senders_sheet.append(sender)
         
         return send_file(
-            output,
+            workbook.spool(),
             as_attachment=True,
-            download_name=filename,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            download_name=f'{filename}.xlsx',
+            mimetype=XLSX_MIMETYPE
         )
         
-    except ImportError:
-        return jsonify({
-            'success': False,
-            'message': 'Excel export requires pandas and openpyxl libraries'
-        }), 500
     except Exception as e:
         return jsonify({
             'success': False,
@@ -2,6 +2,8 @@
 let assemblies = [];
 let selectedAssemblies = new Set();
 let searchResults = null;
+let searchRequest = null;  // Last search request, re-sent with a cursor for further pages
+const SEARCH_PAGE_SIZE = 200;
 
 // Initialize when page loads
 document.addEventListener('DOMContentLoaded', function() {
@@ -324,6 +326,7 @@ async function performSearch() {
         const endDate = document.getElementById('endDate')?.value;
         const searchTerm = document.getElementById('searchTerm')?.value.trim();
         const searchField = document.getElementById('searchField')?.value || 'message_content';
+        const searchMode = document.getElementById('searchMode')?.value || 'contains';
         const sentiment = document.getElementById('sentiment')?.value || 'all';
         const label = document.getElementById('label')?.value || 'all';
         
@@ -353,34 +356,22 @@ async function performSearch() {
             endDate: endDate,
             searchTerm: searchTerm,
             searchField: searchField,
+            searchMode: searchMode,
             sentiment: sentiment,
-            label: label
+            label: label,
+            pageSize: SEARCH_PAGE_SIZE
         };
+        searchRequest = requestData;
         
         console.log('Sending search request:', requestData);
         
-        // Make API call
-        const response = await fetch('/api/search-messages', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify(requestData)
-        });
-        
-        if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
-        }
-        
-        const data = await response.json();
+        // Fetch the first page; totals are counted by a separate request
+        const data = await fetchSearchPage(requestData);
         
-        if (data.success) {
-            searchResults = data.results;
-            console.log('Search results:', data.results);
-            displaySearchResults(data.results, searchTerm, searchField);
-        } else {
-            throw new Error(data.message || 'Search failed');
-        }
+        searchResults = data.results;
+        console.log('Search results:', data.results);
+        displaySearchResults(data.results, searchTerm, searchField);
+        loadSearchTotals(requestData);
         
     } catch (error) {
         console.error('Error during search:', error);
@@ -389,6 +380,72 @@ async function performSearch() {
     }
 }
 
+// Fetch one page of search results (requestData may carry a cursor)
+async function fetchSearchPage(requestData) {
+    const response = await fetch('/api/search-messages', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify(requestData)
+    });
+    
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    
+    const data = await response.json();
+    if (!data.success) {
+        throw new Error(data.message || 'Search failed');
+    }
+    return data;
+}
+
+// Count all matches in the background and fill in the summary cards
+async function loadSearchTotals(requestData) {
+    try {
+        const data = await fetchSearchPage({ ...requestData, countOnly: true });
+        if (searchRequest !== requestData) return;  // A newer search was started
+        Object.assign(searchResults, data.results);
+        updateSummaryCards(searchResults, requestData.searchTerm);
+    } catch (error) {
+        console.error('Error counting search results:', error);
+    }
+}
+
+// Append the next page of results to the table
+async function loadMoreResults() {
+    if (!searchResults || !searchResults.next_cursor) return;
+    
+    const button = document.getElementById('loadMoreButton');
+    if (button) button.disabled = true;
+    
+    try {
+        const data = await fetchSearchPage({ ...searchRequest, cursor: searchResults.next_cursor });
+        appendSearchPage(data.results);
+        displayResultsTable(data.results.search_results, searchRequest.searchTerm, searchRequest.searchField, true);
+        updateLoadMore();
+    } catch (error) {
+        console.error('Error loading more results:', error);
+        showError('Error loading more results: ' + error.message);
+    } finally {
+        if (button) button.disabled = false;
+    }
+}
+
+function appendSearchPage(page) {
+    searchResults.search_results = searchResults.search_results.concat(page.search_results);
+    searchResults.next_cursor = page.next_cursor;
+    searchResults.has_more = page.has_more;
+}
+
+function updateLoadMore() {
+    const container = document.getElementById('loadMoreContainer');
+    if (container) {
+        container.style.display = searchResults && searchResults.has_more ? 'block' : 'none';
+    }
+}
+
 // Display search results
 function displaySearchResults(results, searchTerm, searchField = 'message_content') {
     hideLoading();
@@ -416,6 +473,7 @@ function displaySearchResults(results, searchTerm, searchField = 'message_conten
     
     // Display results table
     displayResultsTable(results.search_results, searchTerm, searchField);
+    updateLoadMore();
 }
 
 // Update summary cards
@@ -425,16 +483,19 @@ function updateSummaryCards(results, searchTerm) {
     const totalGroupsElement = document.getElementById('totalGroups');
     const searchTermElement = document.getElementById('searchTermDisplay');
     
+    // Totals arrive separately from the first page; show a placeholder until then
+    const counted = results.total_messages !== undefined;
+    
     if (totalMessagesElement) {
-        totalMessagesElement.textContent = results.total_messages || 0;
+        totalMessagesElement.textContent = counted ? (results.total_messages || 0) : '…';
     }
     
     if (totalMembersElement) {
-        totalMembersElement.textContent = results.total_members || 0;
+        totalMembersElement.textContent = counted ? (results.total_members || 0) : '…';
     }
     
     if (totalGroupsElement) {
-        totalGroupsElement.textContent = results.total_groups || 0;
+        totalGroupsElement.textContent = counted ? (results.total_groups || 0) : '…';
     }
     
     if (searchTermElement) {
@@ -443,7 +504,7 @@ function updateSummaryCards(results, searchTerm) {
 }
 
 // Display results table
-function displayResultsTable(searchResults, searchTerm = '', searchField = 'message_content') {
+function displayResultsTable(searchResults, searchTerm = '', searchField = 'message_content', append = false) {
     const tableBody = document.getElementById('searchResultsTableBody');
     if (!tableBody) {
         console.error('Results table body not found');
@@ -510,7 +571,11 @@ function displayResultsTable(searchResults, searchTerm = '', searchField = 'mess
         `;
     });
     
-    tableBody.innerHTML = html;
+    if (append) {
+        tableBody.insertAdjacentHTML('beforeend', html);
+    } else {
+        tableBody.innerHTML = html;
+    }
 }
 
 // Highlight search term in any text
@@ -579,79 +644,23 @@ function exportResults(format = 'csv') {
         return;
     }
     
-    try {
-        if (format === 'excel') {
-            // Export as Excel
-            exportToExcel(searchResults.search_results);
-        } else {
-            // Export as CSV
-            exportToCSV(searchResults.search_results);
-        }
-    } catch (error) {
-        console.error('Error exporting results:', error);
-        showError('Error exporting results: ' + error.message);
-    }
-}
-
-// Export to CSV
-function exportToCSV(results) {
-    const csvContent = createCSVContent(results);
-    
-    // Create download link
-    const blob = new Blob([csvContent], { type: 'text/csv;charset=utf-8;' });
-    const link = document.createElement('a');
-    const url = URL.createObjectURL(blob);
-    
-    link.setAttribute('href', url);
-    link.setAttribute('download', `search_results_${new Date().toISOString().split('T')[0]}.csv`);
-    link.style.visibility = 'hidden';
-    
-    document.body.appendChild(link);
-    link.click();
-    document.body.removeChild(link);
-    
-    console.log('CSV exported successfully');
-    showSuccess('CSV file downloaded successfully!');
-}
-
-// Export to Excel
-function exportToExcel(results) {
-    try {
-        // Create Excel content using a simple approach
-        const excelContent = createExcelContent(results);
-        
-        // Create download link
-        const blob = new Blob([excelContent], { 
-            type: 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet' 
-        });
-        const link = document.createElement('a');
-        const url = URL.createObjectURL(blob);
-        
-        link.setAttribute('href', url);
-        link.setAttribute('download', `search_results_${new Date().toISOString().split('T')[0]}.xlsx`);
-        link.style.visibility = 'hidden';
-        
-        document.body.appendChild(link);
-        link.click();
-        document.body.removeChild(link);
-        
-        console.log('Excel exported successfully');
-        showSuccess('Excel file downloaded successfully!');
-    } catch (error) {
-        console.error('Error creating Excel file:', error);
-        // Fallback to server-side Excel generation
-        exportToExcelServer(results);
+    // Both formats are generated server-side from the query id and cover
+    // every match, not only the pages loaded so far
+    if (format === 'excel') {
+        exportFromServer('excel', 'xlsx', 'Excel');
+    } else {
+        exportFromServer('csv.gz', 'csv.gz', 'CSV');
     }
 }
 
-// Server-side Excel export
-function exportToExcelServer(results) {
+// Server-side export
+function exportFromServer(format, extension, label) {
     try {
-        // Send request to server to generate Excel file
-        const requestData = {
-            results: results,
-            format: 'excel'
-        };
+        // The server re-runs the search, so only the query id (or, failing
+        // that, the search parameters) is sent instead of the result rows
+        const requestData = searchResults.query_id
+            ? { queryId: searchResults.query_id, format: format }
+            : { ...searchRequest, pageSize: undefined, format: format };
         
         fetch('/api/export-search-results', {
             method: 'POST',
@@ -671,120 +680,24 @@ function exportToExcelServer(results) {
             const url = URL.createObjectURL(blob);
             
             link.setAttribute('href', url);
-            link.setAttribute('download', `search_results_${new Date().toISOString().split('T')[0]}.xlsx`);
+            link.setAttribute('download', `search_results_${new Date().toISOString().split('T')[0]}.${extension}`);
             link.style.visibility = 'hidden';
             
             document.body.appendChild(link);
             link.click();
             document.body.removeChild(link);
             
-            console.log('Excel exported successfully via server');
-            showSuccess('Excel file downloaded successfully!');
+            console.log(`${label} exported successfully via server`);
+            showSuccess(`${label} file downloaded successfully!`);
         })
         .catch(error => {
-            console.error('Error exporting Excel via server:', error);
-            showError('Error exporting Excel: ' + error.message);
+            console.error(`Error exporting ${label} via server:`, error);
+            showError(`Error exporting ${label}: ` + error.message);
         });
     } catch (error) {
-        console.error('Error in server Excel export:', error);
-        showError('Error exporting Excel: ' + error.message);
-    }
-}
-
-// Create Excel content (simple XML format)
-function createExcelContent(results) {
-    const headers = [
-        'Message Content',
-        'Sender Name',
-        'Phone Number',
-        'Group Name',
-        'Assembly',
-        'Date',
-        'Sentiment',
-        'Label'
-    ];
-    
-    let xmlContent = '<?xml version="1.0"?>';
-    xmlContent += '<Workbook xmlns="urn:schemas-microsoft-com:office:spreadsheet" xmlns:o="urn:schemas-microsoft-com:office:office" xmlns:x="urn:schemas-microsoft-com:office:excel" xmlns:ss="urn:schemas-microsoft-com:office:spreadsheet" xmlns:html="http://www.w3.org/TR/REC-html40">';
-    xmlContent += '<Worksheet ss:Name="Search Results">';
-    xmlContent += '<Table>';
-    
-    // Add headers
-    xmlContent += '<Row>';
-    headers.forEach(header => {
-        xmlContent += `<Cell><Data ss:Type="String">${escapeXml(header)}</Data></Cell>`;
-    });
-    xmlContent += '</Row>';
-    
-    // Add data rows
-    results.forEach(result => {
-        xmlContent += '<Row>';
-        const rowData = [
-            result.message_content || '',
-            result.sender_name || '',
-            result.sender_phone || '',
-            result.group_name || '',
-            result.assembly || '',
-            result.date || '',
-            result.sentiment || '',
-            result.label || ''
-        ];
-        
-        rowData.forEach(data => {
-            xmlContent += `<Cell><Data ss:Type="String">${escapeXml(data)}</Data></Cell>`;
-        });
-        xmlContent += '</Row>';
-    });
-    
-    xmlContent += '</Table>';
-    xmlContent += '</Worksheet>';
-    xmlContent += '</Workbook>';
-    
-    return xmlContent;
-}
-
-// Escape XML special characters
-function escapeXml(text) {
-    if (!text) return '';
-    return text.toString()
-        .replace(/&/g, '&amp;')
-        .replace(/</g, '&lt;')
-        .replace(/>/g, '&gt;')
-        .replace(/"/g, '&quot;')
-        .replace(/'/g, '&#39;');
-}
-
-// Create CSV content
-function createCSVContent(results) {
-    const headers = [
-        'Message Content',
-        'Sender Name',
-        'Phone Number',
-        'Group Name',
-        'Assembly',
-        'Date',
-        'Sentiment',
-        'Label'
-    ];
-    
-    let csvContent = headers.join(',') + '\n';
-    
-    results.forEach(result => {
-        const row = [
-            `"${(result.message_content || '').replace(/"/g, '""')}"`,
-            `"${(result.sender_name || '').replace(/"/g, '""')}"`,
-            `"${(result.sender_phone || '').replace(/"/g, '""')}"`,
-            `"${(result.group_name || '').replace(/"/g, '""')}"`,
-            `"${(result.assembly || '').replace(/"/g, '""')}"`,
-            `"${(result.date || '').replace(/"/g, '""')}"`,
-            `"${(result.sentiment || '').replace(/"/g, '""')}"`,
-            `"${(result.label || '').replace(/"/g, '""')}"`
-        ];
-        
-        csvContent += row.join(',') + '\n';
-    });
-    
-    return csvContent;
+        console.error(`Error in server ${label} export:`, error);
+        showError(`Error exporting ${label}: ` + error.message);
+    }
 }
 
 // Clear search
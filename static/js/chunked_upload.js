@@ -0,0 +1,145 @@
+// Chunked, resumable uploads for the report and group upload pages
+//
+// A batch that fits into one request is posted as files[] as before. A larger
+// batch is sent file by file through /api/uploads in chunks, each with its
+// checksum, and the finished uploads are posted as upload_ids[] instead.
+// Interrupted chunks are retried from the offset the server reports, and the
+// upload id of each file is remembered so a reloaded page resumes it.
+
+const DIRECT_UPLOAD_LIMIT = 12 * 1024 * 1024;  // below the server's 16MB request limit
+const CHUNK_RETRIES = 5;
+
+class UploadFailure extends Error {
+    constructor(message, response) {
+        super(message);
+        this.uploadMessage = message;
+        this.response = response || {};
+    }
+}
+
+// Append selectedFiles to formData, uploading them in chunks first if the batch is too large
+function appendUploadFiles(formData, files, onProgress) {
+    const total = files.reduce((sum, file) => sum + file.size, 0);
+    if (total <= DIRECT_UPLOAD_LIMIT) {
+        files.forEach(file => formData.append('files[]', file));
+        return Promise.resolve();
+    }
+
+    let sent = 0;
+    return files.reduce((previous, file) => previous.then(() =>
+        uploadInChunks(file, offset => {
+            if (onProgress) {
+                onProgress(`Uploading ${file.name}: ${Math.floor((sent + offset) * 100 / total)}%`);
+            }
+        }).then(uploadId => {
+            sent += file.size;
+            formData.append('upload_ids[]', uploadId);
+        })
+    ), Promise.resolve());
+}
+
+// Upload one file in chunks and resolve with its upload id
+async function uploadInChunks(file, onProgress) {
+    const key = `chunkedUpload:${file.name}:${file.size}:${file.lastModified}`;
+    let upload = null;
+
+    // Resume the upload of the same file started earlier, if the server still has it
+    const previousId = localStorage.getItem(key);
+    if (previousId) {
+        const response = await fetch(`/api/uploads/${previousId}`);
+        upload = response.ok ? await response.json() : null;
+    }
+    if (!upload) {
+        upload = await uploadRequest('/api/uploads', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({filename: file.name, size: file.size})
+        });
+        localStorage.setItem(key, upload.upload_id);
+    }
+
+    let offset = upload.offset;
+    let failures = 0;
+    while (offset < file.size) {
+        onProgress(offset);
+        const chunk = file.slice(offset, Math.min(offset + upload.chunk_size, file.size));
+        const headers = {'Content-Type': 'application/octet-stream'};
+        Object.assign(headers, await chunkChecksum(await chunk.arrayBuffer()));
+        try {
+            const result = await uploadRequest(`/api/uploads/${upload.upload_id}?offset=${offset}`, {
+                method: 'PUT',
+                headers: headers,
+                body: chunk
+            });
+            offset = result.offset;
+            failures = 0;
+        } catch (error) {
+            const retryable = error.status === 0 || error.status >= 500 || error.response.offset !== undefined;
+            if (++failures > CHUNK_RETRIES || !retryable) {
+                throw error;
+            }
+            // Continue from whatever the server actually received
+            await new Promise(resolve => setTimeout(resolve, 1000 * failures));
+            const status = await fetch(`/api/uploads/${upload.upload_id}`).then(response => response.json());
+            if (!status.success) {
+                localStorage.removeItem(key);
+                throw new UploadFailure(status.message, status);
+            }
+            offset = status.offset;
+        }
+    }
+    onProgress(file.size);
+    localStorage.removeItem(key);
+    return upload.upload_id;
+}
+
+async function uploadRequest(url, options) {
+    let response;
+    try {
+        response = await fetch(url, options);
+    } catch (error) {
+        const failure = new UploadFailure('Network error');
+        failure.status = 0;
+        throw failure;
+    }
+    const data = await response.json().catch(() => ({success: false, message: response.statusText}));
+    if (!response.ok || !data.success) {
+        const failure = new UploadFailure(data.message, data);
+        failure.status = response.status;
+        throw failure;
+    }
+    return data;
+}
+
+// SHA-256 where the browser offers it (secure contexts only), CRC32 otherwise
+async function chunkChecksum(buffer) {
+    if (window.crypto && window.crypto.subtle) {
+        const digest = await window.crypto.subtle.digest('SHA-256', buffer);
+        return {'X-Chunk-SHA256': hexString(new Uint8Array(digest))};
+    }
+    return {'X-Chunk-CRC32': (crc32(new Uint8Array(buffer)) >>> 0).toString(16).padStart(8, '0')};
+}
+
+function hexString(bytes) {
+    return Array.from(bytes, byte => byte.toString(16).padStart(2, '0')).join('');
+}
+
+const CRC32_TABLE = (() => {
+    const table = new Uint32Array(256);
+    for (let n = 0; n < 256; n++) {
+        let c = n;
+        for (let k = 0; k < 8; k++) {
+            c = c & 1 ? 0xEDB88320 ^ (c >>> 1) : c >>> 1;
+        }
+        table[n] = c >>> 0;
+    }
+    return table;
+})();
+
+function crc32(bytes) {
+    let crc = 0xFFFFFFFF;
+    for (let i = 0; i < bytes.length; i++) {
+        crc = CRC32_TABLE[(crc ^ bytes[i]) & 0xFF] ^ (crc >>> 8);
+    }
+    return crc ^ 0xFFFFFFFF;
+}
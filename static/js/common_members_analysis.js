@@ -4,6 +4,7 @@ let selectedAssemblies = new Set();
 let allMessages = {}; // Store all messages for search functionality
 let availableLabels = new Set(); // Store unique labels
 let currentAnalysisResults = null; // Store current analysis results
+let currentAnalysisId = null; // Server-side snapshot of the last analysis, used by exports
 
 // Pagination variables
 let currentPage = 1;
@@ -317,6 +318,7 @@ async function analyzeCommonMembers() {
         
         if (data.success) {
             console.log('Common members analysis results:', data.results);
+            currentAnalysisId = data.analysis_id || null;
             displayCommonMembersResults(data.results);
         } else {
             throw new Error(data.message || 'Common members analysis failed');
@@ -751,7 +753,8 @@ async function exportCommonMembersExcel() {
             assemblies: assemblies,
             startDate: startDate,
             endDate: endDate,
-            sentiment: sentiment
+            sentiment: sentiment,
+            analysisId: currentAnalysisId
         };
         
         console.log('Sending Excel export request:', requestData);
@@ -7,6 +7,7 @@ let currentPage = 1;
 let itemsPerPage = 15;
 let totalItems = 0;
 let allGroupData = [];
+let currentAnalysisId = null; // Server-side snapshot of the last analysis, used by exports
 
 // Initialize when page loads
 document.addEventListener('DOMContentLoaded', function() {
@@ -365,6 +366,7 @@ async function analyzeGroupSenders() {
         
         if (data.success) {
             console.log('Group sender analysis results:', data.results);
+            currentAnalysisId = data.analysis_id || null;
             displayGroupSenderResults(data.results);
         } else {
             throw new Error(data.message || 'Group sender analysis failed');
@@ -1641,7 +1643,8 @@ async function exportPositiveUsersExcel() {
             assemblies: assemblies,
             startDate: startDate,
             endDate: endDate,
-            sentiment: sentiment
+            sentiment: sentiment,
+            analysisId: currentAnalysisId
         };
         
         console.log('Sending positive users Excel export request:', requestData);
@@ -1727,7 +1730,8 @@ async function exportNegativeUsersExcel() {
             assemblies: assemblies,
             startDate: startDate,
             endDate: endDate,
-            sentiment: sentiment
+            sentiment: sentiment,
+            analysisId: currentAnalysisId
         };
         
         console.log('Sending negative users Excel export request:', requestData);
@@ -0,0 +1,58 @@
+import os
+import json
+
+from utils.message_store import MessageStore
+
+ASSEMBLY = 'Test Assembly'
+DATE = '2025-08-22'
+
+def message(name, phone, content):
+    return {
+        'sender': {'name': name, 'phoneNumber': phone},
+        'messageContent': content,
+        'messageType': 'text',
+        'predicted_label': 'casual_chat',
+        'predicted_sentiment': 'Positive'
+    }
+
+def write_group(messages_dir, filename, messages):
+    with open(os.path.join(messages_dir, filename), 'w', encoding='utf-8') as f:
+        json.dump(messages, f)
+
+def test_upload_into_unbuilt_date_keeps_existing_files(tmp_path):
+    store = MessageStore(str(tmp_path / 'database'), str(tmp_path / 'message_store'))
+    messages_dir = store.messages_dir(ASSEMBLY, DATE)
+    os.makedirs(messages_dir)
+    for index in range(3):
+        write_group(messages_dir, f'existing_{index}.json',
+                    [message(f'Member {index}', f'9198765432{index}{row}', f'hello {row}') for row in range(2)])
+
+    # As upload_reports does: save the file, then ingest only what was decoded
+    uploaded = [message('Uploader', '919999999999', 'new report')]
+    write_group(messages_dir, 'uploaded.json', uploaded)
+    partition = store.ingest(ASSEMBLY, DATE, {'uploaded.json': uploaded})
+
+    assert partition.files == ['existing_0.json', 'existing_1.json', 'existing_2.json', 'uploaded.json']
+    assert len(partition) == 7
+    assert partition.sources == store.source_signature(ASSEMBLY, DATE)
+
+    # The persisted partition is complete too
+    reloaded = MessageStore(store.database_path, store.store_path).get_partition(ASSEMBLY, DATE)
+    assert reloaded.files == partition.files
+    assert len(reloaded) == 7
+
+def test_upload_parses_files_missing_from_an_outdated_partition(tmp_path):
+    store = MessageStore(str(tmp_path / 'database'), str(tmp_path / 'message_store'))
+    messages_dir = store.messages_dir(ASSEMBLY, DATE)
+    os.makedirs(messages_dir)
+    write_group(messages_dir, 'first.json', [message('A', '919876543210', 'one')])
+    store.get_partition(ASSEMBLY, DATE)
+
+    # Copied in by hand, without going through the store
+    write_group(messages_dir, 'copied.json', [message('B', '919876543211', 'two')])
+    uploaded = [message('C', '919876543212', 'three')]
+    write_group(messages_dir, 'uploaded.json', uploaded)
+    partition = store.ingest(ASSEMBLY, DATE, {'uploaded.json': uploaded})
+
+    assert partition.files == ['copied.json', 'first.json', 'uploaded.json']
+    assert sorted(partition.column('content')) == ['one', 'three', 'two']
@@ -0,0 +1,100 @@
+"""
+Server-side analysis sessions
+
+An analysis endpoint stores the aggregates it computed as a snapshot file
+analysis_sessions/<analysis id>.json and returns the id to the browser. Views
+and exports of that analysis read the snapshot instead of rescanning the
+corpus for the same parameters. Analyses that are cheap to recompute (the
+group sender analysis sums per-group rollups) store only their parameters
+and a signature of the report files they covered, and are recomputed while
+the files are unchanged; what their exports need on top is computed on the
+first export and written back into the snapshot. Snapshots live on disk, so
+every gunicorn worker can serve them, and are pruned once they are older
+than the TTL.
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import threading
+
+SESSION_PATH = os.environ.get('ANALYSIS_SESSION_PATH') or 'analysis_sessions'
+SESSION_TTL = int(os.environ.get('ANALYSIS_SESSION_TTL', 24 * 3600))  # seconds
+SESSION_FORMAT_VERSION = 1
+PRUNE_INTERVAL = 600  # seconds between sweeps for expired snapshots
+
+_SESSION_ID = re.compile(r'^[0-9a-f]{32}$')
+
+class AnalysisSessionStore:
+    """Snapshots of computed analyses, addressed by analysis id"""
+
+    def __init__(self, path=SESSION_PATH, ttl=SESSION_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._last_prune = 0
+        self._lock = threading.Lock()
+
+    def session_file(self, analysis_id):
+        return os.path.join(self.path, f'{analysis_id}.json')
+
+    def create(self, kind, params, data):
+        """Persist a snapshot of an analysis and return its id"""
+        analysis_id = uuid.uuid4().hex
+        self.save({
+            'format': SESSION_FORMAT_VERSION,
+            'id': analysis_id,
+            'kind': kind,
+            'params': params,
+            'created_at': time.time(),
+            'data': data
+        })
+        self.prune()
+        return analysis_id
+
+    def save(self, session):
+        """Write a snapshot as loaded (or created), e.g. after adding to its data"""
+        path = self.session_file(session['id'])
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(session, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    def load(self, analysis_id, kind=None):
+        """Snapshot of an analysis, or None if it is unknown, expired or of another kind"""
+        if not isinstance(analysis_id, str) or not _SESSION_ID.match(analysis_id):
+            return None
+        path = self.session_file(analysis_id)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                session = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"Warning: Discarding unreadable analysis session {path}: {e}")
+            return None
+        if session.get('format') != SESSION_FORMAT_VERSION:
+            return None
+        if kind is not None and session.get('kind') != kind:
+            return None
+        if time.time() - session.get('created_at', 0) > self.ttl:
+            return None
+        return session
+
+    def prune(self):
+        """Delete expired snapshots, at most once every PRUNE_INTERVAL seconds"""
+        now = time.time()
+        with self._lock:
+            if now - self._last_prune < PRUNE_INTERVAL:
+                return
+            self._last_prune = now
+        try:
+            for entry in os.scandir(self.path):
+                if entry.name.endswith('.json') and now - entry.stat().st_mtime > self.ttl:
+                    os.remove(entry.path)
+        except OSError as e:
+            print(f"Warning: Could not prune analysis sessions in {self.path}: {e}")
+
+analysis_sessions = AnalysisSessionStore()
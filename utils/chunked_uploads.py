@@ -0,0 +1,258 @@
+"""
+Chunked, resumable uploads
+
+Files larger than a single request allows (Config.MAX_CONTENT_LENGTH) are
+sent in chunks. POST /api/uploads opens an upload (filename, total size and
+optionally the SHA-256 of the whole file) and returns its id; every chunk
+is then PUT to /api/uploads/<id>?offset=N with the checksum of the chunk in
+an X-Chunk-SHA256 or X-Chunk-CRC32 header. Chunks are streamed from the
+request straight into chunked_uploads/<id>.part and only kept if their
+checksum matches, so the size of the .part file is the offset to resume
+from (GET /api/uploads/<id>). A finished upload is handed to
+/api/upload-reports or /api/upload-groups as upload_ids[] in place of
+files[], where it is used like an uploaded file and moved into the
+database rather than copied. Uploads live on disk, so chunks may reach any
+gunicorn worker, and are pruned once idle for longer than the TTL.
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import zlib
+import fcntl
+import shutil
+import hashlib
+import threading
+
+UPLOAD_PATH = os.environ.get('CHUNKED_UPLOAD_PATH') or 'chunked_uploads'
+UPLOAD_TTL = int(os.environ.get('CHUNKED_UPLOAD_TTL', 24 * 3600))  # seconds since the last chunk
+UPLOAD_MAX_SIZE = int(os.environ.get('CHUNKED_UPLOAD_MAX_SIZE', 2 * 1024 ** 3))  # bytes per file
+UPLOAD_CHUNK_SIZE = int(os.environ.get('CHUNKED_UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))  # suggested to clients
+UPLOAD_FORMAT_VERSION = 1
+PRUNE_INTERVAL = 600  # seconds between sweeps for expired uploads
+COPY_BLOCK_SIZE = 1024 * 1024  # bytes read from the request per write
+
+_UPLOAD_ID = re.compile(r'^[0-9a-f]{32}$')
+_SHA256 = re.compile(r'^[0-9a-f]{64}$')
+
+class UploadError(Exception):
+    """A request the upload cannot accept; status is the HTTP status to answer with"""
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+class CompletedUpload:
+    """A fully received upload, used by the upload endpoints like a werkzeug FileStorage"""
+
+    def __init__(self, store, upload):
+        self.store = store
+        self.upload_id = upload['id']
+        self.filename = upload['filename']
+        self.path = store.data_file(self.upload_id)
+        self._stream = None
+
+    @property
+    def stream(self):
+        if self._stream is None:
+            self._stream = open(self.path, 'rb')
+        return self._stream
+
+    def read(self, *args):
+        return self.stream.read(*args)
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+    def save(self, dst):
+        """Move the received file to dst; the upload is finished with"""
+        self.close()
+        shutil.move(self.path, dst)
+        self.store.discard(self.upload_id)
+
+    def release(self):
+        """Drop the upload once its content has been consumed"""
+        self.close()
+        self.store.discard(self.upload_id)
+
+class ChunkedUploadStore:
+    """Uploads in progress: <id>.json (what is being uploaded) and <id>.part (bytes received so far)"""
+
+    def __init__(self, path=UPLOAD_PATH, ttl=UPLOAD_TTL, max_size=UPLOAD_MAX_SIZE):
+        self.path = path
+        self.ttl = ttl
+        self.max_size = max_size
+        self._last_prune = 0
+        self._lock = threading.Lock()
+
+    def meta_file(self, upload_id):
+        return os.path.join(self.path, f'{upload_id}.json')
+
+    def data_file(self, upload_id):
+        return os.path.join(self.path, f'{upload_id}.part')
+
+    def create(self, user_id, filename, size, sha256=None):
+        """Open an upload of size bytes and return its description"""
+        filename = os.path.basename(str(filename or '').replace('\\', '/')).strip()
+        if not filename:
+            raise UploadError('Missing filename')
+        if not isinstance(size, int) or isinstance(size, bool) or size < 0:
+            raise UploadError('size must be a non-negative integer')
+        if size > self.max_size:
+            raise UploadError(f'File too large ({size} bytes, at most {self.max_size})', 413)
+        if sha256 is not None:
+            sha256 = str(sha256).lower()
+            if not _SHA256.match(sha256):
+                raise UploadError('sha256 must be 64 hexadecimal digits')
+
+        self.prune()
+        upload_id = uuid.uuid4().hex
+        upload = {
+            'format': UPLOAD_FORMAT_VERSION,
+            'id': upload_id,
+            'user_id': user_id,
+            'filename': filename,
+            'size': size,
+            'sha256': sha256,
+            'created_at': time.time()
+        }
+        os.makedirs(self.path, exist_ok=True)
+        open(self.data_file(upload_id), 'wb').close()
+        path = self.meta_file(upload_id)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(upload, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return self.status(upload)
+
+    def load(self, upload_id, user_id):
+        """Description of an upload of user_id; raises UploadError if there is none"""
+        if not isinstance(upload_id, str) or not _UPLOAD_ID.match(upload_id):
+            raise UploadError('Unknown upload', 404)
+        path = self.meta_file(upload_id)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                upload = json.load(f)
+        except FileNotFoundError:
+            raise UploadError('Unknown upload', 404)
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"Warning: Discarding unreadable upload {path}: {e}")
+            raise UploadError('Unknown upload', 404)
+        if upload.get('format') != UPLOAD_FORMAT_VERSION or upload.get('user_id') != user_id:
+            raise UploadError('Unknown upload', 404)
+        if not os.path.exists(self.data_file(upload_id)):
+            raise UploadError('Unknown upload', 404)
+        return upload
+
+    def status(self, upload):
+        """Progress of an upload: offset is where the next chunk has to start"""
+        offset = os.path.getsize(self.data_file(upload['id']))
+        return {
+            'upload_id': upload['id'],
+            'filename': upload['filename'],
+            'size': upload['size'],
+            'offset': offset,
+            'complete': offset == upload['size'],
+            'chunk_size': UPLOAD_CHUNK_SIZE
+        }
+
+    def write_chunk(self, upload_id, user_id, offset, stream, sha256=None, crc32=None):
+        """Append the chunk read from stream at offset, if its checksum matches
+
+        Returns the new status. A chunk that does not start at the current
+        offset is refused with status 409 and the offset to resume from.
+        """
+        upload = self.load(upload_id, user_id)
+        if sha256 is None and crc32 is None:
+            raise UploadError('Missing chunk checksum (X-Chunk-SHA256 or X-Chunk-CRC32 header)')
+
+        with open(self.data_file(upload_id), 'r+b') as f:
+            # One chunk at a time per upload, whichever worker receives it
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise UploadError('Another chunk of this upload is being written', 409)
+            current = f.seek(0, os.SEEK_END)
+            if offset != current:
+                raise UploadError(f'Chunk starts at {offset}, expected {current}', 409, current)
+
+            digest = hashlib.sha256()
+            crc = 0
+            remaining = upload['size'] - current
+            try:
+                while True:
+                    block = stream.read(COPY_BLOCK_SIZE)
+                    if not block:
+                        break
+                    if len(block) > remaining:
+                        raise UploadError(f"Chunk runs past the end of the file ({upload['size']} bytes)", 413, current)
+                    remaining -= len(block)
+                    f.write(block)
+                    digest.update(block)
+                    crc = zlib.crc32(block, crc)
+
+                if sha256 is not None and digest.hexdigest() != sha256.lower():
+                    raise UploadError('Chunk SHA-256 mismatch', 422, current)
+                if crc32 is not None and f'{crc:08x}' != crc32.lower().rjust(8, '0'):
+                    raise UploadError('Chunk CRC32 mismatch', 422, current)
+            except Exception:
+                # Only verified chunks count towards the offset
+                f.truncate(current)
+                raise
+            f.flush()
+            offset = f.tell()
+
+            if offset == upload['size'] and upload['sha256'] and self.file_digest(upload_id) != upload['sha256']:
+                f.truncate(0)
+                raise UploadError('File SHA-256 mismatch, the upload has to start again', 422, 0)
+
+        os.utime(self.meta_file(upload_id))
+        return self.status(upload)
+
+    def file_digest(self, upload_id):
+        """SHA-256 of the bytes received for an upload"""
+        digest = hashlib.sha256()
+        with open(self.data_file(upload_id), 'rb') as f:
+            for block in iter(lambda: f.read(COPY_BLOCK_SIZE), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def completed(self, upload_id, user_id):
+        """CompletedUpload of a fully received upload; raises UploadError otherwise"""
+        upload = self.load(upload_id, user_id)
+        status = self.status(upload)
+        if not status['complete']:
+            raise UploadError(f"Upload of {upload['filename']} is incomplete "
+                              f"({status['offset']} of {upload['size']} bytes received)", 409, status['offset'])
+        return CompletedUpload(self, upload)
+
+    def discard(self, upload_id):
+        """Delete an upload and whatever was received of it"""
+        for path in (self.meta_file(upload_id), self.data_file(upload_id)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def prune(self):
+        """Delete uploads idle for longer than the TTL, at most once every PRUNE_INTERVAL seconds"""
+        now = time.time()
+        with self._lock:
+            if now - self._last_prune < PRUNE_INTERVAL:
+                return
+            self._last_prune = now
+        try:
+            for entry in os.scandir(self.path):
+                if entry.name.endswith('.json') and now - entry.stat().st_mtime > self.ttl:
+                    self.discard(entry.name[:-len('.json')])
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Warning: Could not prune chunked uploads in {self.path}: {e}")
+
+chunked_uploads = ChunkedUploadStore()
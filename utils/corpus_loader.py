@@ -0,0 +1,208 @@
+"""
+Bulk loader from the database/ JSON corpus into the groups and messages tables
+
+Rows come from the columnar message store (so every file is parsed at most
+once) and are written with batched executemany inserts inside a single
+transaction. Reloading a partition replaces its previous rows. Every loaded
+partition is recorded in corpus_partitions with a digest of the source
+files it was loaded from, so partitions whose files were added or changed
+since (or that were never loaded) can be found without reading them.
+"""
+
+import os
+import hashlib
+from datetime import datetime
+
+from sqlalchemy import inspect
+
+from extensions import db
+from models.user import Group, Message, CorpusPartition
+from utils.message_store import message_store, sources_digest
+from utils.partitions import partition_resolver
+from utils.search_index import ensure_search_index
+
+INSERT_BATCH_SIZE = 5000
+
+def corpus_key(*parts):
+    """Stable 40-character id for a corpus group or message"""
+    return hashlib.sha1('/'.join(parts).encode('utf-8')).hexdigest()
+
+def parse_timestamp(value):
+    """Parse the ISO timestamps of the JSON reports ('2025-08-15T04:58:18.091Z')"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+def ensure_corpus_schema():
+    """Recreate the groups/messages tables if they predate the corpus columns
+
+    Only empty tables are recreated; a populated table with an old schema
+    needs a manual migration. Also creates the full-text index on messages.
+    """
+    inspector = inspect(db.engine)
+    for model in (Message, Group):
+        table = model.__table__
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        if {column.name for column in table.columns} <= existing:
+            continue
+        if db.session.execute(db.select(db.func.count()).select_from(table)).scalar():
+            raise RuntimeError(f'Table {table.name} has an outdated schema and is not empty')
+        table.drop(db.engine)
+    db.create_all()
+    ensure_search_index()
+
+def _group_ids(partitions, now):
+    """Return (assembly, group_file) -> groups.id, inserting missing groups"""
+    wanted = {}
+    for partition in partitions:
+        for filename, start, end in partition.groups:
+            group_file = filename[:-5]
+            wanted[(partition.assembly, group_file)] = corpus_key(partition.assembly, group_file)
+
+    existing = {
+        row.group_id: row.id
+        for row in db.session.query(Group.id, Group.group_id).filter(
+            Group.group_id.in_(list(wanted.values()))
+        )
+    } if wanted else {}
+
+    missing = [
+        {
+            'name': group_file,
+            'group_id': key,
+            'assembly_name': assembly,
+            'group_file': group_file,
+            'member_count': 0,
+            'is_active': True,
+            'created_at': now,
+            'updated_at': now
+        }
+        for (assembly, group_file), key in wanted.items() if key not in existing
+    ]
+    for start in range(0, len(missing), INSERT_BATCH_SIZE):
+        db.session.execute(Group.__table__.insert(), missing[start:start + INSERT_BATCH_SIZE])
+
+    if missing:
+        existing.update({
+            row.group_id: row.id
+            for row in db.session.query(Group.id, Group.group_id).filter(
+                Group.group_id.in_([group['group_id'] for group in missing])
+            )
+        })
+    return {pair: existing[key] for pair, key in wanted.items()}
+
+def load_partitions(partition_keys):
+    """Replace the SQL rows of the given (assembly, date) partitions; returns rows inserted"""
+    # Verified against the files, so the recorded digest is that of the rows loaded
+    partitions = [message_store.get_partition(assembly, date, verify=True) for assembly, date in partition_keys]
+    now = datetime.utcnow()
+    inserted = 0
+
+    try:
+        group_ids = _group_ids(partitions, now)
+
+        for partition in partitions:
+            db.session.execute(
+                Message.__table__.delete().where(
+                    (Message.assembly_name == partition.assembly) &
+                    (Message.report_date == partition.date)
+                )
+            )
+
+            batch = []
+            for filename, start, end in partition.groups:
+                group_file = filename[:-5]
+                group_id = group_ids[(partition.assembly, group_file)]
+                for offset, row in enumerate(partition.rows(start, end)):
+                    batch.append({
+                        'message_id': corpus_key(partition.assembly, partition.date, group_file, str(offset)),
+                        'content': row['content'],
+                        'message_type': row['type'],
+                        'sender_name': row['sender_name'],
+                        'sender_phone': row['sender_phone'],
+                        'sentiment': row['sentiment'],
+                        'label': row['label'],
+                        'assembly_name': partition.assembly,
+                        'report_date': partition.date,
+                        'group_file': group_file,
+                        'group_id': group_id,
+                        'created_at': now,
+                        'whatsapp_timestamp': parse_timestamp(row['timestamp'])
+                    })
+                    if len(batch) >= INSERT_BATCH_SIZE:
+                        db.session.execute(Message.__table__.insert(), batch)
+                        inserted += len(batch)
+                        batch = []
+            if batch:
+                db.session.execute(Message.__table__.insert(), batch)
+                inserted += len(batch)
+
+            db.session.execute(
+                CorpusPartition.__table__.delete().where(
+                    (CorpusPartition.assembly_name == partition.assembly) &
+                    (CorpusPartition.report_date == partition.date)
+                )
+            )
+            db.session.execute(CorpusPartition.__table__.insert(), [{
+                'assembly_name': partition.assembly,
+                'report_date': partition.date,
+                'source_digest': sources_digest(partition.sources),
+                'message_count': len(partition),
+                'loaded_at': now
+            }])
+
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return inserted
+
+def stale_partitions(partition_keys):
+    """The (assembly, date) partitions whose SQL rows are missing or were loaded from other source files"""
+    keys = [(assembly, date) for assembly, date in partition_keys
+            if os.path.isdir(message_store.messages_dir(assembly, date))]
+    if not keys:
+        return []
+    loaded = {
+        (row.assembly_name, row.report_date): row.source_digest
+        for row in db.session.query(
+            CorpusPartition.assembly_name, CorpusPartition.report_date, CorpusPartition.source_digest
+        ).filter(
+            CorpusPartition.assembly_name.in_({assembly for assembly, date in keys}),
+            CorpusPartition.report_date.in_({date for assembly, date in keys})
+        )
+    }
+    return [
+        (assembly, date) for assembly, date in keys
+        if loaded.get((assembly, date)) != sources_digest(message_store.source_signature(assembly, date))
+    ]
+
+def load_corpus(assemblies=None, reload=False):
+    """Load the partitions of the given assemblies (default: all) into SQL
+
+    Only partitions that are stale (see stale_partitions) are loaded unless
+    reload is set.
+    """
+    ensure_corpus_schema()
+    if assemblies is None:
+        assemblies = message_store.list_assemblies()
+    partition_keys = [
+        (assembly, date)
+        for assembly in assemblies
+        for date in partition_resolver.dates(assembly)
+        if os.path.isdir(message_store.messages_dir(assembly, date))
+    ]
+    if not reload:
+        partition_keys = stale_partitions(partition_keys)
+    inserted = load_partitions(partition_keys)
+    return {
+        'assemblies': len(assemblies),
+        'partitions': len(partition_keys),
+        'messages': inserted
+    }
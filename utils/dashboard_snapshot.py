@@ -0,0 +1,264 @@
+"""
+Precomputed dashboard statistics
+
+The /api/dashboard-stats and /api/accurate-dashboard-stats payloads only
+depend on the assembly directories and their groups/*.csv rosters. A daemon
+thread fingerprints that tree (one stat() per roster) every
+DASHBOARD_REFRESH_INTERVAL seconds, or as soon as an upload calls trigger(),
+and when the fingerprint changed recomputes both payloads and writes them
+atomically to message_store/dashboard_stats.json. The endpoints serve the
+latest snapshot with its generated_at timestamp, so their latency does not
+grow with the corpus. The thread is started by the first request a process
+serves, so CLI commands never run it. Every gunicorn worker has its own, but
+refreshes hold an exclusive lock on dashboard_stats.lock and re-check the
+fingerprint once they have it, so only one process recomputes a change.
+"""
+
+import os
+import json
+import time
+import fcntl
+import hashlib
+import threading
+import warnings
+from contextlib import contextmanager
+from datetime import datetime
+
+from utils.message_store import STORE_PATH
+from utils.roster_stats import roster_stats
+
+DASHBOARD_SNAPSHOT_FORMAT_VERSION = 1
+DASHBOARD_REFRESH_INTERVAL = int(os.environ.get('DASHBOARD_REFRESH_INTERVAL', 30))  # seconds, 0 disables the thread
+
+def estimate_phone_count_from_file(file_path):
+    """Estimate phone number count from CSV file based on file size and structure"""
+    try:
+        # Cached roster metadata; the file is only parsed if it is new or changed
+        roster = roster_stats.get(file_path)
+
+        if roster['phone_column'] is not None:
+            # Count unique phone numbers in the first phone column found
+            return max(1, roster['unique_phones'])
+
+        # No phone column found (or the file could not be read), estimate from file size
+        if roster['error']:
+            print(f"Debug: Error reading CSV file {file_path}: {roster['error']}")
+        file_size = os.path.getsize(file_path)
+        estimated_phones = max(1, file_size // 200)  # More conservative estimate
+        return min(estimated_phones, 5000)
+
+    except Exception as e:
+        print(f"Debug: Error in estimate_phone_count_from_file for {file_path}: {e}")
+        return 100  # Default fallback
+
+def roster_phone_count(file_path):
+    """Unique phones of a roster as counted by /api/dashboard-stats"""
+    roster = roster_stats.get(file_path)
+    if roster['error']:
+        raise ValueError(roster['error'])
+
+    if roster['phone_column'] is not None:
+        # Count unique phone numbers in the first phone column found
+        return roster['unique_phones']
+
+    # If no phone columns found, count rows (excluding header); very few
+    # rows means it is probably a header-only file
+    phone_count = roster['non_empty_rows']
+    return 0 if phone_count <= 1 else phone_count
+
+def compute_dashboard_stats(phone_count, database_path='database'):
+    """Groups and phone numbers per assembly, counting each roster with phone_count(file_path)"""
+    # Suppress pandas and openpyxl warnings
+    warnings.filterwarnings('ignore', category=UserWarning, module='openpyxl')
+    warnings.filterwarnings('ignore', category=UserWarning, module='pandas')
+
+    stats = {
+        'total_assemblies': 0,
+        'total_groups': 0,
+        'total_phones': 0,
+        'assemblies': []
+    }
+    if not os.path.exists(database_path):
+        return stats
+
+    assembly_dirs = [d for d in os.listdir(database_path)
+                     if os.path.isdir(os.path.join(database_path, d))]
+    stats['total_assemblies'] = len(assembly_dirs)
+
+    for assembly_name in assembly_dirs:
+        groups_path = os.path.join(database_path, assembly_name, 'groups')
+        assembly_stats = {
+            'name': assembly_name,
+            'groups_count': 0,
+            'phones_count': 0,
+            'groups': []
+        }
+
+        if os.path.exists(groups_path):
+            csv_files = [f for f in os.listdir(groups_path)
+                         if f.lower().endswith('.csv')]
+            assembly_stats['groups_count'] = len(csv_files)
+            stats['total_groups'] += len(csv_files)
+
+            for csv_file in csv_files:
+                file_path = os.path.join(groups_path, csv_file)
+                try:
+                    phones = phone_count(file_path)
+                except Exception as e:
+                    # If file can't be read, assume 0 phones and log error
+                    phones = 0
+                    print(f"Warning: Could not read {file_path}: {str(e)}")
+
+                assembly_stats['groups'].append({'name': csv_file, 'phones_count': phones})
+                assembly_stats['phones_count'] += phones
+                stats['total_phones'] += phones
+
+        stats['assemblies'].append(assembly_stats)
+
+    roster_stats.save()
+    return stats
+
+def database_signature(database_path='database'):
+    """Fingerprint of everything the dashboard payloads depend on"""
+    digest = hashlib.sha1()
+    if not os.path.exists(database_path):
+        return digest.hexdigest()
+    for assembly_name in sorted(os.listdir(database_path)):
+        if not os.path.isdir(os.path.join(database_path, assembly_name)):
+            continue
+        digest.update(f'A{assembly_name}\n'.encode('utf-8'))
+        groups_path = os.path.join(database_path, assembly_name, 'groups')
+        if not os.path.isdir(groups_path):
+            continue
+        for entry in sorted(os.scandir(groups_path), key=lambda entry: entry.name):
+            if entry.name.lower().endswith('.csv'):
+                stat = entry.stat()
+                digest.update(f'F{entry.name}\0{stat.st_mtime_ns}\0{stat.st_size}\n'.encode('utf-8'))
+    return digest.hexdigest()
+
+class DashboardSnapshots:
+    """Snapshot file of the dashboard payloads and the thread that keeps it current"""
+
+    def __init__(self, database_path='database', store_path=STORE_PATH, interval=DASHBOARD_REFRESH_INTERVAL):
+        self.database_path = database_path
+        self.store_path = store_path
+        self.interval = interval
+        self._snapshot = None  # (mtime_ns of the file, snapshot)
+        self._thread = None
+        self._wake = threading.Event()
+        self._lock = threading.Lock()          # guards _snapshot and _thread
+        self._refresh_lock = threading.Lock()  # one recomputation at a time
+
+    def snapshot_file(self):
+        return os.path.join(self.store_path, 'dashboard_stats.json')
+
+    def lock_file(self):
+        return os.path.join(self.store_path, 'dashboard_stats.lock')
+
+    def latest(self):
+        """Latest snapshot, computing it first if there is none yet"""
+        self.start()
+        snapshot = self._read_snapshot()
+        if snapshot is None:
+            snapshot = self.refresh()
+        return snapshot
+
+    def refresh(self, force=False):
+        """Recompute and persist the payloads if the rosters changed; returns the current snapshot"""
+        with self._refresh_lock, self._process_lock():
+            signature = database_signature(self.database_path)
+            snapshot = self._read_snapshot()
+            if not force and snapshot is not None and snapshot['signature'] == signature:
+                return snapshot
+
+            started = time.time()
+            snapshot = {
+                'format': DASHBOARD_SNAPSHOT_FORMAT_VERSION,
+                'signature': signature,
+                'generated_at': datetime.utcnow().isoformat() + 'Z',
+                'stats': compute_dashboard_stats(roster_phone_count, self.database_path),
+                'accurate_stats': compute_dashboard_stats(estimate_phone_count_from_file, self.database_path)
+            }
+            self._write_snapshot(snapshot)
+            print(f"Debug: Dashboard snapshot regenerated in {time.time() - started:.2f}s")
+            return snapshot
+
+    @contextmanager
+    def _process_lock(self):
+        """Exclusive lock on the snapshot across processes (held while one of them refreshes it)"""
+        try:
+            os.makedirs(self.store_path, exist_ok=True)
+            lock = open(self.lock_file(), 'a')
+        except (IOError, OSError) as e:
+            print(f"Warning: Could not lock dashboard snapshot: {e}")
+            yield
+            return
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+        finally:
+            lock.close()
+
+    def trigger(self):
+        """Ask the refresher to look for changes now instead of at the next interval"""
+        self._wake.set()
+
+    def start(self):
+        """Start the refresher thread once per process (no-op if the interval is 0)
+
+        Registered as a before_request hook, so only serving processes run it.
+        """
+        if self.interval <= 0:
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='dashboard-snapshots', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Warning: Could not refresh dashboard snapshot: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def _read_snapshot(self):
+        path = self.snapshot_file()
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        with self._lock:
+            if self._snapshot is not None and self._snapshot[0] == mtime_ns:
+                return self._snapshot[1]
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"Warning: Discarding unreadable dashboard snapshot {path}: {e}")
+            return None
+        if snapshot.get('format') != DASHBOARD_SNAPSHOT_FORMAT_VERSION:
+            return None
+        with self._lock:
+            self._snapshot = (mtime_ns, snapshot)
+        return snapshot
+
+    def _write_snapshot(self, snapshot):
+        path = self.snapshot_file()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, path)
+            mtime_ns = os.stat(path).st_mtime_ns
+        except (IOError, OSError) as e:
+            print(f"Warning: Could not persist dashboard snapshot {path}: {e}")
+            return
+        with self._lock:
+            self._snapshot = (mtime_ns, snapshot)
+
+dashboard_snapshots = DashboardSnapshots()
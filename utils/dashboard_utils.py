@@ -2,6 +2,7 @@ from models.user import User, Group, Message
 from datetime import datetime, timedelta
 from sqlalchemy import func
 from extensions import db
+from utils.rollups import SENTIMENTS
 
 def get_dashboard_stats(user_id, role):
     """Get dashboard statistics based on user role"""
@@ -28,11 +29,17 @@ def get_admin_stats():
         total_groups = Group.query.count()
         active_groups = Group.query.filter_by(is_active=True).count()
         
-        # Message statistics
+        # Message statistics (report_date is covered by the assembly/date index)
         total_messages = Message.query.count()
         messages_today = Message.query.filter(
-            Message.created_at >= datetime.utcnow().date()
+            Message.report_date == datetime.utcnow().strftime('%Y-%m-%d')
         ).count()
+        sentiment_breakdown = {sentiment: 0 for sentiment in SENTIMENTS}
+        for sentiment, count in db.session.query(
+            Message.sentiment, func.count(Message.id)
+        ).group_by(Message.sentiment):
+            if sentiment in sentiment_breakdown:
+                sentiment_breakdown[sentiment] = count
         
         # System statistics
         system_uptime = calculate_system_uptime()
@@ -49,7 +56,8 @@ def get_admin_stats():
             },
             'messages': {
                 'total': total_messages,
-                'today': messages_today
+                'today': messages_today,
+                'sentiment_breakdown': sentiment_breakdown
             },
             'system': {
                 'uptime': system_uptime
@@ -178,25 +186,25 @@ def get_message_sentiment_stats(user_id=None):
 def get_group_activity_stats(days=7):
     """Get group activity statistics for the last N days"""
     try:
-        start_date = datetime.utcnow() - timedelta(days=days)
+        start_date = (datetime.utcnow() - timedelta(days=days)).strftime('%Y-%m-%d')
         
-        # Get daily message counts
+        # Get daily message counts by report date
         daily_stats = db.session.query(
-            func.date(Message.created_at).label('date'),
+            Message.report_date,
             func.count(Message.id).label('count')
         ).filter(
-            Message.created_at >= start_date
+            Message.report_date >= start_date
         ).group_by(
-            func.date(Message.created_at)
+            Message.report_date
         ).order_by(
-            func.date(Message.created_at)
+            Message.report_date
         ).all()
         
         # Format for chart display
         chart_data = []
         for date, count in daily_stats:
             chart_data.append({
-                'date': date.strftime('%Y-%m-%d'),
+                'date': date,
                 'messages': count
             })
         
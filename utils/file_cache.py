@@ -0,0 +1,92 @@
+"""
+Process-wide cache of decoded JSON files
+
+Entries are keyed by (path, mtime, size) so a rewritten file is never served
+from the cache, and the cache is bounded by a byte budget with
+least-recently-used eviction. Each file is charged an estimate of its decoded
+size: the report JSON takes about twice its file size once decoded (up to
+roughly 3x for files of many short messages), so files are charged
+PARSED_FILE_DECODED_FACTOR times their size. Decoded objects are shared
+between callers and must be treated as read-only. The message store parses
+report files without this cache, since it keeps their rows itself; the cache
+serves the endpoints that return raw report messages.
+"""
+
+import os
+import json
+import threading
+from collections import OrderedDict
+
+PARSED_FILE_CACHE_BYTES = int(os.environ.get('PARSED_FILE_CACHE_BYTES', 256 * 1024 * 1024))
+PARSED_FILE_DECODED_FACTOR = float(os.environ.get('PARSED_FILE_DECODED_FACTOR', 2.5))  # decoded bytes per file byte
+
+class ParsedFileCache:
+    """Byte-budgeted LRU cache of json.load() results"""
+
+    def __init__(self, max_bytes=PARSED_FILE_CACHE_BYTES, decoded_factor=PARSED_FILE_DECODED_FACTOR):
+        self.max_bytes = max_bytes
+        self.decoded_factor = decoded_factor
+        self._entries = OrderedDict()  # path -> (mtime_ns, size, charged bytes, data)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def load_json(self, path):
+        """Return the decoded content of path, parsing it only if it changed"""
+        stat = os.stat(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[3]
+            self.misses += 1
+
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        charge = int(stat.st_size * self.decoded_factor)
+        with self._lock:
+            previous = self._entries.pop(path, None)
+            if previous is not None:
+                self._bytes -= previous[2]
+            if charge <= self.max_bytes:
+                self._entries[path] = (stat.st_mtime_ns, stat.st_size, charge, data)
+                self._bytes += charge
+                while self._bytes > self.max_bytes:
+                    _, (_, _, evicted, _) = self._entries.popitem(last=False)
+                    self._bytes -= evicted
+                    self.evictions += 1
+        return data
+
+    def invalidate(self, path=None):
+        """Drop one cached file, or everything when path is None"""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self._bytes = 0
+                return
+            entry = self._entries.pop(path, None)
+            if entry is not None:
+                self._bytes -= entry[2]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+parsed_file_cache = ParsedFileCache()
+
+def load_json(path):
+    """Decode a JSON file through the shared parsed-file cache"""
+    return parsed_file_cache.load_json(path)
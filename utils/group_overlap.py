@@ -0,0 +1,176 @@
+"""
+Group overlap (shared members) across WhatsApp groups
+
+Members of a group are the phones on its roster CSV in
+database/<assembly>/groups/ plus every phone that posted in it according to
+the message corpus. Roster files ('AAP WARD No 14_all_1755074950141_.csv')
+and report files ('AAP_WARD_No_14 (1).json', '..._2025-08-21.json') are
+matched through a normalised group key. The group x member incidence is kept
+as distinct (group, member) id pairs; a self-join on the member id computes
+A x A^T, i.e. the shared member count of every group pair, from which the
+Jaccard similarity follows. Results are cached per corpus version.
+"""
+
+import os
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from utils.message_store import message_store
+from utils.partitions import partition_resolver
+from utils.rosters import read_roster, roster_phones
+
+OVERLAP_CACHE_ENTRIES = 8
+
+_ROSTER_SUFFIX = re.compile(r'_all_\d+_?$')
+_COPY_SUFFIX = re.compile(r'\s*\(\d+\)$')
+_DATE_SUFFIX = re.compile(r'_\d{4}-\d{2}-\d{2}$')
+_SEPARATORS = re.compile(r'[\W_]+')
+
+def group_display_name(filename):
+    """Readable group name of a roster CSV or report JSON filename"""
+    name = os.path.splitext(filename)[0]
+    name = _ROSTER_SUFFIX.sub('', name)
+    name = _COPY_SUFFIX.sub('', name)
+    return _DATE_SUFFIX.sub('', name)
+
+def group_key(filename):
+    """Key shared by a group's roster CSV and its report JSON files"""
+    return _SEPARATORS.sub('_', group_display_name(filename)).strip('_').lower()
+
+def read_roster_phones(file_path):
+    """Normalised phone numbers listed in a roster CSV (empty if it has no phone column)"""
+    df, meta = read_roster(file_path, dtype=str)
+    phones = roster_phones(df, meta)
+    if phones is None:
+        return []
+    return phones[phones != ''].unique().tolist()
+
+def roster_files(assembly):
+    """Roster CSV filenames of an assembly"""
+    groups_path = os.path.join(message_store.database_path, assembly, 'groups')
+    if not os.path.isdir(groups_path):
+        return []
+    return sorted(f for f in os.listdir(groups_path) if f.lower().endswith('.csv'))
+
+def corpus_version(assemblies):
+    """Digest of every report and roster file (name, mtime, size) of the assemblies"""
+    digest = hashlib.sha1()
+    for assembly in sorted(assemblies):
+        digest.update(assembly.encode('utf-8'))
+        for date in partition_resolver.dates(assembly):
+            for filename, (mtime, size) in sorted(message_store.source_signature(assembly, date).items()):
+                digest.update(f'{date}/{filename}:{mtime}:{size};'.encode('utf-8'))
+        groups_path = os.path.join(message_store.database_path, assembly, 'groups')
+        for filename in roster_files(assembly):
+            stat = os.stat(os.path.join(groups_path, filename))
+            digest.update(f'groups/{filename}:{stat.st_mtime_ns}:{stat.st_size};'.encode('utf-8'))
+    return digest.hexdigest()
+
+class GroupOverlap:
+    """Shared-member counts of every overlapping group pair"""
+
+    def __init__(self, groups, members, pairs):
+        self.groups = groups  # [{'assembly', 'group_name', 'members'}], indexed by group id
+        self.members = members  # total distinct members
+        self.pairs = pairs  # DataFrame: group_a, group_b, shared, jaccard
+
+    @classmethod
+    def build(cls, assemblies, source='all'):
+        groups = {}  # (assembly, key) -> group id
+        group_info = []
+        member_ids = {}
+        group_column = []
+        member_column = []
+
+        def add(assembly, filename, phones):
+            key = (assembly, group_key(filename))
+            if key not in groups:
+                groups[key] = len(group_info)
+                group_info.append({'assembly': assembly, 'group_name': group_display_name(filename)})
+            group_id = groups[key]
+            for phone in phones:
+                group_column.append(group_id)
+                member_column.append(member_ids.setdefault(phone, len(member_ids)))
+
+        for assembly in assemblies:
+            if source in ('all', 'rosters'):
+                groups_path = os.path.join(message_store.database_path, assembly, 'groups')
+                for filename in roster_files(assembly):
+                    try:
+                        add(assembly, filename, read_roster_phones(os.path.join(groups_path, filename)))
+                    except Exception as e:
+                        print(f"Warning: Could not read roster {filename}: {e}")
+            if source in ('all', 'messages'):
+                for date in partition_resolver.dates(assembly):
+                    if not os.path.isdir(message_store.messages_dir(assembly, date)):
+                        continue
+                    partition = message_store.get_partition(assembly, date)
+                    phones = partition.column('normalised_phone')
+                    for filename, start, end in partition.groups:
+                        add(assembly, filename, {p for p in phones[start:end] if p})
+
+        incidence = pd.DataFrame({
+            'group': np.asarray(group_column, dtype=np.int64),
+            'member': np.asarray(member_column, dtype=np.int64)
+        }).drop_duplicates()
+        sizes = np.bincount(incidence['group'].to_numpy(), minlength=len(group_info))
+        for group_id, info in enumerate(group_info):
+            info['members'] = int(sizes[group_id])
+
+        # A x A^T: join the incidence with itself on the member id and count
+        # the members each (group_a < group_b) pair has in common
+        joined = incidence.merge(incidence, on='member', suffixes=('_a', '_b'))
+        joined = joined[joined['group_a'] < joined['group_b']]
+        pairs = joined.groupby(['group_a', 'group_b']).size().rename('shared').reset_index()
+        union = sizes[pairs['group_a'].to_numpy()] + sizes[pairs['group_b'].to_numpy()] - pairs['shared'].to_numpy()
+        pairs['jaccard'] = pairs['shared'].to_numpy() / np.maximum(union, 1)
+
+        return cls(group_info, len(member_ids), pairs)
+
+    def top_pairs(self, top_n=50, sort_by='shared', min_shared=1):
+        """Top group pairs by shared members (or Jaccard), as JSON-ready dicts"""
+        pairs = self.pairs[self.pairs['shared'] >= min_shared]
+        order = ['jaccard', 'shared'] if sort_by == 'jaccard' else ['shared', 'jaccard']
+        pairs = pairs.sort_values(order + ['group_a', 'group_b'], ascending=[False, False, True, True])
+        return [
+            {
+                'group_a': self.groups[row.group_a],
+                'group_b': self.groups[row.group_b],
+                'shared_members': int(row.shared),
+                'jaccard': round(float(row.jaccard), 4)
+            }
+            for row in pairs.head(top_n).itertuples(index=False)
+        ]
+
+class GroupOverlapCache:
+    """Small LRU of built overlaps keyed by (assemblies, source, corpus version)"""
+
+    def __init__(self, max_entries=OVERLAP_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, assemblies, source='all'):
+        """Return (overlap, corpus version, cached flag)"""
+        assemblies = sorted(set(assemblies))
+        version = corpus_version(assemblies)
+        key = (tuple(assemblies), source, version)
+        with self._lock:
+            overlap = self._entries.get(key)
+            if overlap is not None:
+                self._entries.move_to_end(key)
+                return overlap, version, True
+
+        overlap = GroupOverlap.build(assemblies, source)
+        with self._lock:
+            self._entries[key] = overlap
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return overlap, version, False
+
+group_overlap_cache = GroupOverlapCache()
@@ -0,0 +1,126 @@
+"""
+Member x group incidence engine for common-members analysis
+
+Phones and (assembly, date, group) keys are given dense integer ids and the
+distinct (phone, group) pairs are kept as a sorted sparse incidence list, so
+"members in at least k groups", per-member group lists and the ranking by
+groups and messages are vectorised numpy operations instead of per-message
+list membership tests.
+"""
+
+import numpy as np
+import pandas as pd
+
+SENTIMENTS = ['Positive', 'Negative', 'Neutral']
+
+def partition_memberships(partition, sentiment_filter='all'):
+    """Scan helper: senders and group ids of the partition rows that count as membership
+
+    Rows without a sender phone, and rows outside the sentiment filter, are
+    dropped, as in the original common-members analysis.
+    """
+    phones = np.asarray(partition.column('sender_phone'), dtype=object)
+    sentiments = np.asarray(partition.column('sentiment'), dtype=object)
+    group_ids = np.repeat(
+        np.arange(len(partition.groups)),
+        [end - start for filename, start, end in partition.groups]
+    )
+
+    keep = phones != ''
+    if sentiment_filter != 'all':
+        keep &= pd.Series(sentiments).str.lower().to_numpy() == sentiment_filter.lower()
+
+    return {
+        'group_keys': [f"{partition.assembly}/{partition.date}/{filename[:-5]}"
+                       for filename, start, end in partition.groups],
+        'phones': phones[keep],
+        'names': np.asarray(partition.column('sender_name'), dtype=object)[keep],
+        'sentiments': sentiments[keep],
+        'group_ids': group_ids[keep],
+    }
+
+class MembershipMatrix:
+    """Sparse phone x group incidence built from partition_memberships() results"""
+
+    def __init__(self, memberships):
+        memberships = list(memberships)
+        self.group_keys = []
+        group_ids = []
+        for part in memberships:
+            group_ids.append(part['group_ids'] + len(self.group_keys))
+            self.group_keys.extend(part['group_keys'])
+
+        def concat(name):
+            arrays = [part[name] for part in memberships]
+            return np.concatenate(arrays) if arrays else np.array([], dtype=object)
+
+        phones = concat('phones')
+        group_ids = np.concatenate(group_ids).astype(np.int64) if group_ids else np.array([], dtype=np.int64)
+
+        # Dense phone ids in order of first appearance
+        phone_ids, self.phones = pd.factorize(phones)
+        n_phones = len(self.phones)
+        first_rows = np.unique(phone_ids, return_index=True)[1]
+        self.names = concat('names')[first_rows]
+
+        self.message_counts = np.bincount(phone_ids, minlength=n_phones)
+        sentiments = concat('sentiments')
+        self.sentiment_counts = {
+            sentiment: np.bincount(phone_ids[sentiments == sentiment], minlength=n_phones)
+            for sentiment in SENTIMENTS
+        }
+
+        # Distinct (phone, group) pairs, sorted by phone then group
+        n_groups = max(len(self.group_keys), 1)
+        pairs = np.unique(phone_ids.astype(np.int64) * n_groups + group_ids)
+        self.pair_phones = pairs // n_groups
+        self.pair_groups = pairs % n_groups
+        self.group_counts = np.bincount(self.pair_phones, minlength=n_phones)
+        self._pair_starts = np.searchsorted(self.pair_phones, np.arange(n_phones + 1))
+
+    def member_group_keys(self, phone_id):
+        """Group keys of one member, in partition/group order"""
+        start, end = self._pair_starts[phone_id], self._pair_starts[phone_id + 1]
+        return [self.group_keys[group] for group in self.pair_groups[start:end]]
+
+    def ranked_members(self, min_groups=2):
+        """Phone ids in at least min_groups groups, by groups then messages (descending)"""
+        candidates = np.nonzero(self.group_counts >= min_groups)[0]
+        order = np.lexsort((
+            candidates,
+            -self.message_counts[candidates],
+            -self.group_counts[candidates]
+        ))
+        return candidates[order]
+
+    def member_sentiments(self):
+        """Per-member message, sentiment and group counts, in first-seen order"""
+        return [
+            {
+                'name': self.names[phone_id],
+                'phone': self.phones[phone_id],
+                'total_messages': int(self.message_counts[phone_id]),
+                'positive_messages': int(self.sentiment_counts['Positive'][phone_id]),
+                'negative_messages': int(self.sentiment_counts['Negative'][phone_id]),
+                'neutral_messages': int(self.sentiment_counts['Neutral'][phone_id]),
+                'groups_count': int(self.group_counts[phone_id])
+            }
+            for phone_id in range(len(self.phones))
+        ]
+
+    def common_members(self, min_groups=2):
+        """Ranked member dicts as returned by the common-members analysis"""
+        return [
+            {
+                'name': self.names[phone_id],
+                'phone': self.phones[phone_id],
+                'groups_count': int(self.group_counts[phone_id]),
+                'group_names': self.member_group_keys(phone_id),
+                'total_messages': int(self.message_counts[phone_id]),
+                'sentiment_breakdown': {
+                    sentiment: int(counts[phone_id])
+                    for sentiment, counts in self.sentiment_counts.items()
+                }
+            }
+            for phone_id in self.ranked_members(min_groups)
+        ]
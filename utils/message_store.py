@@ -0,0 +1,370 @@
+"""
+Columnar message store built from database/<assembly>/<date>/messages/*.json
+
+Every (assembly, date) directory becomes one partition file under
+message_store/<assembly>/<date>.json holding one list per column. A partition
+remembers the mtime and size of every source file it was built from; files
+that were added or changed since are parsed and merged in on the next read,
+so the store survives restarts and is shared between gunicorn workers. The
+most recently used partitions are kept in memory; one is re-checked against
+its source files when the messages directory's mtime changes (a file was
+added, removed or replaced, as uploads do) and otherwise at most every
+MESSAGE_STORE_VERIFY_INTERVAL seconds, which catches files edited in place. Partitions also carry the per-group rollups of
+utils/rollups.py, computed as their group files are ingested, and each
+sender phone in the normalised form of utils/phones.py.
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.rollups import build_group_rollup
+from utils.phones import normalise_phone
+from utils.result_cache import corpus_versions
+
+DATABASE_PATH = 'database'
+STORE_PATH = os.environ.get('MESSAGE_STORE_PATH') or 'message_store'
+STORE_FORMAT_VERSION = 3
+INGEST_WORKERS = int(os.environ.get('INGEST_WORKERS', 8))
+CACHED_PARTITIONS = int(os.environ.get('MESSAGE_STORE_CACHED_PARTITIONS', 64))
+VERIFY_INTERVAL = int(os.environ.get('MESSAGE_STORE_VERIFY_INTERVAL', 300))  # seconds
+
+COLUMNS = [
+    'sender_phone',
+    'normalised_phone',
+    'sender_name',
+    'content',
+    'type',
+    'timestamp',
+    'label',
+    'sentiment',
+    'group',
+    'date',
+    'assembly',
+]
+
+def normalise_message(msg, group_name, date_str, assembly_name):
+    """Flatten one raw WhatsApp message dict into a store row"""
+    sender = msg.get('sender') or {}
+    return {
+        'sender_phone': sender.get('phoneNumber') or '',
+        'normalised_phone': normalise_phone(sender.get('phoneNumber')),
+        'sender_name': sender.get('name') or 'Unknown',
+        'content': msg.get('messageContent') or '',
+        'type': msg.get('messageType') or 'text',
+        'timestamp': msg.get('timestamp') or '',
+        'label': msg.get('predicted_label') or 'unknown',
+        'sentiment': msg.get('predicted_sentiment') or 'Neutral',
+        'group': group_name,
+        'date': date_str,
+        'assembly': assembly_name,
+    }
+
+def sources_digest(sources):
+    """SHA-1 of a partition's source files and their [mtime_ns, size]; changes whenever any file does"""
+    return hashlib.sha1(json.dumps(sorted(sources.items()), ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def load_group_file(file_path):
+    """Decode one group JSON file; raises on unreadable or invalid JSON
+
+    Not read through the parsed-file cache: the partition keeps the rows.
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def validate_group_data(data):
+    """Return an error message if decoded JSON is not a message list, else None"""
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list):
+        return 'expected a list of messages'
+    for index, msg in enumerate(data):
+        if not isinstance(msg, dict):
+            return f'message #{index + 1} is not an object'
+    return None
+
+def decode_group_payloads(payloads, max_workers=INGEST_WORKERS):
+    """Decode and validate uploaded group files concurrently
+
+    payloads maps a key (e.g. filename) -> raw bytes. Returns key -> (data, error) where
+    error is None for a valid message list.
+    """
+    def decode(item):
+        key, raw = item
+        try:
+            data = json.loads(raw.decode('utf-8'))
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            return key, (None, f'invalid JSON ({e})')
+        return key, (data, validate_group_data(data))
+
+    if not payloads:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(payloads)))) as executor:
+        return dict(executor.map(decode, payloads.items()))
+
+def messages_to_rows(data, group_name, date_str, assembly_name):
+    """Normalise the decoded content of a group file into store rows"""
+    if isinstance(data, dict):
+        data = [data]
+    elif not isinstance(data, list):
+        return []
+    return [normalise_message(msg, group_name, date_str, assembly_name)
+            for msg in data if isinstance(msg, dict)]
+
+class MessagePartition:
+    """All messages of one assembly/date, stored column by column"""
+
+    def __init__(self, assembly, date, sources, groups, columns, rollups):
+        self.assembly = assembly
+        self.date = date
+        self.sources = sources  # filename -> [mtime_ns, size]
+        self.groups = groups  # [[filename, start_row, end_row], ...] in row order
+        self.columns = columns  # column name -> list of values
+        self.rollups = rollups  # per-group rollups, aligned with groups
+
+    @property
+    def files(self):
+        """Source JSON filenames of this partition"""
+        return sorted(self.sources)
+
+    def __len__(self):
+        return len(self.columns['sender_phone'])
+
+    def column(self, name):
+        return self.columns[name]
+
+    def rows(self, start=0, end=None):
+        """Yield rows as dicts keyed by column name"""
+        end = len(self) if end is None else end
+        sliced = [self.columns[name][start:end] for name in COLUMNS]
+        for values in zip(*sliced):
+            yield dict(zip(COLUMNS, values))
+
+    def rows_at(self, offsets):
+        """Yield (group_name, row) for the given ascending row offsets"""
+        starts = [start for filename, start, end in self.groups]
+        for offset in offsets:
+            filename = self.groups[bisect_right(starts, offset) - 1][0]
+            yield filename[:-5], {name: self.columns[name][offset] for name in COLUMNS}
+
+    def group_rows(self):
+        """Yield (group_name, rows) for every group file in the partition"""
+        for filename, start, end in self.groups:
+            yield filename[:-5], list(self.rows(start, end))
+
+    def to_dict(self):
+        return {
+            'format': STORE_FORMAT_VERSION,
+            'assembly': self.assembly,
+            'date': self.date,
+            'sources': self.sources,
+            'groups': self.groups,
+            'columns': self.columns,
+            'rollups': self.rollups,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['assembly'], data['date'], data['sources'], data['groups'],
+                   data['columns'], data['rollups'])
+
+    def group_rollups(self):
+        """Yield (group_name, rollup) for every group file in the partition"""
+        for (filename, start, end), rollup in zip(self.groups, self.rollups):
+            yield filename[:-5], rollup
+
+class MessageStore:
+    """Persistent, self-refreshing columnar store of all message partitions"""
+
+    def __init__(self, database_path=DATABASE_PATH, store_path=STORE_PATH, max_partitions=CACHED_PARTITIONS):
+        self.database_path = database_path
+        self.store_path = store_path
+        self.max_partitions = max_partitions
+        self._partitions = OrderedDict()  # (assembly, date) -> (dir mtime_ns, verified at, MessagePartition)
+        self._lock = threading.Lock()
+
+    def messages_dir(self, assembly, date):
+        return os.path.join(self.database_path, assembly, date, 'messages')
+
+    def partition_file(self, assembly, date):
+        return os.path.join(self.store_path, assembly, f'{date}.json')
+
+    def list_assemblies(self):
+        """Names of all assembly directories under the database path"""
+        if not os.path.isdir(self.database_path):
+            return []
+        return sorted(entry.name for entry in os.scandir(self.database_path) if entry.is_dir())
+
+    def directory_mtime(self, assembly, date):
+        """mtime_ns of a partition's messages directory, or None if it does not exist"""
+        try:
+            return os.stat(self.messages_dir(assembly, date)).st_mtime_ns
+        except OSError:
+            return None
+
+    def _cached(self, key):
+        with self._lock:
+            cached = self._partitions.get(key)
+            if cached is not None:
+                self._partitions.move_to_end(key)
+        return cached
+
+    def _remember(self, partition, dir_mtime):
+        """Keep a verified partition in memory, evicting the least recently used ones"""
+        key = (partition.assembly, partition.date)
+        with self._lock:
+            self._partitions[key] = (dir_mtime, time.time(), partition)
+            self._partitions.move_to_end(key)
+            while len(self._partitions) > self.max_partitions:
+                self._partitions.popitem(last=False)
+
+    def source_signature(self, assembly, date):
+        """Map every JSON file of a partition to its [mtime_ns, size]"""
+        messages_dir = self.messages_dir(assembly, date)
+        signature = {}
+        if not os.path.isdir(messages_dir):
+            return signature
+        for entry in os.scandir(messages_dir):
+            if entry.is_file() and entry.name.lower().endswith('.json'):
+                stat = entry.stat()
+                signature[entry.name] = [stat.st_mtime_ns, stat.st_size]
+        return signature
+
+    def corpus_signature(self, partitions):
+        """SHA-1 over the source files of (assembly, date) partitions; changes whenever any of them does
+
+        Unlike the in-memory corpus versions it is the same in every worker process.
+        """
+        digest = hashlib.sha1()
+        for assembly, date in sorted(partitions):
+            digest.update(json.dumps([assembly, date, sorted(self.source_signature(assembly, date).items())],
+                                     ensure_ascii=False).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get_partition(self, assembly, date, verify=False):
+        """Return the up-to-date partition for assembly/date, building it if needed
+
+        With verify, the source files are checked even if the partition was
+        verified less than VERIFY_INTERVAL seconds ago.
+        """
+        # Taken before listing the files, so a file added meanwhile changes it again
+        dir_mtime = self.directory_mtime(assembly, date)
+        cached = self._cached((assembly, date))
+        if (not verify and cached is not None and cached[0] == dir_mtime
+                and time.time() - cached[1] < VERIFY_INTERVAL):
+            return cached[2]
+
+        signature = self.source_signature(assembly, date)
+        partition = cached[2] if cached is not None else self._read_partition_file(assembly, date)
+        if partition is not None and partition.sources == signature:
+            self._remember(partition, dir_mtime)
+            return partition
+
+        # Only the files that were added or changed since the partition was
+        # written need to be parsed again; ingest reads them from disk
+        return self.ingest(assembly, date, {}, signature=signature, base=partition, dir_mtime=dir_mtime)
+
+    def build_partition(self, assembly, date):
+        """Re-parse every raw JSON file of assembly/date from scratch"""
+        with self._lock:
+            self._partitions.pop((assembly, date), None)
+        path = self.partition_file(assembly, date)
+        if os.path.exists(path):
+            os.remove(path)
+        return self.get_partition(assembly, date)
+
+    def ingest(self, assembly, date, parsed, signature=None, base=None, dir_mtime=None):
+        """Merge already decoded group files into the assembly/date partition
+
+        parsed maps a JSON filename in the messages directory to its decoded
+        content. Rows of files that are unchanged on disk are carried over from
+        the existing partition; every other file of the directory is read from
+        disk, so the partition always covers all of them (an upload into a date
+        that was never built parses its existing files here). signature and
+        dir_mtime, if given, were taken by the caller.
+        """
+        if signature is None:
+            dir_mtime = self.directory_mtime(assembly, date)
+            signature = self.source_signature(assembly, date)
+        if base is None:
+            cached = self._cached((assembly, date))
+            base = cached[2] if cached is not None else self._read_partition_file(assembly, date)
+
+        columns = {name: [] for name in COLUMNS}
+        groups = []
+        rollups = []
+        sources = {}
+
+        def append_group(filename, rows, rollup=None):
+            rows = list(rows)
+            start = len(columns['sender_phone'])
+            for row in rows:
+                for name in COLUMNS:
+                    columns[name].append(row[name])
+            groups.append([filename, start, len(columns['sender_phone'])])
+            rollups.append(rollup if rollup is not None else build_group_rollup(rows))
+            sources[filename] = signature[filename]
+
+        if base is not None:
+            for (filename, start, end), rollup in zip(base.groups, base.rollups):
+                if filename in parsed or filename not in signature:
+                    continue
+                if base.sources.get(filename) != signature[filename]:
+                    continue
+                append_group(filename, base.rows(start, end), rollup)
+
+        messages_dir = self.messages_dir(assembly, date)
+        for filename in sorted(signature):
+            if filename in sources:
+                continue
+            if filename in parsed:
+                data = parsed[filename]
+            else:
+                try:
+                    data = load_group_file(os.path.join(messages_dir, filename))
+                except (json.JSONDecodeError, IOError, UnicodeDecodeError) as e:
+                    print(f"Error reading {os.path.join(messages_dir, filename)}: {e}")
+                    data = []
+            append_group(filename, messages_to_rows(data, filename[:-5], date, assembly))
+
+        partition = MessagePartition(assembly, date, sources, groups, columns, rollups)
+        self._write_partition_file(partition)
+        # Cached results only go stale if rows they were computed from changed;
+        # the first build of a partition must not invalidate the request that
+        # triggered it (uploads bump the version themselves)
+        if base is not None and base.sources != partition.sources:
+            corpus_versions.bump(assembly)
+        self._remember(partition, dir_mtime)
+        return partition
+
+    def _read_partition_file(self, assembly, date):
+        path = self.partition_file(assembly, date)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('format') != STORE_FORMAT_VERSION:
+                return None
+            return MessagePartition.from_dict(data)
+        except (json.JSONDecodeError, IOError, KeyError) as e:
+            print(f"Warning: Discarding unreadable partition {path}: {e}")
+            return None
+
+    def _write_partition_file(self, partition):
+        path = self.partition_file(partition.assembly, partition.date)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(partition.to_dict(), f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, path)
+        except (IOError, OSError) as e:
+            print(f"Warning: Could not persist partition {path}: {e}")
+
+message_store = MessageStore()
@@ -0,0 +1,96 @@
+"""
+Partition resolver for database/<assembly>/<YYYY-MM-DD>/ directories
+
+Each assembly's date directories are listed and validated once and kept as a
+sorted in-memory index. The index is rebuilt only when the assembly
+directory's mtime changes (a date directory was added or removed), and date
+ranges are answered with a binary search over it.
+"""
+
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+
+from utils.result_cache import corpus_versions
+
+DATABASE_PATH = 'database'
+DATE_FORMAT = '%Y-%m-%d'
+
+def normalise_date(value):
+    """Return value as a zero-padded YYYY-MM-DD string, or None if it is not a date"""
+    try:
+        return datetime.strptime(value, DATE_FORMAT).strftime(DATE_FORMAT)
+    except (TypeError, ValueError):
+        return None
+
+def is_date_name(name):
+    """True if name is a YYYY-MM-DD directory name"""
+    return normalise_date(name) == name
+
+class PartitionResolver:
+    """Maps (assemblies, date range) to the matching date partitions"""
+
+    def __init__(self, database_path=DATABASE_PATH):
+        self.database_path = database_path
+        self._index = {}  # assembly -> (dir mtime_ns, sorted date names)
+        self._lock = threading.Lock()
+
+    def dates(self, assembly):
+        """All date directories of an assembly, oldest first"""
+        assembly_path = os.path.join(self.database_path, assembly)
+        try:
+            mtime = os.stat(assembly_path).st_mtime_ns
+        except OSError:
+            with self._lock:
+                removed = self._index.pop(assembly, None)
+            if removed is not None:
+                corpus_versions.bump(assembly)
+            return []
+
+        with self._lock:
+            cached = self._index.get(assembly)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        dates = sorted(
+            entry.name for entry in os.scandir(assembly_path)
+            if entry.is_dir() and is_date_name(entry.name)
+        )
+        with self._lock:
+            self._index[assembly] = (mtime, dates)
+        if cached is not None and cached[1] != dates:
+            corpus_versions.bump(assembly)
+        return dates
+
+    def dates_in_range(self, assembly, start_date, end_date=None):
+        """Dates of an assembly between start_date and end_date (inclusive)
+
+        Without end_date only an exact match on start_date is returned. Bounds
+        that are not valid YYYY-MM-DD dates match nothing.
+        """
+        start_date = normalise_date(start_date)
+        end_date = normalise_date(end_date) if end_date else start_date
+        if not start_date or not end_date:
+            return []
+
+        dates = self.dates(assembly)
+        return dates[bisect_left(dates, start_date):bisect_right(dates, end_date)]
+
+    def resolve(self, assemblies, start_date, end_date=None):
+        """List (assembly, date) partitions matching the range for every assembly"""
+        return [
+            (assembly, date)
+            for assembly in assemblies
+            for date in self.dates_in_range(assembly, start_date, end_date)
+        ]
+
+    def invalidate(self, assembly=None):
+        """Forget the date index of one assembly, or of all of them"""
+        with self._lock:
+            if assembly is None:
+                self._index.clear()
+            else:
+                self._index.pop(assembly, None)
+
+partition_resolver = PartitionResolver()
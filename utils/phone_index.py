@@ -0,0 +1,117 @@
+"""
+Persistent phone number postings over message store partitions
+
+For every assembly the index maps each date partition to
+{normalised sender phone: [row offsets]} and remembers the partition sources
+it was built from. It is persisted as message_store/<assembly>/phones.json;
+a date whose JSON files changed is re-indexed on the next lookup. A member
+drill-down reads only the rows listed for that phone instead of scanning every
+partition in range.
+"""
+
+import os
+import json
+import threading
+
+from utils.message_store import message_store
+from utils.phones import normalise_phone
+
+PHONE_INDEX_FORMAT_VERSION = 2
+
+def build_phone_postings(partition):
+    """Map normalised sender phone -> ascending row offsets of one partition"""
+    postings = {}
+    for row, phone in enumerate(partition.column('normalised_phone')):
+        if phone:
+            postings.setdefault(phone, []).append(row)
+    return postings
+
+class PhoneIndex:
+    """Per-assembly phone -> (date, row offsets) index, refreshed per date"""
+
+    def __init__(self, store=message_store):
+        self.store = store
+        self._assemblies = {}  # assembly -> {date: {'sources': ..., 'phones': ...}}
+        self._lock = threading.Lock()
+
+    def index_file(self, assembly):
+        return os.path.join(self.store.store_path, assembly, 'phones.json')
+
+    def lookup(self, partitions, phone):
+        """Return [(assembly, date, offsets)] for the partitions where phone sent messages"""
+        phone = normalise_phone(phone)
+        if not phone:
+            return []
+
+        by_assembly = {}
+        for assembly, date in partitions:
+            by_assembly.setdefault(assembly, []).append(date)
+
+        hits = []
+        for assembly, dates in by_assembly.items():
+            entries = self._entries(assembly, dates)
+            for date in dates:
+                offsets = entries[date]['phones'].get(phone) if date in entries else None
+                if offsets:
+                    hits.append((assembly, date, offsets))
+        return hits
+
+    def _entries(self, assembly, dates):
+        """Index entries of an assembly, re-indexing the given dates if stale"""
+        with self._lock:
+            entries = self._assemblies.get(assembly)
+        entries = dict(entries) if entries is not None else self._read_index_file(assembly)
+
+        changed = False
+        for date in dates:
+            signature = self.store.source_signature(assembly, date)
+            entry = entries.get(date)
+            if not signature:
+                changed = entries.pop(date, None) is not None or changed
+                continue
+            if entry is not None and entry['sources'] == signature:
+                continue
+            partition = self.store.get_partition(assembly, date)
+            entries[date] = {'sources': partition.sources, 'phones': build_phone_postings(partition)}
+            changed = True
+
+        if changed:
+            self._write_index_file(assembly, entries)
+        with self._lock:
+            self._assemblies[assembly] = entries
+        return entries
+
+    def invalidate(self, assembly=None):
+        """Forget the cached index of one assembly, or of all of them"""
+        with self._lock:
+            if assembly is None:
+                self._assemblies.clear()
+            else:
+                self._assemblies.pop(assembly, None)
+
+    def _read_index_file(self, assembly):
+        path = self.index_file(assembly)
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('format') != PHONE_INDEX_FORMAT_VERSION:
+                return {}
+            return data['dates']
+        except (json.JSONDecodeError, IOError, KeyError) as e:
+            print(f"Warning: Discarding unreadable phone index {path}: {e}")
+            return {}
+
+    def _write_index_file(self, assembly, entries):
+        path = self.index_file(assembly)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'format': PHONE_INDEX_FORMAT_VERSION, 'dates': entries}, f, separators=(',', ':'))
+            os.replace(tmp_path, path)
+        except (IOError, OSError) as e:
+            print(f"Warning: Could not persist phone index {path}: {e}")
+
+phone_index = PhoneIndex()
@@ -0,0 +1,31 @@
+"""
+Phone number normalisation shared by rosters and messages
+
+Roster CSVs store phones as '+91 98154 26136' and message JSON as
+'919781368381'. Both are reduced to the international digits
+('919815426136'): a '.0' left by spreadsheets that stored the number as a
+float, every non-digit and a leading '00' international call prefix are
+dropped. No national prefix is guessed, since rosters contain foreign
+numbers of every length. Messages are normalised once at ingest (the
+store's normalised_phone column), rosters once at upload (the
+normalised_phone column of the canonical roster, see utils/rosters.py).
+"""
+
+import re
+
+import pandas as pd
+
+_FLOAT_SUFFIX = re.compile(r'\.0+$')
+_NON_DIGITS = re.compile(r'\D')
+
+def normalise_phone(value):
+    """International digits of a phone number ('+91 98154 26136' -> '919815426136')"""
+    digits = _NON_DIGITS.sub('', _FLOAT_SUFFIX.sub('', str(value or '')))
+    return digits[2:] if digits.startswith('00') else digits
+
+def normalise_phone_series(phones):
+    """normalise_phone() over a pandas Series; missing values become ''"""
+    phones = pd.Series(phones, dtype=object).fillna('').astype(str)
+    return (phones.str.replace(r'\.0+$', '', regex=True)
+            .str.replace(r'\D', '', regex=True)
+            .str.replace(r'^00', '', regex=True))
@@ -0,0 +1,89 @@
+"""
+Versioned in-memory cache of analysis endpoint results
+
+Results are keyed by (endpoint, normalised request body, corpus version),
+where the corpus version is a per-assembly counter that is bumped when
+reports or rosters are uploaded and whenever the message store or the
+partition resolver notices that files of an assembly changed on disk. The
+versions live in memory, so a cache hit is answered without touching the
+disk; the TTL bounds how long a change made behind the back of this process
+(e.g. an upload handled by another gunicorn worker) can go unnoticed.
+"""
+
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+
+RESULT_CACHE_ENTRIES = int(os.environ.get('RESULT_CACHE_ENTRIES', 64))
+RESULT_CACHE_TTL = int(os.environ.get('RESULT_CACHE_TTL', 300))  # seconds
+
+class CorpusVersions:
+    """Per-assembly corpus version counters"""
+
+    def __init__(self):
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def bump(self, assembly):
+        """Mark the corpus of an assembly as changed"""
+        with self._lock:
+            self._versions[assembly] = self._versions.get(assembly, 0) + 1
+
+    def get(self, assemblies):
+        """Version of the given assemblies, as a hashable tuple"""
+        with self._lock:
+            return tuple((assembly, self._versions.get(assembly, 0)) for assembly in sorted(set(assemblies)))
+
+class ResultCache:
+    """Size-bounded LRU of endpoint results with a TTL and hit/miss/eviction stats"""
+
+    def __init__(self, max_entries=RESULT_CACHE_ENTRIES, ttl=RESULT_CACHE_TTL, versions=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.versions = versions or CorpusVersions()
+        self._entries = OrderedDict()  # key -> (stored_at, result)
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+
+    def key(self, endpoint, body, assemblies):
+        """Cache key of a request; body should already have its defaults filled in"""
+        normalised = json.dumps(body, sort_keys=True, separators=(',', ':'), default=str)
+        return (endpoint, normalised, self.versions.get(assemblies))
+
+    def get(self, key):
+        """Cached result for key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            stored_at, result = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return result
+
+    def put(self, key, result):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), max_entries=self.max_entries, ttl=self.ttl)
+
+corpus_versions = CorpusVersions()
+result_cache = ResultCache(versions=corpus_versions)
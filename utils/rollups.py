@@ -0,0 +1,93 @@
+"""
+Per-group daily rollups of message store partitions
+
+A rollup summarises the rows of one (assembly, date, group) with the counts
+the analytics endpoints report: message, sentiment and label totals, and per
+sentiment filter the unique senders, top sender and breakdowns over messages
+that have a sender phone. Rollups are built when a partition is ingested and
+stored with it, so range queries add up G x D rollups instead of visiting
+every message.
+"""
+
+SENTIMENTS = ['Positive', 'Negative', 'Neutral']
+
+def _sender_stats(rows):
+    """Sender, sentiment and label counts over rows that have a sender phone"""
+    senders = {}  # phone -> [name, message_count], in first-seen order
+    sentiment_breakdown = {sentiment: 0 for sentiment in SENTIMENTS}
+    label_breakdown = {}
+    for msg in rows:
+        phone_number = msg['sender_phone']
+        if not phone_number:
+            continue
+        if phone_number not in senders:
+            senders[phone_number] = [msg['sender_name'], 0]
+        senders[phone_number][1] += 1
+        if msg['sentiment'] in sentiment_breakdown:
+            sentiment_breakdown[msg['sentiment']] += 1
+        label_breakdown[msg['label']] = label_breakdown.get(msg['label'], 0) + 1
+
+    top_sender = None
+    if senders:
+        phone, (name, count) = max(senders.items(), key=lambda item: item[1][1])
+        top_sender = {'name': name, 'phone': phone, 'message_count': count}
+
+    return {
+        'unique_senders': len(senders),
+        'top_sender': top_sender,
+        'sentiment_breakdown': sentiment_breakdown,
+        'label_breakdown': label_breakdown
+    }
+
+def build_group_rollup(rows):
+    """Rollup of the store rows of one group file"""
+    rows = list(rows)
+    sentiment_counts = {}
+    label_counts = {}
+    by_sentiment = {}
+    for msg in rows:
+        sentiment_counts[msg['sentiment']] = sentiment_counts.get(msg['sentiment'], 0) + 1
+        label_counts[msg['label']] = label_counts.get(msg['label'], 0) + 1
+        by_sentiment.setdefault(msg['sentiment'].lower(), []).append(msg)
+
+    return {
+        'total_messages': len(rows),
+        'sentiment_counts': sentiment_counts,
+        'label_counts': label_counts,
+        'senders': _sender_stats(rows),
+        'senders_by_sentiment': {
+            sentiment: _sender_stats(sentiment_rows)
+            for sentiment, sentiment_rows in by_sentiment.items()
+        }
+    }
+
+def sender_rollup(rollup, sentiment_filter='all'):
+    """Sender statistics of a group rollup for a sentiment filter ('all' or a sentiment)"""
+    if sentiment_filter == 'all':
+        return rollup['senders']
+    stats = rollup['senders_by_sentiment'].get(sentiment_filter.lower())
+    if stats is None:
+        return {
+            'unique_senders': 0,
+            'top_sender': None,
+            'sentiment_breakdown': {sentiment: 0 for sentiment in SENTIMENTS},
+            'label_breakdown': {}
+        }
+    return stats
+
+def sum_partition_rollups(partitions):
+    """Add up the message, sentiment and label totals of the given partitions"""
+    totals = {
+        'total_messages': 0,
+        'sentiment_breakdown': {sentiment: 0 for sentiment in SENTIMENTS},
+        'label_breakdown': {}
+    }
+    for partition in partitions:
+        for rollup in partition.rollups:
+            totals['total_messages'] += rollup['total_messages']
+            for sentiment, count in rollup['sentiment_counts'].items():
+                if sentiment in totals['sentiment_breakdown']:
+                    totals['sentiment_breakdown'][sentiment] += count
+            for label, count in rollup['label_counts'].items():
+                totals['label_breakdown'][label] = totals['label_breakdown'].get(label, 0) + count
+    return totals
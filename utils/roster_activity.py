@@ -0,0 +1,153 @@
+"""
+Roster x activity join engine
+
+Relates each group's roster (database/<assembly>/groups/*.csv) to the phones
+that posted in it according to the message corpus. Both sides become
+(group key, phone) tables: rosters contribute the normalised phones of
+utils/rosters.py, and messages come from the message store's
+normalised_phone column, aggregated per partition on the scan engine. A
+single hash join (an outer merge with an indicator column) then classifies
+every pair in one pass as a member who posted, a silent member or a poster
+who is not on the roster. Rosters and report files are matched with the
+group key of utils/group_overlap.py.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.message_store import message_store
+from utils.group_overlap import group_key, group_display_name, roster_files
+from utils.rosters import read_roster, roster_phones
+from utils.scan_engine import scan_partitions
+
+STATUSES = {'both': 'posted', 'left_only': 'silent', 'right_only': 'not_on_roster'}
+
+def roster_members(assembly):
+    """(group, phone, name) rows of every roster of an assembly, group key -> display name
+    and group key -> number of roster files (more than one if their names collapse to the same key)
+    """
+    groups_path = os.path.join(message_store.database_path, assembly, 'groups')
+    frames = []
+    group_names = {}
+    roster_counts = {}
+    for filename in roster_files(assembly):
+        try:
+            df, meta = read_roster(os.path.join(groups_path, filename), dtype=str)
+        except Exception as e:
+            print(f"Warning: Could not read roster {filename}: {e}")
+            continue
+        key = group_key(filename)
+        group_names.setdefault(key, group_display_name(filename))
+        roster_counts[key] = roster_counts.get(key, 0) + 1
+
+        phones = roster_phones(df, meta)
+        if phones is None:
+            continue
+        name_column = meta['name_column']
+        frames.append(pd.DataFrame({
+            'group': key,
+            'phone': phones.to_numpy(),
+            'name': df[name_column].fillna('').to_numpy() if name_column is not None else ''
+        }))
+
+    if not frames:
+        return pd.DataFrame(columns=['group', 'phone', 'name']), group_names, roster_counts
+    members = pd.concat(frames, ignore_index=True)
+    members = members[members['phone'] != ''].drop_duplicates(['group', 'phone'])
+    return members, group_names, roster_counts
+
+def partition_activity(partition):
+    """Scan helper: messages and first sender name per (group, phone) of one partition"""
+    keys = [group_key(filename) for filename, start, end in partition.groups]
+    groups = np.repeat(
+        np.asarray(keys, dtype=object),
+        [end - start for filename, start, end in partition.groups]
+    )
+    rows = pd.DataFrame({
+        'group': groups,
+        'phone': partition.column('normalised_phone'),
+        'name': partition.column('sender_name')
+    })
+    rows = rows[rows['phone'] != '']
+    return {
+        'group_names': {key: group_display_name(filename) for key, (filename, start, end) in zip(keys, partition.groups)},
+        'activity': rows.groupby(['group', 'phone'], sort=False).agg(
+            messages=('name', 'size'), name=('name', 'first')
+        ).reset_index()
+    }
+
+class RosterActivity:
+    """Every (group, phone) pair of an assembly classified as posted, silent or not_on_roster"""
+
+    def __init__(self, assembly, pairs, group_names, roster_counts):
+        self.assembly = assembly
+        self.pairs = pairs  # DataFrame: group, phone, name, messages, status
+        self.group_names = group_names
+        self.roster_counts = roster_counts
+
+    @classmethod
+    def build(cls, assembly, partitions):
+        """Join the rosters of an assembly with the activity of the given (assembly, date) partitions"""
+        members, group_names, roster_counts = roster_members(assembly)
+
+        scanned = scan_partitions(partitions, partition_activity)
+        for part in scanned:
+            for key, name in part['group_names'].items():
+                group_names.setdefault(key, name)
+        frames = [part['activity'] for part in scanned if len(part['activity'])]
+        if frames:
+            # The same phone can post in a group on several dates
+            activity = pd.concat(frames, ignore_index=True).groupby(['group', 'phone'], sort=False).agg(
+                messages=('messages', 'sum'), name=('name', 'first')
+            ).reset_index()
+        else:
+            activity = pd.DataFrame({'group': [], 'phone': [], 'messages': [], 'name': []}, dtype=object)
+
+        pairs = members.merge(activity, on=['group', 'phone'], how='outer',
+                              suffixes=('_roster', '_sender'), indicator=True)
+        pairs['status'] = pairs['_merge'].astype(str).map(STATUSES)
+        pairs['messages'] = pairs['messages'].fillna(0).astype(np.int64)
+        # Prefer the roster name; a poster who is not on the roster keeps their sender name
+        pairs['name'] = pairs['name_roster'].where(pairs['name_roster'].notna() & (pairs['name_roster'] != ''),
+                                                   pairs['name_sender']).fillna('')
+        pairs = pairs[['group', 'phone', 'name', 'messages', 'status']]
+
+        return cls(assembly, pairs, group_names, roster_counts)
+
+    def group_summaries(self):
+        """Per-group member / poster counts, by group name"""
+        counts = pd.crosstab(self.pairs['group'], self.pairs['status']) if len(self.pairs) else pd.DataFrame()
+        messages = self.pairs.groupby('group')['messages'].sum() if len(self.pairs) else pd.Series(dtype=np.int64)
+
+        summaries = []
+        for key, name in self.group_names.items():
+            row = counts.loc[key] if key in counts.index else {}
+            posted = int(row.get('posted', 0))
+            silent = int(row.get('silent', 0))
+            not_on_roster = int(row.get('not_on_roster', 0))
+            summaries.append({
+                'group_key': key,
+                'group_name': name,
+                'has_roster': key in self.roster_counts,
+                'roster_files': self.roster_counts.get(key, 0),
+                'roster_members': posted + silent,
+                'posted_members': posted,
+                'silent_members': silent,
+                'posters_not_on_roster': not_on_roster,
+                'total_messages': int(messages.get(key, 0)),
+                'participation_rate': round(posted * 100 / (posted + silent), 2) if posted + silent else 0.0
+            })
+        return sorted(summaries, key=lambda summary: (summary['group_name'].lower(), summary['group_key']))
+
+    def members(self, key, status=None):
+        """Member dicts of one group, optionally of one status, most active first"""
+        pairs = self.pairs[self.pairs['group'] == key]
+        if status is not None:
+            pairs = pairs[pairs['status'] == status]
+        pairs = pairs.sort_values(['messages', 'phone'], ascending=[False, True])
+        return [
+            {'phone': row.phone, 'name': row.name, 'messages': int(row.messages), 'status': row.status}
+            for row in pairs.itertuples(index=False)
+        ]
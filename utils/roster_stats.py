@@ -0,0 +1,88 @@
+"""
+Persistent metadata cache of roster CSV files (database/<assembly>/groups/*.csv)
+
+For every roster the cache remembers the encoding that decoded it, the
+detected phone column, the row counts and the number of unique phones,
+keyed by file path and validated against the file's mtime and size. It is
+persisted as message_store/roster_stats.json, so dashboard statistics cost
+one stat() per roster and a roster is only parsed again after it changed.
+Canonical rosters (utils/rosters.py) are never parsed: their statistics
+are taken from the sidecar written when they were uploaded.
+"""
+
+import os
+import json
+import threading
+
+from utils.message_store import STORE_PATH
+from utils.rosters import compute_roster_stats, roster_metadata
+
+ROSTER_STATS_FORMAT_VERSION = 1
+
+class RosterStatsCache:
+    """Roster path -> stats, refreshed when the file's mtime or size changes"""
+
+    def __init__(self, store_path=STORE_PATH):
+        self.store_path = store_path
+        self._entries = None  # loaded lazily from the cache file
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def cache_file(self):
+        return os.path.join(self.store_path, 'roster_stats.json')
+
+    def get(self, file_path):
+        """Stats of a roster file, parsing it only if it is new or changed"""
+        stat = os.stat(file_path)
+        signature = [stat.st_mtime_ns, stat.st_size]
+        key = os.path.normpath(file_path)
+
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._read_cache_file()
+            entry = self._entries.get(key)
+        if entry is not None and entry['signature'] == signature:
+            return entry['stats']
+
+        meta = roster_metadata(file_path)
+        stats = meta['stats'] if meta is not None else compute_roster_stats(file_path)
+        with self._lock:
+            self._entries[key] = {'signature': signature, 'stats': stats}
+            self._dirty = True
+        return stats
+
+    def save(self):
+        """Persist the cache if anything changed, dropping rosters that no longer exist"""
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = {path: entry for path, entry in self._entries.items() if os.path.exists(path)}
+            self._entries = entries
+            self._dirty = False
+
+        path = self.cache_file()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'format': ROSTER_STATS_FORMAT_VERSION, 'files': entries}, f,
+                          ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, path)
+        except (IOError, OSError) as e:
+            print(f"Warning: Could not persist roster stats {path}: {e}")
+
+    def _read_cache_file(self):
+        path = self.cache_file()
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('format') != ROSTER_STATS_FORMAT_VERSION:
+                return {}
+            return data['files']
+        except (json.JSONDecodeError, IOError, KeyError) as e:
+            print(f"Warning: Discarding unreadable roster stats {path}: {e}")
+            return {}
+
+roster_stats = RosterStatsCache()
@@ -0,0 +1,205 @@
+"""
+Canonical roster files
+
+/api/upload-groups converts every roster it receives (CSV in any of the
+usual encodings, xlsx or xls) into the canonical form: a UTF-8 CSV
+database/<assembly>/groups/<name>.csv holding the uploaded columns as text
+plus a normalised_phone column (utils/phones.py), and a sidecar
+<name>.csv.meta.json recording the source file, the detected phone and name
+columns and the roster statistics. Readers take the encoding, the columns
+and the statistics from the sidecar instead of detecting them again.
+Rosters without a valid sidecar (copied in by hand, or uploaded before
+rosters were converted) fall back to detection; `flask canonicalise-rosters`
+converts them in place.
+"""
+
+import io
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+from utils.phones import normalise_phone_series
+
+ROSTER_META_FORMAT_VERSION = 1
+ROSTER_META_SUFFIX = '.meta.json'
+ROSTER_EXTENSIONS = ('.csv', '.xlsx', '.xls')
+NORMALISED_PHONE_COLUMN = 'normalised_phone'
+PHONE_COLUMN_KEYWORDS = ['phone', 'number', 'mobile', 'contact', 'whatsapp']
+ROSTER_ENCODINGS = ['utf-8', 'latin-1', 'cp1252']
+
+# Read every cell as text, keeping values such as 'NA' instead of turning them into NaN
+TEXT_CELLS = {'dtype': str, 'keep_default_na': False, 'na_values': ['']}
+
+def read_roster_csv(file_path, encoding=None, **kwargs):
+    """Read a roster CSV, trying utf-8, latin-1 and cp1252 unless encoding is known
+
+    Returns (DataFrame, encoding used).
+    """
+    if encoding:
+        return pd.read_csv(file_path, encoding=encoding, **kwargs), encoding
+    try:
+        return pd.read_csv(file_path, encoding='utf-8', **kwargs), 'utf-8'
+    except UnicodeDecodeError:
+        try:
+            return pd.read_csv(file_path, encoding='latin-1', **kwargs), 'latin-1'
+        except Exception:
+            return pd.read_csv(file_path, encoding='cp1252', **kwargs), 'cp1252'
+
+def find_phone_column(columns):
+    """First column whose name looks like a phone number column, or None"""
+    for col in columns:
+        if any(keyword in str(col).lower() for keyword in PHONE_COLUMN_KEYWORDS):
+            return col
+    return None
+
+def find_name_column(columns, exclude=None):
+    """First column whose name contains 'name', or None"""
+    for col in columns:
+        if col != exclude and 'name' in str(col).lower():
+            return col
+    return None
+
+def compute_roster_stats(file_path):
+    """Parse a roster and summarise it (error is set if it could not be read)"""
+    stats = {
+        'encoding': None,
+        'phone_column': None,
+        'rows': 0,
+        'non_empty_rows': 0,
+        'unique_phones': 0,
+        'error': None
+    }
+    try:
+        df, stats['encoding'] = read_roster_csv(file_path)
+    except Exception as e:
+        stats['error'] = str(e)
+        return stats
+
+    phone_column = find_phone_column(df.columns)
+    stats['phone_column'] = None if phone_column is None else str(phone_column)
+    stats['rows'] = int(len(df))
+    stats['non_empty_rows'] = int(len(df.dropna(how='all')))
+    if phone_column is not None:
+        stats['unique_phones'] = int(df[phone_column].dropna().nunique())
+    return stats
+
+def meta_file(csv_path):
+    return csv_path + ROSTER_META_SUFFIX
+
+def roster_metadata(csv_path):
+    """Sidecar of a canonical roster, or None if it has none or the CSV changed since"""
+    try:
+        stat = os.stat(csv_path)
+        with open(meta_file(csv_path), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (json.JSONDecodeError, IOError) as e:
+        print(f"Warning: Ignoring unreadable roster metadata {meta_file(csv_path)}: {e}")
+        return None
+    if meta.get('format') != ROSTER_META_FORMAT_VERSION:
+        return None
+    if meta.get('csv') != [stat.st_mtime_ns, stat.st_size]:
+        return None
+    return meta
+
+def read_roster(csv_path, **kwargs):
+    """Read a roster CSV; returns (DataFrame, meta)
+
+    meta holds 'encoding', 'phone_column', 'name_column' and
+    'normalised_column', from the sidecar of a canonical roster or detected.
+    """
+    meta = roster_metadata(csv_path)
+    if meta is not None:
+        return pd.read_csv(csv_path, encoding='utf-8', **kwargs), meta
+
+    df, encoding = read_roster_csv(csv_path, **kwargs)
+    phone_column = find_phone_column(df.columns)
+    return df, {
+        'encoding': encoding,
+        'phone_column': phone_column,
+        'name_column': find_name_column(df.columns, exclude=phone_column),
+        'normalised_column': None
+    }
+
+def roster_phones(df, meta):
+    """Normalised phones of a roster read with dtype=str ('' where missing), or None without a phone column"""
+    if meta['normalised_column'] is not None and meta['normalised_column'] in df.columns:
+        return df[meta['normalised_column']].fillna('')
+    if meta['phone_column'] is None:
+        return None
+    return normalise_phone_series(df[meta['phone_column']])
+
+def load_roster_upload(raw, filename):
+    """Decode an uploaded roster (bytes) into an all-text DataFrame; returns (DataFrame, encoding)"""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.csv':
+        for encoding in ROSTER_ENCODINGS:
+            try:
+                return pd.read_csv(io.BytesIO(raw), encoding=encoding, **TEXT_CELLS), encoding
+            except UnicodeDecodeError:
+                continue
+    if extension in ('.xlsx', '.xls'):
+        return pd.read_excel(io.BytesIO(raw), **TEXT_CELLS), None
+    raise ValueError(f"Unsupported roster file type '{extension or filename}', expected CSV, XLSX or XLS")
+
+def write_canonical_roster(csv_path, df, source, mtime_ns=None):
+    """Write df as the canonical roster csv_path plus its sidecar; returns the sidecar
+
+    mtime_ns, if given, is kept as the roster's modification time.
+    """
+    phone_column = find_phone_column(df.columns)
+    name_column = find_name_column(df.columns, exclude=phone_column)
+    if phone_column is not None:
+        df = df.assign(**{NORMALISED_PHONE_COLUMN: normalise_phone_series(df[phone_column]).to_numpy()})
+
+    tmp_path = f'{csv_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    df.to_csv(tmp_path, index=False, encoding='utf-8')
+    if mtime_ns is not None:
+        os.utime(tmp_path, ns=(mtime_ns, mtime_ns))
+    os.replace(tmp_path, csv_path)
+
+    # Statistics exactly as the detecting readers would compute them
+    stat = os.stat(csv_path)
+    meta = {
+        'format': ROSTER_META_FORMAT_VERSION,
+        'source': source,
+        'encoding': 'utf-8',
+        'phone_column': None if phone_column is None else str(phone_column),
+        'name_column': None if name_column is None else str(name_column),
+        'normalised_column': NORMALISED_PHONE_COLUMN if phone_column is not None else None,
+        'stats': compute_roster_stats(csv_path),
+        'converted_at': datetime.utcnow().isoformat() + 'Z',
+        'csv': [stat.st_mtime_ns, stat.st_size]
+    }
+    path = meta_file(csv_path)
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+    return meta
+
+def canonicalise_roster(raw, filename, csv_path, mtime_ns=None):
+    """Convert an uploaded roster (bytes) into the canonical roster csv_path; returns the sidecar"""
+    df, encoding = load_roster_upload(raw, filename)
+    return write_canonical_roster(csv_path, df, {
+        'filename': filename,
+        'format': os.path.splitext(filename)[1].lower().lstrip('.'),
+        'encoding': encoding,
+        'size': len(raw),
+        'sha1': hashlib.sha1(raw).hexdigest()
+    }, mtime_ns)
+
+def canonicalise_roster_file(csv_path):
+    """Convert a roster CSV that has no valid sidecar into the canonical form, in place
+
+    The roster keeps its modification time, which is shown as its last update.
+    """
+    mtime_ns = os.stat(csv_path).st_mtime_ns
+    with open(csv_path, 'rb') as f:
+        raw = f.read()
+    return canonicalise_roster(raw, os.path.basename(csv_path), csv_path, mtime_ns)
@@ -0,0 +1,70 @@
+"""
+Parallel scan engine over message store partitions
+
+A scan applies a per-partition function to every (assembly, date) partition
+on a bounded worker pool and hands the partial results back in partition
+order, so callers can merge them deterministically. The pool type and size
+are configured per deployment through SCAN_EXECUTOR ('thread' or 'process')
+and SCAN_WORKERS. One pool of each type is created on first use and shared
+by all requests of the worker process.
+
+Threads only overlap the I/O of a scan (reading partition files and stat
+calls); decoding partitions and scanning rows is CPU work that holds the
+GIL, so CPU-heavy deployments on several cores should use the process pool,
+whose workers also keep their own warm partitions between scans.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from utils.message_store import message_store
+
+SCAN_WORKERS = int(os.environ.get('SCAN_WORKERS', min(32, (os.cpu_count() or 1) + 4)))
+SCAN_EXECUTOR = os.environ.get('SCAN_EXECUTOR', 'thread')
+
+_pools = {}  # 'thread' / 'process' -> shared executor
+_pools_lock = threading.Lock()
+
+def _scan_partition(task):
+    """Load one partition and apply the scan function to it"""
+    assembly, date, scan_fn = task
+    return scan_fn(message_store.get_partition(assembly, date))
+
+def _pool(kind):
+    """The shared executor of a kind, created on first use"""
+    with _pools_lock:
+        pool = _pools.get(kind)
+        if pool is None:
+            pool_class = ProcessPoolExecutor if kind == 'process' else ThreadPoolExecutor
+            pool = _pools[kind] = pool_class(max_workers=SCAN_WORKERS)
+        return pool
+
+def scan_partitions(partitions, scan_fn, max_workers=None, executor=None):
+    """Run scan_fn(partition) for every (assembly, date) and return the results in order
+
+    With the process executor scan_fn must be picklable, i.e. a module-level
+    function or a functools.partial of one. scan_fn must not start a scan of
+    its own, since it would wait for the pool it is running on.
+    """
+    partitions = [
+        (assembly, date) for assembly, date in partitions
+        if os.path.isdir(message_store.messages_dir(assembly, date))
+    ]
+    tasks = [(assembly, date, scan_fn) for assembly, date in partitions]
+    workers = max(1, min(max_workers or SCAN_WORKERS, len(tasks)))
+
+    if workers == 1:
+        return [_scan_partition(task) for task in tasks]
+
+    kind = 'process' if (executor or SCAN_EXECUTOR) == 'process' else 'thread'
+    pool = _pool(kind)
+    try:
+        return list(pool.map(_scan_partition, tasks))
+    except BrokenProcessPool:
+        # A worker process died; start a fresh pool for the next scan
+        with _pools_lock:
+            if _pools.get(kind) is pool:
+                del _pools[kind]
+        raise
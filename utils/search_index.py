@@ -0,0 +1,199 @@
+"""
+SQLite FTS5 full-text index over the messages table
+
+messages_fts is an external-content FTS5 table on messages (content, sender
+name, sender phone, group and assembly), kept in sync by triggers, so the bulk
+corpus loader and uploads maintain it without extra work. Queries use FTS5
+syntax: words, "phrase queries", prefix* queries and AND / OR / NOT. Assembly,
+date, label and sentiment filters are applied in the same SQL statement.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.exc import OperationalError
+
+from extensions import db
+
+FTS_TABLE = 'messages_fts'
+
+# searchField value -> FTS column (the 'all' field searches every column).
+# The Advanced Search page posts the snake_case names, API clients the camelCase ones
+FTS_FIELDS = {
+    'messageContent': 'content',
+    'senderName': 'sender_name',
+    'senderPhone': 'sender_phone',
+    'groupName': 'group_file',
+    'assembly': 'assembly_name',
+    'message_content': 'content',
+    'sender_name': 'sender_name',
+    'phone_number': 'sender_phone',
+    'group_name': 'group_file',
+    'assembly_name': 'assembly_name',
+}
+
+# Gurmukhi/Devanagari vowel signs are combining marks (M*); they must stay
+# inside tokens or every Punjabi word would be split apart
+FTS_TOKENIZER = "unicode61 remove_diacritics 2 categories 'L* N* Co M*'"
+
+FTS_SCHEMA = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        content, sender_name, sender_phone, group_file, assembly_name,
+        content='messages', content_rowid='id', tokenize="{FTS_TOKENIZER}"
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON messages BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, content, sender_name, sender_phone, group_file, assembly_name)
+        VALUES (new.id, new.content, new.sender_name, new.sender_phone, new.group_file, new.assembly_name);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON messages BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content, sender_name, sender_phone, group_file, assembly_name)
+        VALUES ('delete', old.id, old.content, old.sender_name, old.sender_phone, old.group_file, old.assembly_name);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON messages BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content, sender_name, sender_phone, group_file, assembly_name)
+        VALUES ('delete', old.id, old.content, old.sender_name, old.sender_phone, old.group_file, old.assembly_name);
+        INSERT INTO {FTS_TABLE}(rowid, content, sender_name, sender_phone, group_file, assembly_name)
+        VALUES (new.id, new.content, new.sender_name, new.sender_phone, new.group_file, new.assembly_name);
+    END""",
+]
+
+FTS_OBJECTS = {FTS_TABLE, f'{FTS_TABLE}_ai', f'{FTS_TABLE}_ad', f'{FTS_TABLE}_au'}
+
+def fts_available():
+    """Full-text search needs the SQLite FTS5 extension"""
+    return db.engine.dialect.name == 'sqlite'
+
+def ensure_search_index():
+    """Create the FTS table and triggers if missing, rebuilding the index from messages"""
+    if not fts_available():
+        return False
+    with db.engine.begin() as conn:
+        existing = {
+            row[0] for row in conn.exec_driver_sql(
+                "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')"
+            )
+        }
+        if FTS_OBJECTS <= existing:
+            return True
+        for statement in FTS_SCHEMA:
+            conn.exec_driver_sql(statement)
+        conn.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return True
+
+def rebuild_search_index():
+    """Re-index every row of the messages table"""
+    ensure_search_index()
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+def format_timestamp(value):
+    """Render a stored whatsapp_timestamp like the JSON reports ('2025-08-15T04:58:18.091Z')"""
+    if not value:
+        return ''
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.isoformat(timespec='milliseconds') + 'Z'
+
+def _fulltext_filter(query, search_field, assemblies, start_date, end_date, label, sentiment):
+    """WHERE conditions and parameters shared by the full-text queries; raises ValueError for an unknown field"""
+    if search_field == 'all':
+        match = query
+    elif search_field in FTS_FIELDS:
+        match = f'{{{FTS_FIELDS[search_field]}}} : ({query})'
+    else:
+        raise ValueError(f'Unknown search field: {search_field}')
+
+    conditions = [
+        f'{FTS_TABLE} MATCH :match',
+        'm.assembly_name IN :assemblies',
+        'm.report_date BETWEEN :start_date AND :end_date',
+    ]
+    params = {
+        'match': match,
+        'assemblies': list(assemblies),
+        'start_date': start_date,
+        'end_date': end_date or start_date,
+    }
+    if label != 'all':
+        conditions.append('m.label = :label')
+        params['label'] = label
+    if sentiment != 'all':
+        conditions.append('lower(m.sentiment) = :sentiment')
+        params['sentiment'] = sentiment.lower()
+    return conditions, params
+
+def _execute(statement, params):
+    """Execute a full-text statement, turning FTS5 syntax errors into ValueError"""
+    try:
+        return db.session.execute(statement, params).all()
+    except OperationalError as e:
+        db.session.rollback()
+        if 'fts5' in str(e.orig).lower():
+            raise ValueError(f'Invalid full-text query: {e.orig}')
+        raise
+
+def search_fulltext(query, search_field, assemblies, start_date, end_date=None,
+                    label='all', sentiment='all', limit=None, after=None):
+    """Run an FTS5 query over the loaded corpus, newest messages first
+
+    Rows are ordered by (timestamp, message id) descending. With limit, at
+    most that many rows are returned, starting after the (sort_ts, id) keyset
+    cursor given in after; every row carries its own cursor in 'cursor'.
+    Raises ValueError for a malformed query.
+    """
+    conditions, params = _fulltext_filter(query, search_field, assemblies, start_date, end_date,
+                                          label, sentiment)
+    if after is not None:
+        conditions.append("(COALESCE(m.whatsapp_timestamp, ''), m.id) < (:after_ts, :after_id)")
+        params['after_ts'], params['after_id'] = after
+    limit_clause = ''
+    if limit is not None:
+        limit_clause = 'LIMIT :limit'
+        params['limit'] = limit
+
+    statement = text(f"""
+        SELECT m.id, m.content, m.sender_name, m.sender_phone, m.sentiment, m.label,
+               m.whatsapp_timestamp, COALESCE(m.whatsapp_timestamp, '') AS sort_ts,
+               m.group_file, m.assembly_name, m.report_date
+        FROM {FTS_TABLE} CROSS JOIN messages m ON m.id = {FTS_TABLE}.rowid
+        WHERE {' AND '.join(conditions)}
+        ORDER BY sort_ts DESC, m.id DESC
+        {limit_clause}
+    """).bindparams(bindparam('assemblies', expanding=True))
+
+    return [
+        {
+            'message_content': row.content or '',
+            'sender_name': row.sender_name or 'Unknown',
+            'sender_phone': row.sender_phone or '',
+            'sentiment': row.sentiment or 'Neutral',
+            'label': row.label or 'unknown',
+            'timestamp': format_timestamp(row.whatsapp_timestamp),
+            'group_name': row.group_file,
+            'assembly': row.assembly_name,
+            'date': row.report_date,
+            'cursor': [row.sort_ts, row.id]
+        }
+        for row in _execute(statement, params)
+    ]
+
+def count_fulltext(query, search_field, assemblies, start_date, end_date=None,
+                   label='all', sentiment='all'):
+    """Matching messages, distinct senders and distinct group files of an FTS5 query"""
+    conditions, params = _fulltext_filter(query, search_field, assemblies, start_date, end_date,
+                                          label, sentiment)
+    # CROSS JOIN keeps the FTS table as the outer loop; otherwise SQLite may
+    # walk the assembly/date index and run the MATCH once per message
+    statement = text(f"""
+        SELECT COUNT(*) AS messages,
+               COUNT(DISTINCT m.sender_phone) AS members,
+               COUNT(DISTINCT m.assembly_name || '/' || m.report_date || '/' || m.group_file) AS groups
+        FROM {FTS_TABLE} CROSS JOIN messages m ON m.id = {FTS_TABLE}.rowid
+        WHERE {' AND '.join(conditions)}
+    """).bindparams(bindparam('assemblies', expanding=True))
+    row = _execute(statement, params)[0]
+    return {
+        'total_messages': row.messages,
+        'total_members': row.members,
+        'total_groups': row.groups
+    }
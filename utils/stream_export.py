@@ -0,0 +1,71 @@
+"""
+Gzipped CSV / NDJSON export streams
+
+The export routes can return their main sheet as format=csv.gz or
+format=ndjson.gz instead of a workbook. Rows are serialised and compressed
+in batches as they are produced, so the response starts streaming at once
+and nothing but the current batch is held in memory.
+"""
+
+import io
+import csv
+import json
+import zlib
+from itertools import islice
+
+from utils.xlsx_export import cell_value
+
+EXPORT_FORMATS = ('xlsx', 'csv.gz', 'ndjson.gz')
+GZIP_MIMETYPE = 'application/gzip'
+BATCH_ROWS = 1000
+
+def export_format(value, default='xlsx'):
+    """Normalised export format of a request ('excel' means xlsx), or None if unsupported"""
+    value = (value or default).lower()
+    if value == 'excel':
+        value = 'xlsx'
+    return value if value in EXPORT_FORMATS else None
+
+def _gzip_batches(batches):
+    """gzip-compress an iterable of text batches, yielding compressed chunks"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    for batch in batches:
+        chunk = compressor.compress(batch.encode('utf-8'))
+        if chunk:
+            yield chunk
+    yield compressor.flush()
+
+def _csv_batches(headers, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, BATCH_ROWS))
+        if not batch:
+            break
+        writer.writerows([cell_value(value) for value in row] for row in batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+def _ndjson_batches(headers, rows):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, BATCH_ROWS))
+        if not batch:
+            break
+        yield ''.join(
+            json.dumps(dict(zip(headers, (cell_value(value) for value in row))),
+                       ensure_ascii=False, default=str) + '\n'
+            for row in batch
+        )
+
+def stream_rows(export_format, headers, rows):
+    """Yield the gzip-compressed csv.gz or ndjson.gz encoding of rows"""
+    if export_format == 'csv.gz':
+        return _gzip_batches(_csv_batches(headers, rows))
+    if export_format == 'ndjson.gz':
+        return _gzip_batches(_ndjson_batches(headers, rows))
+    raise ValueError(f'Unsupported stream format: {export_format}')
@@ -0,0 +1,221 @@
+"""
+Trigram substring index over message store partitions
+
+For every partition the lowercased message content, sender name and sender
+phone are split into overlapping 3-character grams, and each gram maps to the
+sorted row offsets containing it. A substring query of three or more
+characters can only match rows holding all of its grams, so intersecting the
+posting lists yields a small candidate set that the caller verifies with the
+exact substring test. Indexes are persisted next to their partition as
+<date>.trigrams.json and rebuilt when the partition's sources change. The
+indexes held in memory are bounded by TRIGRAM_CACHE_BYTES, charged an
+estimate of each index's size, with least-recently-used eviction.
+"""
+
+import os
+import json
+import threading
+from array import array
+from collections import OrderedDict
+from bisect import bisect_left
+from itertools import accumulate
+
+from utils.message_store import message_store
+
+TRIGRAM_FORMAT_VERSION = 1
+TRIGRAM_CACHE_BYTES = int(os.environ.get('TRIGRAM_CACHE_BYTES', 256 * 1024 * 1024))
+GRAM_OVERHEAD_BYTES = 176  # dict entry, key string and array object per gram (measured)
+
+# searchField value -> indexed partition column
+TRIGRAM_FIELDS = {
+    'messageContent': 'content',
+    'senderName': 'sender_name',
+    'senderPhone': 'sender_phone',
+}
+
+def trigrams(text):
+    """Set of all 3-character substrings of text"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def _contains(postings, row):
+    index = bisect_left(postings, row)
+    return index < len(postings) and postings[index] == row
+
+def intersect_postings(lists):
+    """Row offsets present in every sorted posting list, ascending"""
+    if not lists:
+        return []
+    lists = sorted(lists, key=len)
+    rows = list(lists[0])
+    for postings in lists[1:]:
+        if not rows:
+            break
+        rows = [row for row in rows if _contains(postings, row)]
+    return rows
+
+class PartitionTrigrams:
+    """Posting lists of one partition, per indexed column"""
+
+    def __init__(self, sources, fields):
+        self.sources = sources  # partition sources the index was built from
+        self.fields = fields  # column -> {trigram: array of row offsets}
+        # Estimated memory footprint, charged against the cache budget
+        self.nbytes = sum(
+            GRAM_OVERHEAD_BYTES + rows.itemsize * len(rows)
+            for postings in fields.values()
+            for rows in postings.values()
+        )
+
+    @classmethod
+    def build(cls, partition):
+        fields = {}
+        for column in TRIGRAM_FIELDS.values():
+            postings = {}
+            for row, value in enumerate(partition.column(column)):
+                for gram in trigrams(value.lower()):
+                    postings.setdefault(gram, array('I')).append(row)
+            fields[column] = postings
+        return cls(partition.sources, fields)
+
+    def candidates(self, column, term):
+        """Rows of column that may contain term (len(term) >= 3)"""
+        postings = self.fields[column]
+        lists = []
+        for gram in trigrams(term):
+            rows = postings.get(gram)
+            if rows is None:
+                return []
+            lists.append(rows)
+        return intersect_postings(lists)
+
+    def to_dict(self):
+        # Posting lists are delta-encoded to keep the files small
+        return {
+            'format': TRIGRAM_FORMAT_VERSION,
+            'sources': self.sources,
+            'fields': {
+                column: {
+                    gram: [rows[0]] + [b - a for a, b in zip(rows, rows[1:])]
+                    for gram, rows in postings.items()
+                }
+                for column, postings in self.fields.items()
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        fields = {
+            column: {gram: array('I', accumulate(deltas)) for gram, deltas in postings.items()}
+            for column, postings in data['fields'].items()
+        }
+        return cls(data['sources'], fields)
+
+class TrigramIndex:
+    """Persistent per-partition trigram indexes, built on first use"""
+
+    def __init__(self, store=message_store, max_bytes=TRIGRAM_CACHE_BYTES):
+        self.store = store
+        self.max_bytes = max_bytes
+        self._indexes = OrderedDict()  # (assembly, date) -> PartitionTrigrams, least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def index_file(self, assembly, date):
+        return os.path.join(self.store.store_path, assembly, f'{date}.trigrams.json')
+
+    def get(self, partition):
+        """Return the trigram index matching the partition's current sources"""
+        key = (partition.assembly, partition.date)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+        if index is None or index.sources != partition.sources:
+            index = self._read_index_file(partition.assembly, partition.date)
+            if index is None or index.sources != partition.sources:
+                index = PartitionTrigrams.build(partition)
+                self._write_index_file(partition.assembly, partition.date, index)
+            self._remember(key, index)
+        return index
+
+    def _remember(self, key, index):
+        """Keep an index in memory, evicting the least recently used ones over the budget"""
+        with self._lock:
+            previous = self._indexes.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes
+            if index.nbytes > self.max_bytes:
+                return
+            self._indexes[key] = index
+            self._bytes += index.nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._indexes.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def candidate_rows(self, partition, term, search_field):
+        """Sorted row offsets that may match term in search_field, or None to scan all rows
+
+        Mirrors the fields searched by /api/search-messages: group and
+        assembly names are constant per group / partition, so they select
+        whole row ranges instead of going through the index.
+        """
+        if len(term) < 3:
+            return None
+
+        all_rows = range(len(partition))
+        if search_field == 'assembly':
+            return all_rows if term in partition.assembly.lower() else []
+        if search_field == 'groupName':
+            return [
+                row for filename, start, end in partition.groups
+                if term in filename[:-5].lower()
+                for row in range(start, end)
+            ]
+
+        index = self.get(partition)
+        if search_field != 'all':
+            return index.candidates(TRIGRAM_FIELDS.get(search_field, 'content'), term)
+
+        if term in partition.assembly.lower():
+            return all_rows
+        rows = set()
+        for column in TRIGRAM_FIELDS.values():
+            rows.update(index.candidates(column, term))
+        for filename, start, end in partition.groups:
+            if term in filename[:-5].lower():
+                rows.update(range(start, end))
+        return sorted(rows)
+
+    def invalidate(self, assembly=None, date=None):
+        """Forget cached indexes (of one assembly / partition, or all)"""
+        with self._lock:
+            for key in list(self._indexes):
+                if (assembly is None or key[0] == assembly) and (date is None or key[1] == date):
+                    self._bytes -= self._indexes.pop(key).nbytes
+
+    def _read_index_file(self, assembly, date):
+        path = self.index_file(assembly, date)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('format') != TRIGRAM_FORMAT_VERSION:
+                return None
+            return PartitionTrigrams.from_dict(data)
+        except (json.JSONDecodeError, IOError, KeyError) as e:
+            print(f"Warning: Discarding unreadable trigram index {path}: {e}")
+            return None
+
+    def _write_index_file(self, assembly, date, index):
+        path = self.index_file(assembly, date)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(index.to_dict(), f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, path)
+        except (IOError, OSError) as e:
+            print(f"Warning: Could not persist trigram index {path}: {e}")
+
+trigram_index = TrigramIndex()
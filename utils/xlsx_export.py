@@ -0,0 +1,125 @@
+"""
+Streaming XLSX writer shared by the Excel export routes
+
+Sheets are given as (title, headers, rows) where rows is any iterable of
+row sequences, typically a generator. They are written row by row with an
+openpyxl write-only workbook into a temporary file, which the route then
+streams to the client, so neither a DataFrame nor the finished workbook is
+held in memory. Column widths are estimated from the header and the first
+XLSX_WIDTH_SAMPLE_ROWS rows instead of visiting every cell afterwards.
+Routes that produce the rows of several sheets in one pass fill an
+XlsxWorkbook's sheets directly instead.
+"""
+
+import os
+import math
+import tempfile
+
+from openpyxl import Workbook
+from openpyxl.utils import get_column_letter
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+WIDTH_SAMPLE_ROWS = int(os.environ.get('XLSX_WIDTH_SAMPLE_ROWS', 500))
+MAX_COLUMN_WIDTH = 50
+
+def cell_value(value):
+    """Value as openpyxl can store it (NaN and other missing values become empty cells)"""
+    if value is None:
+        return None
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if hasattr(value, 'item'):  # numpy scalar
+        return value.item()
+    return value
+
+def column_widths(headers, sample_rows):
+    """Widths fitting the longest value of each column in the sample, capped at MAX_COLUMN_WIDTH"""
+    widths = [len(str(header)) for header in headers]
+    for row in sample_rows:
+        for index, value in enumerate(row[:len(widths)]):
+            if value is not None:
+                widths[index] = max(widths[index], len(str(value)))
+    return [min(width + 2, MAX_COLUMN_WIDTH) for width in widths]
+
+class XlsxSheet:
+    """One sheet of a write-only workbook; its first rows are held back until the column widths are known"""
+
+    def __init__(self, workbook, title, headers):
+        self.worksheet = workbook.create_sheet(title=title)
+        self.headers = list(headers)
+        self._sample = []  # None once the header has been written
+
+    def append(self, row):
+        if self._sample is not None and len(self._sample) >= WIDTH_SAMPLE_ROWS:
+            self.flush()
+        row = [cell_value(value) for value in row]
+        if self._sample is None:
+            self.worksheet.append(row)
+        else:
+            self._sample.append(row)
+
+    def flush(self):
+        """Size the columns from the rows seen so far and write them after the header"""
+        if self._sample is None:
+            return
+        # Column dimensions must be set before the first row is appended
+        for index, width in enumerate(column_widths(self.headers, self._sample), 1):
+            self.worksheet.column_dimensions[get_column_letter(index)].width = width
+        self.worksheet.append(self.headers)
+        for row in self._sample:
+            self.worksheet.append(row)
+        self._sample = None
+
+class XlsxWorkbook:
+    """Write-only workbook whose sheets may be filled in any interleaving
+
+    Sheets appear in the order they were added, whatever order their rows
+    arrive in, so a summary sheet can come first and still be filled last.
+    """
+
+    def __init__(self):
+        self.workbook = Workbook(write_only=True)
+        self.sheets = []
+
+    def add_sheet(self, title, headers):
+        sheet = XlsxSheet(self.workbook, title, headers)
+        self.sheets.append(sheet)
+        return sheet
+
+    def save(self, fileobj):
+        for sheet in self.sheets:
+            sheet.flush()
+        self.workbook.save(fileobj)
+
+    def spool(self):
+        """Save to an anonymous temporary file and return it, rewound for streaming
+
+        The file is removed as soon as it is closed (send_file closes it once the
+        response has been sent).
+        """
+        spool = tempfile.TemporaryFile(suffix='.xlsx')
+        try:
+            self.save(spool)
+        except Exception:
+            spool.close()
+            raise
+        spool.seek(0)
+        return spool
+
+def fill_workbook(sheets):
+    """XlsxWorkbook holding (title, headers, rows) sheets, filled one after the other"""
+    workbook = XlsxWorkbook()
+    for title, headers, rows in sheets:
+        sheet = workbook.add_sheet(title, headers)
+        for row in rows:
+            sheet.append(row)
+        sheet.flush()
+    return workbook
+
+def write_xlsx(sheets, fileobj):
+    """Write (title, headers, rows) sheets to fileobj as an XLSX workbook"""
+    fill_workbook(sheets).save(fileobj)
+
+def spool_xlsx(sheets):
+    """Write sheets to an anonymous temporary file and return it, rewound for streaming"""
+    return fill_workbook(sheets).spool()